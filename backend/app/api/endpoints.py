@@ -1,20 +1,36 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
-import json
+from typing import Any, List, Optional
+import hmac
+import logging
+import re
 from app.services.groq_service import generate_story_groq, generate_image_prompts_groq
 from app.services.gemini_service import generate_story, generate_image_prompts
-from app.services.image_service import generate_image
+from app.services.fast_story import generate_story_fast
+from app.services.image_service import IMAGE_MODEL, generate_image
+from app.services.image_cache import cache as image_cache, cache_key as image_cache_key
+from app.services import image_tiers, llm_output, model_tiers
+from app.services.image_tiers import ImageTier
+from app.core import admission, cancellation
+from app.core.responses import dumps
+from app.core.admission import AdmissionRejected
+from app.core.singleflight import flight, payload_key
 from app.core.config import settings
+from app.services.registry import providers
+from app.services import audio_formats, audio_prefetch, audio_segments, chat_memory, story_index, story_limits, warm_cache
 import asyncio
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 # Use Groq if available, fallback to Gemini
-USE_GROQ = bool(settings.GROQ_API_KEY)
+def use_groq() -> bool:
+    return providers.is_configured("groq")
 
 class StoryRequest(BaseModel):
-    clerkId: str # Retained for potential logging/context but unused for logic now
+    clerkId: str  # Sent by the frontend; not trusted, rate limits use _user_id instead
     email: str
     topic: str
     era: str
@@ -22,24 +38,113 @@ class StoryRequest(BaseModel):
     storyType: str = "Historical"
     withImages: bool = True
     language: str = "English"
+    imageTier: str = "auto"  # "auto", "rich", "standard" or "lite"; capped by image provider load
+    mode: str = ""  # "standard" or "fast" (outline + parallel sections); "" = STORY_DEFAULT_MODE
+    preloadAudio: bool = False  # start narrating the story in the background; see app.services.audio_prefetch
 
-# Stateless Generation Endpoint
-@router.post("/generate")
-async def create_story(request: StoryRequest):
-    # 1. Generate Story text using Groq (faster) or Gemini (fallback)
-    if USE_GROQ:
-        story_data = await generate_story_groq(request.topic, request.era, request.style, request.storyType, request.language)
-    else:
-        story_data = await generate_story(request.topic, request.era, request.style, request.storyType, request.language)
-    
-    if not story_data or "error" in story_data:
-        raise HTTPException(status_code=500, detail=f"AI Story Generation failed: {story_data.get('error') if story_data else 'Unknown Error'}")
+# Response models: FastAPI serializes these straight to JSON bytes (see app.core.responses).
+# Optional fields are only sent when the handler set them (response_model_exclude_unset).
 
-    generated_images = []
-    
-    # 2. Extract/Generate Visual Prompts (Only if withImages is True)
-    if request.withImages:
-        if USE_GROQ:
+class StoryBody(BaseModel):
+    title: Optional[str] = None
+    content: Optional[str] = None
+    moral: Optional[str] = None
+    timeline: List[Any] = []
+    events: List[Any] = []
+    topic: str
+    era: str
+    style: str
+
+class StoryImage(BaseModel):
+    url: Optional[str] = None
+    prompt: Optional[str] = None
+    category: str = "Generated"
+
+class ReusedStory(BaseModel):
+    topic: str
+    similarity: float
+
+class ImageTierInfo(BaseModel):
+    name: str
+    requested: str
+    count: int
+    model: str
+    degraded: bool
+    reason: str
+
+class StoryResponse(BaseModel):
+    story: StoryBody
+    reusedFrom: Optional[ReusedStory] = None
+    imageTier: Optional[ImageTierInfo] = None
+    images: List[StoryImage] = []
+    audioJobId: Optional[str] = None
+
+async def _generate_story_data(request: StoryRequest) -> dict:
+    """Story text using Groq (faster) or Gemini (fallback). Returns {"error": ...} on failure."""
+    fields = (request.topic, request.era, request.style, request.storyType, request.language)
+    mode = "fast" if (request.mode or settings.STORY_DEFAULT_MODE).lower() == "fast" else "standard"
+    match = story_index.find_similar(*fields, mode=mode)
+    if match:
+        logger.info(f"Reusing story for '{match.topic}' (similarity {match.similarity:.2f}) for '{request.topic}'")
+        return dict(match.story, reusedFrom={"topic": match.topic, "similarity": round(match.similarity, 3)})
+
+    async def generate():
+        story_data, produced_by = None, "standard"
+        if mode == "fast":
+            # Each outline and section call takes its own LLM slot
+            story_data = await generate_story_fast(*fields, use_groq=use_groq())
+            if "error" in story_data:
+                logger.warning(f"Fast story mode failed ({story_data['error']}), falling back to single-shot")
+                story_data = None
+            else:
+                produced_by = "fast"
+        if story_data is None:
+            async with admission.slot("llm"):
+                if use_groq():
+                    story_data = await generate_story_groq(*fields)
+                else:
+                    story_data = await generate_story(*fields)
+        if story_data and "error" not in story_data:
+            await story_index.remember(*fields, story_data, mode=produced_by)
+        return story_data
+
+    # Identical concurrent requests share one generation
+    key = payload_key("story", {
+        "topic": request.topic.lower(), "era": request.era.lower(), "style": request.style.lower(),
+        "storyType": request.storyType, "language": request.language.lower(), "mode": mode,
+    })
+    return await flight.do(key, generate)
+
+
+async def _limited_image(prompt: str, negative_prompt: str, model: str = IMAGE_MODEL) -> str:
+    async def render():
+        cached = await image_cache.get(prompt, negative_prompt, model)
+        if cached:
+            return cached
+        # The story text is already paid for by now; a saturated image provider
+        # degrades to a placeholder instead of failing the whole request
+        try:
+            async with admission.slot("image"):
+                image_url = await generate_image(prompt, negative_prompt, model=model)
+        except AdmissionRejected:
+            return "https://placehold.co/600x400?text=Image+Provider+Busy"
+        await image_cache.put(prompt, negative_prompt, model, image_url)
+        return image_url
+
+    # Concurrent misses on the same prompt share one generation
+    return await flight.do(f"image:{image_cache_key(prompt, negative_prompt, model)}", render)
+
+
+async def _generate_story_images(request: StoryRequest, story_data: dict, tier: ImageTier) -> list:
+    # Requests that shared a story text also share its illustrations
+    key = payload_key("story_images", {"content": story_data.get("story_content", ""), "era": request.era, "tier": tier.name})
+    return await flight.do(key, lambda: _illustrate(request, story_data, tier))
+
+
+async def _illustrate(request: StoryRequest, story_data: dict, tier: ImageTier) -> list:
+    # Extract/Generate Visual Prompts
+    async with admission.slot("llm"):
+        if use_groq():
             prompts_data = await generate_image_prompts_groq(
                 story_data.get("story_content", ""),
                 topic=request.topic,
@@ -53,32 +158,36 @@ async def create_story(request: StoryRequest):
                 era=request.era,
                 story_type=request.storyType
             )
-        image_prompts = prompts_data.get("image_prompts", [])
-        if not image_prompts:
-            print("Warning: No image prompts generated. Using fallback.")
-            image_prompts = [{
-                "scene_description": f"Historical scene representing {request.topic} during the {request.era}, atmospheric, detailed, wide shot",
-                "negative_prompt": "text, watermark, distorted, realistic faces"
-            }]
-
-        # 3. Generate Images (Parallel for speed)
-        # Limit to 2 images for efficiency
-        image_tasks = []
-        for i, p in enumerate(image_prompts[:2]):
-            desc = p.get("scene_description", "")
-            neg = p.get("negative_prompt", "")
-            image_tasks.append(generate_image(desc, neg))
-        
-        # Generate all images in parallel
-        image_urls = await asyncio.gather(*image_tasks)
-
-        for i, url in enumerate(image_urls):
-            generated_images.append({
-                "url": url,
-                "prompt": image_prompts[i].get("scene_description", "Unknown"),
-                "category": "Generated"
-            })
+    image_prompts = prompts_data.get("image_prompts", [])
+    if not image_prompts:
+        logger.warning("No image prompts generated, using fallback")
+        image_prompts = [{
+            "scene_description": f"Historical scene representing {request.topic} during the {request.era}, atmospheric, detailed, wide shot",
+            "negative_prompt": "text, watermark, distorted, realistic faces"
+        }]
+
+    # Generate Images (Parallel for speed)
+    # Count and model come from the tier picked for current load
+    image_tasks = []
+    for i, p in enumerate(image_prompts[:tier.count]):
+        desc = p.get("scene_description", "")
+        neg = p.get("negative_prompt", "")
+        image_tasks.append(_limited_image(desc, neg, tier.model))
+    
+    # Generate all images in parallel
+    image_urls = await asyncio.gather(*image_tasks)
+
+    generated_images = []
+    for i, url in enumerate(image_urls):
+        generated_images.append({
+            "url": url,
+            "prompt": image_prompts[i].get("scene_description", "Unknown"),
+            "category": "Generated"
+        })
+    return generated_images
+
 
+def _story_response(request: StoryRequest, story_data: dict, generated_images: list, image_tier: dict = None) -> dict:
     # Return pure JSON. Persistence is now handled by the Frontend (Next.js).
     return {
         "story": {
@@ -91,27 +200,319 @@ async def create_story(request: StoryRequest):
             "era": request.era,
             "style": request.style
         },
+        **({"reusedFrom": story_data["reusedFrom"]} if story_data.get("reusedFrom") else {}),
+        # The tier's count is what it allows; report what the story actually got
+        **({"imageTier": dict(image_tier, count=len(generated_images))} if image_tier else {}),
         "images": generated_images
     }
 
-from app.services.audio_service import generate_story_audio
+
+def _client_id(http_request: Request) -> str:
+    return f"ip:{http_request.client.host}" if http_request.client else "anonymous"
+
+
+def _user_id(http_request: Request) -> str:
+    """Whom to charge for a request: the X-User-Id of a trusted caller, else the client IP."""
+    secret = settings.INTERNAL_API_SECRET
+    if secret and hmac.compare_digest(http_request.headers.get("x-internal-secret", "").encode(), secret.encode()):
+        user = http_request.headers.get("x-user-id", "").strip()
+        if user:
+            return f"user:{user}"
+    return _client_id(http_request)
+
+
+# Stateless Generation Endpoint
+@router.post("/generate", response_model=StoryResponse, response_model_exclude_unset=True)
+async def create_story(request: StoryRequest, http_request: Request):
+    combo = (request.topic, request.era, request.style, request.storyType, request.language)
+    if settings.WARM_ENABLED:
+        warm_cache.record_request(combo)
+        cached = warm_cache.cache.get_story(combo)
+        if cached:
+            story = dict(cached["story"], topic=request.topic, era=request.era, style=request.style)
+            return dict(cached, story=story, images=cached["images"] if request.withImages else [])
+
+    admission.check_user(_user_id(http_request))
+    # Stop the LLM, image-prompt and image calls if the client goes away
+    return await cancellation.until_disconnected(http_request, _create_story(request))
+
+
+async def _create_story(request: StoryRequest) -> dict:
+    # 1. Generate Story text
+    story_data = await _generate_story_data(request)
+    
+    if not story_data or "error" in story_data:
+        raise HTTPException(status_code=500, detail=f"AI Story Generation failed: {story_data.get('error') if story_data else 'Unknown Error'}")
+
+    # Narration runs alongside the images; the user will likely press "listen" next
+    audio_job = None
+    if request.preloadAudio:
+        audio_job = audio_prefetch.schedule(story_data.get("story_content", ""), request.storyType, request.language)
+
+    # 2-3. Visual prompts and images (Only if withImages is True)
+    generated_images = []
+    tier_info = None
+    try:
+        if request.withImages:
+            with image_tiers.reserve(request.imageTier) as (tier, tier_info):
+                generated_images = await _generate_story_images(request, story_data, tier)
+    except BaseException:
+        # The client left or the images failed: nobody will ask for this story's audio
+        if audio_job:
+            audio_prefetch.cancel(audio_job)
+        raise
+
+    response = _story_response(request, story_data, generated_images, tier_info)
+    if audio_job:
+        response["audioJobId"] = audio_job
+    return response
+
+
+# Batch generation (classrooms, syllabus imports)
+
+class BatchStoryRequest(BaseModel):
+    items: List[StoryRequest]
+
+TOPIC_STOPWORDS = {"the", "a", "an", "of", "in", "on", "at", "and", "to", "for"}
+
+def _normalize_topic(topic: str) -> str:
+    words = re.findall(r"\w+", topic.lower())
+    return " ".join(w for w in words if w not in TOPIC_STOPWORDS)
+
+def _batch_story_key(item: StoryRequest) -> tuple:
+    """Items with the same key produce the same story; generate it once."""
+    return (_normalize_topic(item.topic), item.era.strip().lower(), item.style.strip().lower(),
+            item.storyType, item.language.strip().lower(), item.withImages)
+
+def _batch_image_key(item: StoryRequest) -> tuple:
+    """Near-identical topics in the same era/genre share one set of illustrations."""
+    return (" ".join(sorted(_normalize_topic(item.topic).split())), item.era.strip().lower(), item.storyType, item.imageTier)
+
+@router.post("/generate/batch")
+async def create_story_batch(request: BatchStoryRequest, http_request: Request):
+    """
+    Generate many stories at once. Results stream back as NDJSON, one line per
+    item in completion order: {"index", "status": "ok", "result"} or
+    {"index", "status": "error", "error"}. Duplicate items are generated once
+    and reported with "duplicateOf".
+    """
+    items = request.items
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {settings.BATCH_MAX_ITEMS} items)")
+
+    groups = {}
+    for index, item in enumerate(items):
+        groups.setdefault(_batch_story_key(item), []).append(index)
+
+    # Charge each unique story to the requesting user up front; a batch is all-or-nothing here,
+    # so it can never cost more than a full bucket
+    if admission.user_limits_enabled() and len(groups) > settings.USER_RATE_BURST:
+        raise HTTPException(status_code=400, detail=f"Batch has {len(groups)} different stories "
+                                                    f"(max {settings.USER_RATE_BURST:g} per request)")
+    admission.check_user(_user_id(http_request), cost=len(groups))
+
+    story_slots = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+    image_slots = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+    shared_images = {}
+    results = asyncio.Queue()
+
+    async def bounded_images(item: StoryRequest, story_data: dict) -> tuple:
+        async with image_slots:
+            # Pick the tier when the job actually starts, so a long batch adapts as load changes
+            with image_tiers.reserve(item.imageTier) as (tier, tier_info):
+                return await _generate_story_images(item, story_data, tier), tier_info
+
+    async def run_group(indices: list):
+        item = items[indices[0]]
+        try:
+            async with story_slots:
+                story_data = await _generate_story_data(item)
+            if not story_data or "error" in story_data:
+                raise RuntimeError(f"AI Story Generation failed: {story_data.get('error') if story_data else 'Unknown Error'}")
+            generated_images, tier_info = [], None
+            if item.withImages:
+                image_key = _batch_image_key(item)
+                if image_key not in shared_images:
+                    shared_images[image_key] = asyncio.create_task(bounded_images(item, story_data))
+                generated_images, tier_info = await shared_images[image_key]
+            result = _story_response(item, story_data, generated_images, tier_info)
+            for n, index in enumerate(indices):
+                line = {"index": index, "status": "ok", "result": result}
+                if n:
+                    line["duplicateOf"] = indices[0]
+                results.put_nowait(line)
+        except Exception as e:
+            logger.error(f"Batch item {indices[0]} failed: {e}")
+            for index in indices:
+                line = {"index": index, "status": "error", "error": str(e)}
+                if isinstance(e, AdmissionRejected):
+                    line["retryAfter"] = e.retry_after
+                results.put_nowait(line)
+
+    tasks = [asyncio.create_task(run_group(indices)) for indices in groups.values()]
+    logger.info(f"Batch: {len(items)} items, {len(groups)} unique stories")
+
+    async def stream():
+        try:
+            for _ in range(len(items)):
+                yield dumps(await results.get()) + b"\n"
+        finally:
+            # Client went away (or we are done): stop any remaining work
+            for task in tasks + list(shared_images.values()):
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+from app.services.audio_service import generate_story_audio, with_format
 
 class AudioRequest(BaseModel):
     text: str
     storyType: str = "Historical"
     language: str = ""
+    audioFormat: str = ""  # "standard" (48k MP3), "mp3-32k", "mp3-24k", "opus-24k" or "opus-16k"; "" = AUDIO_DEFAULT_FORMAT
+
+class AlignmentEntry(BaseModel):
+    word: str
+    start: float  # seconds from the start of the audio
+    end: float
+    type: str  # "WordBoundary" or "SentenceBoundary"
+
+class AudioResponse(BaseModel):
+    audioUrl: str
+    alignment: List[AlignmentEntry]
+    alignmentUrl: Optional[str] = None
+    audioFormat: Optional[str] = None
 
-@router.post("/generate-audio")
-async def create_audio(request: AudioRequest):
-    result = await generate_story_audio(request.text, request.storyType, request.language)
+@router.post("/generate-audio", response_model=AudioResponse, response_model_exclude_unset=True)
+async def create_audio(request: AudioRequest, http_request: Request):
+    audio_format = audio_formats.choose(request.audioFormat).name
+    if settings.WARM_ENABLED and audio_format == audio_formats.STANDARD.name:
+        cached = warm_cache.cache.get_audio(request.text, request.storyType, request.language)
+        if cached:
+            return cached
+
+    admission.check_user(_user_id(http_request))
+
+    async def synthesize():
+        async with admission.slot("tts"):
+            return await generate_story_audio(request.text, request.storyType, request.language, audio_format)
+
+    async def audio():
+        # A story generated with preloadAudio may already be narrated, or on its way
+        prefetched = await audio_prefetch.join(request.text, request.storyType, request.language)
+        if prefetched:
+            return await with_format(prefetched, audio_format)
+        key = warm_cache.audio_key(request.text, request.storyType, request.language, audio_format)
+        return await flight.do(key, synthesize)
+
+    result = await cancellation.until_disconnected(http_request, audio())
     if not result:
         raise HTTPException(status_code=500, detail="Audio generation failed")
-    
+    return _audio_response(result)
+
+
+@router.get("/audio-jobs/{job_id}", response_model=AudioResponse, response_model_exclude_unset=True)
+async def get_audio_job(job_id: str, http_request: Request):
+    """Audio of a story generated with preloadAudio; waits if it is still being synthesized."""
+    job = audio_prefetch.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired audio job")
+    result = await cancellation.until_disconnected(http_request, audio_prefetch.result(job))
+    if not result:
+        if job.status == "cancelled":
+            raise HTTPException(status_code=410, detail="Audio job was cancelled")
+        raise HTTPException(status_code=500, detail="Audio generation failed")
+    return _audio_response(result)
+
+
+@router.delete("/audio-jobs/{job_id}")
+async def cancel_audio_job(job_id: str):
+    job = audio_prefetch.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired audio job")
+    cancelled = audio_prefetch.cancel(job_id)
+    return {"cancelled": cancelled, "status": "cancelled" if cancelled else job.status}
+
+
+def _audio_response(result: dict) -> dict:
     # Return both audio URL and alignment data
-    return {
+    response = {
         "audioUrl": result["audioUrl"],
         "alignment": result["alignment"]
     }
+    if result.get("alignmentUrl"):
+        response["alignmentUrl"] = result["alignmentUrl"]
+    if result.get("audioFormat"):
+        response["audioFormat"] = result["audioFormat"]
+    return response
+
+
+async def warm_combo(combo: tuple) -> tuple:
+    """Pre-generate story, images and audio for one preset combination (background warmer)."""
+    topic, era, style, story_type, language = combo
+    request = StoryRequest(clerkId="warmer", email="", topic=topic, era=era, style=style,
+                           storyType=story_type, language=language)
+    story_data = await _generate_story_data(request)
+    if not story_data or "error" in story_data:
+        raise RuntimeError(story_data.get("error") if story_data else "Unknown Error")
+    with image_tiers.reserve(request.imageTier) as (tier, tier_info):
+        images = await _generate_story_images(request, story_data, tier)
+    response = _story_response(request, story_data, images, tier_info)
+    async with admission.slot("tts"):
+        audio = await generate_story_audio(response["story"]["content"], story_type, language)
+    return response, _audio_response(audio) if audio else None
+
+
+@router.get("/warm-cache/stats")
+async def warm_cache_stats():
+    return warm_cache.cache.stats()
+
+
+@router.get("/image-cache/stats")
+async def image_cache_stats():
+    return image_cache.stats()
+
+
+@router.get("/aux-models/stats")
+async def aux_model_stats():
+    return model_tiers.stats()
+
+
+@router.get("/llm-output/stats")
+async def llm_output_stats():
+    return llm_output.stats()
+
+
+@router.get("/story-limits/stats")
+async def story_limits_stats():
+    return story_limits.stats()
+
+
+@router.get("/audio-segments/stats")
+async def audio_segments_stats():
+    return audio_segments.stats()
+
+
+@router.get("/audio-formats/stats")
+async def audio_formats_stats():
+    return audio_formats.stats()
+
+
+@router.get("/audio-prefetch/stats")
+async def audio_prefetch_stats():
+    return audio_prefetch.stats()
+
+
+@router.get("/cancellation/stats")
+async def cancellation_stats():
+    return cancellation.stats()
+
+
+@router.get("/chat-memory/stats")
+async def chat_memory_stats():
+    return chat_memory.stats()
 
 from app.services.gemini_service import extract_characters, generate_character_chat_response
 
@@ -120,8 +521,11 @@ class ExtractCharsRequest(BaseModel):
 
 @router.post("/extract-characters")
 async def extract_chars(request: ExtractCharsRequest):
-    result = await extract_characters(request.text)
-    return result
+    async def extract():
+        async with admission.slot("llm"):
+            return await extract_characters(request.text)
+
+    return await flight.do(payload_key("characters", {"text": request.text}), extract)
 
 class ChatRequest(BaseModel):
     story_context: str
@@ -131,10 +535,11 @@ class ChatRequest(BaseModel):
 
 @router.post("/chat")
 async def chat_with_character(request: ChatRequest):
-    result = await generate_character_chat_response(
-        request.story_context,
-        request.character_name,
-        request.history,
-        request.message
-    )
+    async with admission.slot("llm"):
+        result = await generate_character_chat_response(
+            request.story_context,
+            request.character_name,
+            request.history,
+            request.message
+        )
     return result
@@ -0,0 +1,119 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+from typing import Optional, Tuple
+from app.services.storage import get_storage, is_content_addressed
+
+router = APIRouter()
+
+# Content-addressed media never changes under the same URL
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+MUTABLE_CACHE = "public, max-age=300, must-revalidate"
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single "bytes=" range into inclusive (start, end).
+    Returns None when the header should be ignored (multi-range, other units),
+    raises ValueError when it is unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first == "":
+            # Suffix range: last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError("empty suffix range")
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError(f"malformed range {header!r}")
+    if start >= size or end < start:
+        raise ValueError(f"unsatisfiable range {header!r}")
+    return start, min(end, size - 1)
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match comparison (weak comparison, as RFC 9110 requires for this header)."""
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def accepts_gzip(request: Request) -> bool:
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() == "gzip" and params.replace(" ", "") != "q=0":
+            return True
+    return False
+
+
+@router.api_route("/media/{key:path}", methods=["GET", "HEAD"])
+async def get_media(key: str, request: Request):
+    storage = get_storage()
+    try:
+        info = await storage.stat(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Not found")
+    if info is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    public_url = storage.public_url(key)
+    if public_url:
+        return RedirectResponse(public_url, status_code=307)
+
+    etag = f'"{info.etag}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE if is_content_addressed(key) else MUTABLE_CACHE,
+    }
+
+    # Precompressed sidecar (e.g. alignment JSON): serve the stored .gz as-is
+    if key.endswith(".json"):
+        headers["Vary"] = "Accept-Encoding"
+        if accepts_gzip(request):
+            gz_info = await storage.stat(key + ".gz")
+            if gz_info is not None:
+                key, info = key + ".gz", gz_info
+                headers["Content-Encoding"] = "gzip"
+                # Different bytes on the wire need their own validator (the .gz key has its own)
+                etag = headers["ETag"] = f'"{info.etag}"'
+    media_type = "application/json" if headers.get("Content-Encoding") else info.content_type
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    status = 200
+    start, end = 0, info.size - 1
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range with a stale validator means "send the whole new representation"
+    if range_header and info.size > 0 and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, info.size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{info.size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range:
+            start, end = byte_range
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{info.size}"
+
+    headers["Content-Length"] = str(end - start + 1 if info.size else 0)
+    if request.method == "HEAD":
+        return Response(status_code=status, headers=headers, media_type=media_type)
+    if info.size == 0:
+        return Response(status_code=200, headers=headers, media_type=media_type)
+    return StreamingResponse(storage.open_range(key, start, end), status_code=status, headers=headers, media_type=media_type)
@@ -0,0 +1,189 @@
+"""
+Admission control for the expensive endpoints.
+
+Two layers:
+- a token bucket per user, checked when a request arrives so abusive
+  bursts are turned away before any provider work starts. The user is the
+  X-User-Id sent by a trusted caller (the frontend's server actions, which
+  prove themselves with INTERNAL_API_SECRET) and the client IP otherwise;
+  ids in request bodies are never trusted. Without a secret every visitor
+  would arrive from the frontend server's IP and share one bucket, so this
+  layer is off until INTERNAL_API_SECRET is set;
+- a concurrency gate per provider ("llm", "image", "tts"). Calls queue for a
+  slot; when the queue is full, or a slot does not free up in time, the
+  call is rejected at once instead of piling onto the provider.
+
+Rejections raise AdmissionRejected, which main.py turns into
+429 Too Many Requests with a Retry-After header.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from app.core import cancellation
+from app.core.config import settings
+
+MAX_TRACKED_USERS = 10_000
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_s: float, burst: float):
+        self.rate = rate_per_s
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """
+        Consume `cost` tokens. Returns 0 on success, else seconds until enough
+        tokens exist; math.inf if `cost` is more than the bucket can ever hold.
+        """
+        if cost > self.capacity:
+            return math.inf
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if self.rate <= 0:
+            return 60.0
+        return (cost - self.tokens) / self.rate
+
+
+class UserRateLimiter:
+    def __init__(self, per_minute: float, burst: float):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, user: str, cost: float = 1.0):
+        bucket = self.buckets.get(user)
+        if bucket is None:
+            bucket = self.buckets[user] = TokenBucket(self.rate, self.burst)
+            if len(self.buckets) > MAX_TRACKED_USERS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(user)
+        wait = bucket.take(cost)
+        if wait == math.inf:
+            raise AdmissionRejected(f"Request costs {cost:g}, more than the burst of {self.burst:g}", 60.0)
+        if wait:
+            raise AdmissionRejected(f"Rate limit exceeded for {user}", wait)
+
+
+class ProviderGate:
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rejected = 0
+        self.avg_hold_s = 1.0
+
+    def retry_after(self) -> float:
+        # Rough time for the queue ahead of us to drain
+        return self.avg_hold_s * (self.waiting + 1) / max(1, self.limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(f"{self.name} provider saturated", self.retry_after())
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AdmissionRejected(f"{self.name} provider saturated", self.retry_after())
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.avg_hold_s = 0.8 * self.avg_hold_s + 0.2 * (time.monotonic() - started)
+            self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "peak_in_flight": self.peak_in_flight,
+            "rejected": self.rejected,
+            "avg_hold_s": round(self.avg_hold_s, 3),
+        }
+
+
+_gates: Dict[str, ProviderGate] = {}
+_users = None
+
+
+def _gate(provider: str) -> ProviderGate:
+    gate = _gates.get(provider)
+    if gate is None:
+        limits = {
+            "llm": settings.LLM_MAX_CONCURRENCY,
+            "image": settings.IMAGE_MAX_CONCURRENCY,
+            "tts": settings.TTS_MAX_CONCURRENCY,
+        }
+        gate = _gates[provider] = ProviderGate(
+            provider, limits[provider], settings.ADMISSION_MAX_QUEUE, settings.ADMISSION_QUEUE_TIMEOUT_S
+        )
+    return gate
+
+
+@asynccontextmanager
+async def slot(provider: str):
+    """Hold one of the provider's concurrency slots for the duration of the block."""
+    if not settings.ADMISSION_ENABLED:
+        async with cancellation.tracked(provider):
+            yield
+        return
+    async with _gate(provider).slot(), cancellation.tracked(provider):
+        yield
+
+
+def user_limits_enabled() -> bool:
+    """Per-user buckets need a trusted caller to name the user; see the module docstring."""
+    return bool(settings.ADMISSION_ENABLED and settings.INTERNAL_API_SECRET)
+
+
+def check_user(user: str, cost: float = 1.0):
+    """Charge `cost` to the user's token bucket or raise AdmissionRejected."""
+    global _users
+    if not user_limits_enabled():
+        return
+    if _users is None:
+        _users = UserRateLimiter(settings.USER_RATE_PER_MINUTE, settings.USER_RATE_BURST)
+    _users.check(user or "anonymous", cost)
+
+
+def stats() -> dict:
+    return {name: gate.stats() for name, gate in _gates.items()}
+
+
+def reset():
+    """Drop all buckets and gates (settings changed, new event loop)."""
+    global _users
+    _gates.clear()
+    _users = None
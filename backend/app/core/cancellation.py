@@ -0,0 +1,139 @@
+"""
+Cancelling provider work when the client goes away.
+
+Uvicorn does not cancel a (non-streaming) endpoint when its client
+disconnects: the user navigates away or axios times out, and the story LLM
+call, image prompts, images and every TTS paragraph still run to completion
+for a response nobody reads.
+
+- `until_disconnected(http_request, work)` runs the endpoint's work as a
+  task and waits on the ASGI receive channel, which yields http.disconnect
+  once the request body has been read and the client is gone. On disconnect
+  the work is cancelled and ClientDisconnected raised (main.py answers 499,
+  which only the access log sees). Cancellation propagates down to the
+  provider calls: streamed story generations are closed, httpx requests and
+  edge-tts websockets are torn down. Work shared through single-flight is
+  only cancelled when its last waiter leaves.
+- `tracked(provider)` wraps each provider call (admission.slot does this). It
+  keeps a moving average of completed call times per provider; a call that
+  is cancelled records the seconds it had already used (wasted) and the
+  expected remainder (reclaimed) for /cancellation/stats.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Dict, List, TypeVar
+
+from starlette.requests import Request
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def _wait_for_disconnect(http_request: Request):
+    while True:
+        message = await http_request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def until_disconnected(http_request: Request, work: Awaitable[T]) -> T:
+    """Await `work`, cancelling it if the client disconnects first."""
+    if not settings.CANCEL_ON_DISCONNECT:
+        return await work
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.create_task(_wait_for_disconnect(http_request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            # Either the client left or this handler itself was cancelled
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+    if task.cancelled() and watcher.done() and not watcher.cancelled():
+        path = http_request.url.path
+        _disconnects[path] = _disconnects.get(path, 0) + 1
+        logger.info(f"Client disconnected from {path}; cancelled its provider work")
+        raise ClientDisconnected(path)
+    return task.result()
+
+
+# Provider time accounting
+
+class _ProviderTimes:
+    __slots__ = ("completed", "cancelled", "avg_s", "wasted_s", "reclaimed_s", "unsettled")
+
+    def __init__(self):
+        self.completed = 0
+        self.cancelled = 0
+        self.avg_s = None
+        self.wasted_s = 0.0
+        self.reclaimed_s = 0.0
+        # Elapsed times of calls cancelled before any call of this provider completed
+        self.unsettled: List[float] = []
+
+    def on_cancelled(self, elapsed: float):
+        self.cancelled += 1
+        self.wasted_s += elapsed
+        if self.avg_s is None:
+            self.unsettled.append(elapsed)
+        else:
+            self.reclaimed_s += max(0.0, self.avg_s - elapsed)
+
+    def on_completed(self, elapsed: float):
+        self.completed += 1
+        self.avg_s = elapsed if self.avg_s is None else 0.8 * self.avg_s + 0.2 * elapsed
+        for cancelled_at in self.unsettled:
+            self.reclaimed_s += max(0.0, self.avg_s - cancelled_at)
+        self.unsettled.clear()
+
+    def stats(self) -> dict:
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "avg_call_s": round(self.avg_s, 3) if self.avg_s is not None else None,
+            "wasted_s": round(self.wasted_s, 2),
+            "reclaimed_s": round(self.reclaimed_s, 2),
+        }
+
+
+_providers: Dict[str, _ProviderTimes] = {}
+_disconnects: Dict[str, int] = {}
+
+
+@asynccontextmanager
+async def tracked(provider: str):
+    """Time one provider call; a cancelled call counts what it used and what it would still have used."""
+    times = _providers.setdefault(provider, _ProviderTimes())
+    started = time.monotonic()
+    try:
+        yield
+    except asyncio.CancelledError:
+        times.on_cancelled(time.monotonic() - started)
+        raise
+    times.on_completed(time.monotonic() - started)
+
+
+def stats() -> dict:
+    return {
+        "disconnects": dict(_disconnects),
+        "providers": {name: times.stats() for name, times in _providers.items()},
+        "reclaimed_s": round(sum(times.reclaimed_s for times in _providers.values()), 2),
+    }
+
+
+def reset():
+    _providers.clear()
+    _disconnects.clear()
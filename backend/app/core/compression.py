@@ -0,0 +1,98 @@
+"""
+Response compression for the API.
+
+Story responses carry the full text (and sometimes base64 images) and audio
+responses thousands of alignment entries; both compress several-fold.
+CompressionMiddleware is Starlette's GZipMiddleware plus brotli:
+
+- clients that accept "br" get brotli when the `brotli` package is installed
+  (in requirements.txt; without it they fall back to gzip), others that
+  accept "gzip" get gzip;
+- bodies under RESPONSE_COMPRESSION_MIN_BYTES go out as they are, as do
+  audio/images (Starlette's excluded content types) and anything that
+  already has a Content-Encoding;
+- /media is left alone: audio does not compress, JSON sidecars are stored
+  precompressed, and compressing on the fly would serve different bytes
+  under the same strong ETag.
+
+Levels are chosen for dynamic content (gzip 6, brotli 4): close to the best
+ratio for JSON at a fraction of the CPU of the maximum settings. Bodies of
+128 KiB or more are compressed in a worker thread, as GZipMiddleware does.
+"""
+from typing import Set
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder, IdentityResponder
+from starlette.types import Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+THREAD_MINIMUM_SIZE = 128 * 1024
+# Served by app.api.media, which handles its own encodings
+UNCOMPRESSED_PREFIXES = ("/media/",)
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Content codings in an Accept-Encoding header, minus those refused with q=0."""
+    codings = set()
+    for part in header.split(","):
+        coding, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding.strip() and quality > 0:
+            codings.add(coding.strip().lower())
+    return codings
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self._compress_body, body, more_body)
+        return self._compress_body(body, more_body)
+
+    def _compress_body(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=self.quality)
+        if more_body:
+            # Streaming (NDJSON batches): flush so each line reaches the client as it is produced
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        super().__init__(app, minimum_size=minimum_size, compresslevel=gzip_level,
+                         thread_minimum_size=THREAD_MINIMUM_SIZE)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(UNCOMPRESSED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        codings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        options = {"exclude_content_types": self.exclude_content_types}
+        if "br" in codings and brotli is not None:
+            responder = BrotliResponder(self.app, self.minimum_size, self.brotli_quality, **options)
+        elif "gzip" in codings:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel,
+                                      thread_minimum_size=self.thread_minimum_size, **options)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, **options)
+        await responder(scope, receive, send)
@@ -7,6 +7,141 @@ class Settings(BaseSettings):
     GEMINI_API_KEY: Optional[str] = ""
     GROQ_API_KEY: Optional[str] = ""
     OPENROUTER_API_KEY: Optional[str] = ""
+
+    # Development diagnostics: event-loop lag sampling and blocking-call stack traces
+    DIAGNOSTICS_ENABLED: bool = False
+    DIAGNOSTICS_LAG_THRESHOLD_MS: float = 100.0
+    DIAGNOSTICS_SAMPLE_INTERVAL_MS: float = 20.0
+
+    # Fraction of DEBUG/INFO provider payload summaries to log (warnings and errors are never sampled)
+    LOG_PAYLOAD_SAMPLE_RATE: float = 1.0
+
+    # Generated media storage: "local" (MEDIA_ROOT, sharded) or "s3" (any S3-compatible store, needs boto3)
+    MEDIA_STORAGE: str = "local"
+    MEDIA_ROOT: str = "media"
+    MEDIA_PUBLIC_BASE_URL: Optional[str] = ""  # e.g. a CDN in front of the bucket; empty = proxy via /media
+    S3_BUCKET: Optional[str] = ""
+    S3_ENDPOINT_URL: Optional[str] = ""  # e.g. http://localhost:9000 for MinIO
+    S3_REGION: Optional[str] = ""
+    S3_ACCESS_KEY_ID: Optional[str] = ""
+    S3_SECRET_ACCESS_KEY: Optional[str] = ""
+    S3_PREFIX: Optional[str] = ""
+    # Periodic GC of crash leftovers and, if MEDIA_RETENTION_DAYS > 0, of old media. 0 disables.
+    MEDIA_GC_INTERVAL_MINUTES: float = 0
+    MEDIA_RETENTION_DAYS: float = 0
+    # Also store word alignment as a (precompressed) JSON file and return its URL as alignmentUrl
+    AUDIO_ALIGNMENT_SIDECAR: bool = False
+    # Store each narrated paragraph (by text + voice) so edited/forked stories only synthesize what changed
+    AUDIO_SEGMENT_CACHE: bool = True
+    # Output profile when AudioRequest.audioFormat is empty (app.services.audio_formats); compact ones need ffmpeg
+    AUDIO_DEFAULT_FORMAT: str = "standard"
+    FFMPEG_PATH: Optional[str] = ""  # empty = look up ffmpeg on PATH
+
+    # POST /api/generate/batch
+    BATCH_MAX_ITEMS: int = 50
+    BATCH_MAX_CONCURRENCY: int = 4  # concurrent story LLM calls (and, separately, image jobs) per batch
+
+    # Admission control (app.core.admission): per-user token bucket + per-provider concurrency
+    ADMISSION_ENABLED: bool = True
+    USER_RATE_PER_MINUTE: float = 10  # stories (and audio requests) per user per minute
+    USER_RATE_BURST: float = 5
+    LLM_MAX_CONCURRENCY: int = 8
+    IMAGE_MAX_CONCURRENCY: int = 4
+    TTS_MAX_CONCURRENCY: int = 8  # concurrent /generate-audio jobs
+    ADMISSION_MAX_QUEUE: int = 32  # waiters per provider before rejecting outright
+    ADMISSION_QUEUE_TIMEOUT_S: float = 30
+    # Must equal the frontend's BACKEND_API_SECRET. Requests carrying it in X-Internal-Secret are
+    # rate-limited by their X-User-Id, everyone else by client IP. Empty = no per-user limit (all
+    # visitors share the frontend server's IP), only the provider concurrency gates apply.
+    INTERNAL_API_SECRET: Optional[str] = ""
+
+    # Speculative audio for new stories (StoryRequest.preloadAudio; app.services.audio_prefetch)
+    AUDIO_PREFETCH_MAX_JOBS: int = 2  # background syntheses at once; 0 disables
+    AUDIO_PREFETCH_MAX_TTS_LOAD: float = 0.5  # skip while live TTS jobs / TTS_MAX_CONCURRENCY is at or above this
+    AUDIO_PREFETCH_TTL_MINUTES: float = 30
+    AUDIO_PREFETCH_MAX_RESULTS: int = 256
+
+    # Cancel a request's provider work when its client disconnects (app.core.cancellation)
+    CANCEL_ON_DISCONNECT: bool = True
+
+    # gzip/brotli for API responses (app.core.compression); brotli needs the brotli package
+    RESPONSE_COMPRESSION: bool = True
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024  # smaller bodies are sent as they are
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_BROTLI_QUALITY: int = 4
+
+    # Coalesce concurrent identical story/audio/extraction calls (app.core.singleflight)
+    SINGLE_FLIGHT_ENABLED: bool = True
+
+    # Story text generation: "standard" (one JSON call) or "fast" (outline, then sections in parallel;
+    # app.services.fast_story). Requests may override with `mode`.
+    STORY_DEFAULT_MODE: str = "standard"
+    FAST_STORY_TARGET_WORDS: int = 900  # split evenly across the outline's sections
+
+    # Model ladders for short auxiliary LLM calls, smallest first (app.services.model_tiers).
+    # A call moves to the next model only when the previous one fails or its output is invalid.
+    AUX_MODELS: dict = {
+        "groq.image_prompts": ["llama-3.1-8b-instant", "llama-3.3-70b-versatile"],
+        "gemini.image_prompts": ["gemini-2.5-flash-lite", "gemini-1.5-flash"],
+        "gemini.extraction": ["gemini-2.5-flash-lite", "gemini-1.5-flash"],
+        "gemini.chat": ["gemini-2.5-flash-lite", "gemini-1.5-flash"],
+        "gemini.chat_summary": ["gemini-2.5-flash-lite", "gemini-1.5-flash"],
+    }
+    AUX_MODEL_ESCALATION: bool = True  # False = first model only
+
+    # Character chat memory (app.services.chat_memory): budgets per prompt part; False = last 5 messages
+    CHAT_MEMORY_ENABLED: bool = True
+    CHAT_CONTEXT_CHARS: int = 4000  # story excerpt, in characters so every script keeps the same share
+    CHAT_SUMMARY_TOKENS: int = 200  # rolling summary of turns older than the recent window
+    CHAT_HISTORY_TOKENS: int = 400  # recent turns kept verbatim
+    CHAT_SUMMARY_MAX_JOBS: int = 4  # background summaries at once
+    CHAT_MEMORY_MAX_SUMMARIES: int = 2048
+
+    # Repair slightly malformed LLM JSON locally and validate it before failing (app.services.llm_output);
+    # False = plain json.loads as before
+    LLM_OUTPUT_REPAIR: bool = True
+
+    # Story length control (app.services.story_limits)
+    STORY_TOKEN_BUDGETS: bool = True  # max tokens from the prompt's word range and language; False = 8192
+    STORY_TOKEN_MARGIN: float = 1.3
+    # Gemini's story model thinks before answering, and its thinking counts against max_output_tokens
+    # (the SDK in use cannot set a thinking budget); this much is added on top of the story budget
+    STORY_THINKING_TOKENS: int = 4096
+    STORY_EARLY_STOP: bool = True  # stop streaming once the JSON object closes or the model starts looping
+    STORY_REPEAT_MIN_WORDS: int = 6  # shorter sentences may legitimately repeat
+    STORY_REPEAT_MAX: int = 3  # occurrences of one sentence that count as a loop
+
+    # Reuse a past story for near-identical topics (app.services.story_index)
+    STORY_REUSE_ENABLED: bool = False
+    STORY_REUSE_THRESHOLD: float = 0.75  # Jaccard similarity of topic trigrams
+    STORY_INDEX_PATH: str = "story_index.json"  # "" keeps the index in memory only
+    STORY_INDEX_MAX_ENTRIES: int = 10_000
+    STORY_INDEX_SAVE_INTERVAL_S: float = 30
+
+    # Background pre-generation of popular preset combinations (app.services.warm_cache)
+    WARM_ENABLED: bool = False
+    WARM_INTERVAL_MINUTES: float = 30
+    WARM_OFFPEAK_HOURS: str = "1-6"  # server-local "start-end"; "" = any time
+    WARM_TOP_N: int = 20
+    WARM_BUDGET_PER_RUN: int = 5  # combinations (story + images + audio) generated per run
+    WARM_MIN_SCORE: float = 3  # decayed request count needed to be worth warming
+    WARM_TTL_HOURS: float = 24
+    WARM_POPULARITY_HALF_LIFE_HOURS: float = 72
+    WARM_POPULARITY_PATH: str = "warm_popularity.json"
+
+    # Prompt-to-image cache in blob storage (app.services.image_cache)
+    IMAGE_CACHE_ENABLED: bool = True
+    IMAGE_CACHE_MEMORY_ENTRIES: int = 1024  # hot prompt pointers kept in memory
+    IMAGE_PHASH_DEDUPE: bool = True  # needs Pillow; skipped when it is not installed
+    IMAGE_PHASH_MAX_DISTANCE: int = 4  # of 64 dHash bits
+
+    # Image tiers (app.services.image_tiers): rich=3 images, standard=2, lite=1
+    IMAGE_TIERS_ADAPTIVE: bool = True  # cap the requested tier by image provider load
+    IMAGE_TIER_AUTO_MAX: str = "standard"  # best tier "auto" gets when the provider is idle; "rich" costs more
+    IMAGE_TIER_RICH_MODEL: str = "black-forest-labs/flux.2-pro"  # "" = same model as the other tiers
+    IMAGE_TIER_RICH_MAX_PRESSURE: float = 0.5  # images in progress / IMAGE_MAX_CONCURRENCY below which rich is allowed
+    IMAGE_TIER_LITE_PRESSURE: float = 1.5  # at or above this, only lite
+    IMAGE_TIER_SLOW_S: float = 20  # recent seconds per image at or above which only lite
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,215 @@
+"""
+Development diagnostics: event-loop lag sampling and blocking-call detection.
+
+A heartbeat coroutine ticks on the event loop every few milliseconds. A
+watchdog thread checks the heartbeat; when the loop has not ticked for longer
+than the threshold it captures the loop thread's stack, so we can see exactly
+which endpoint and service function is holding the loop (sync SDK calls,
+file writes, huge json.dumps, ...).
+
+Enable with DIAGNOSTICS_ENABLED=true. Off by default, zero cost when off.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Frames from these paths are used to attribute a stall
+ENDPOINT_MARKER = "app/api/"
+SERVICE_MARKER = "app/services/"
+
+
+class LoopMonitor:
+    def __init__(self, threshold_ms: float = 100.0, interval_ms: float = 20.0, report_every_s: float = 60.0):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.report_every = report_every_s
+        self.lags: List[float] = []
+        self.stalls: Dict[str, dict] = {}
+        # Task -> "METHOD /path"; child tasks inherit their parent's label
+        self.task_labels = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = 0.0
+        self._stop = threading.Event()
+        self._heartbeat_task = None
+        self._watchdog = None
+        self._previous_task_factory = None
+        self._open_stall: Optional[str] = None
+
+    # Lifecycle
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._previous_task_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Loop diagnostics enabled (threshold={self.threshold * 1000:.0f}ms, interval={self.interval * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._stop.set()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog:
+            self._watchdog.join(timeout=1.0)
+        if self._loop:
+            self._loop.set_task_factory(self._previous_task_factory)
+        self.log_summary()
+
+    # Request attribution
+
+    def label_current_task(self, label: str):
+        task = asyncio.current_task()
+        if task is not None:
+            self.task_labels[task] = label
+
+    def unlabel_current_task(self):
+        task = asyncio.current_task()
+        if task is not None:
+            self.task_labels.pop(task, None)
+
+    def _task_factory(self, loop, coro, **kwargs):
+        if self._previous_task_factory is not None:
+            task = self._previous_task_factory(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        parent = asyncio.current_task(loop)
+        if parent is not None:
+            label = self.task_labels.get(parent)
+            if label is not None:
+                self.task_labels[task] = label
+        return task
+
+    # Internals
+
+    async def _heartbeat(self):
+        last_report = time.monotonic()
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            # The watchdog only saw the stall in progress; record its full length now
+            stall_key, self._open_stall = self._open_stall, None
+            if stall_key and stall_key in self.stalls:
+                entry = self.stalls[stall_key]
+                entry["max_ms"] = max(entry["max_ms"], lag * 1000)
+            if now - last_report >= self.report_every:
+                self.log_summary()
+                last_report = now
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 4):
+            beat = self._last_beat
+            stalled_for = time.monotonic() - beat
+            # Report each stall once, while it is still in progress
+            if stalled_for > self.threshold and beat != reported_beat:
+                reported_beat = beat
+                self._report_stall(stalled_for)
+
+    def _report_stall(self, stalled_for: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+
+        endpoint = service = None
+        for entry in stack:
+            filename = entry.filename.replace("\\", "/")
+            if ENDPOINT_MARKER in filename:
+                endpoint = entry.name
+            if SERVICE_MARKER in filename:
+                service = f"{filename.rsplit('/', 1)[-1][:-3]}.{entry.name}"
+
+        label = None
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                label = self.task_labels.get(task)
+        except RuntimeError:
+            pass
+
+        key = f"{label or endpoint or '?'} -> {service or stack[-1].name}"
+        entry = self.stalls.setdefault(key, {"count": 0, "max_ms": 0.0})
+        entry["count"] += 1
+        entry["max_ms"] = max(entry["max_ms"], stalled_for * 1000)
+        self._open_stall = key
+
+        logger.warning(
+            f"Event loop blocked for >{stalled_for * 1000:.0f}ms "
+            f"(request={label}, endpoint={endpoint}, service={service})\n"
+            + "".join(traceback.format_list(stack[-12:]))
+        )
+
+    def summary(self) -> dict:
+        lags = sorted(self.lags)
+
+        def pct(p):
+            return lags[min(len(lags) - 1, int(p / 100 * len(lags)))] * 1000 if lags else 0.0
+
+        return {
+            "samples": len(lags),
+            "lag_p50_ms": pct(50),
+            "lag_p99_ms": pct(99),
+            "lag_max_ms": lags[-1] * 1000 if lags else 0.0,
+            "stalls": dict(sorted(self.stalls.items(), key=lambda kv: -kv[1]["max_ms"])),
+        }
+
+    def log_summary(self):
+        logger.info(f"Loop diagnostics: {self.summary()}")
+        self.lags.clear()
+
+
+monitor: Optional[LoopMonitor] = None
+
+
+class DiagnosticsMiddleware:
+    """
+    Plain ASGI middleware (not BaseHTTPMiddleware) so the label lands on the
+    task that actually runs the endpoint.
+    """
+
+    def __init__(self, app, monitor: LoopMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self.monitor.label_current_task(f"{scope['method']} {scope['path']}")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.unlabel_current_task()
+
+
+def install(app, settings) -> Optional[LoopMonitor]:
+    """Add the request-labelling middleware if diagnostics are enabled. Call before startup."""
+    global monitor
+    if not settings.DIAGNOSTICS_ENABLED:
+        return None
+
+    monitor = LoopMonitor(
+        threshold_ms=settings.DIAGNOSTICS_LAG_THRESHOLD_MS,
+        interval_ms=settings.DIAGNOSTICS_SAMPLE_INTERVAL_MS,
+    )
+    app.add_middleware(DiagnosticsMiddleware, monitor=monitor)
+    return monitor
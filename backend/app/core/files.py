@@ -0,0 +1,119 @@
+"""
+Async-friendly file persistence.
+
+Disk writes run in worker threads so they never stall the event loop, and
+final files appear atomically (write to a temp name, then os.replace) so a
+reader never sees a half-written MP3.
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+from typing import List
+
+WRITE_BUFFER_SIZE = 64 * 1024
+COPY_BUFFER_SIZE = 256 * 1024
+
+
+class AsyncFileWriter:
+    """
+    Buffers small writes in memory and flushes them to disk from a worker
+    thread once WRITE_BUFFER_SIZE is reached. Peak memory is one buffer.
+
+        writer = await AsyncFileWriter.open(path)
+        await writer.write(chunk)
+        await writer.close()
+    """
+
+    def __init__(self, path: str, handle):
+        self.path = path
+        self.bytes_written = 0
+        self._handle = handle
+        self._buffer = bytearray()
+
+    @classmethod
+    async def open(cls, path: str) -> "AsyncFileWriter":
+        handle = await asyncio.to_thread(open, path, "wb")
+        return cls(path, handle)
+
+    async def write(self, data: bytes):
+        self._buffer.extend(data)
+        self.bytes_written += len(data)
+        if len(self._buffer) >= WRITE_BUFFER_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        if self._buffer:
+            data, self._buffer = bytes(self._buffer), bytearray()
+            await asyncio.to_thread(self._handle.write, data)
+
+    async def close(self):
+        if self._handle is None:
+            return
+        try:
+            await self.flush()
+        finally:
+            handle, self._handle = self._handle, None
+            await asyncio.to_thread(handle.close)
+
+    async def discard(self):
+        """Close without flushing and delete the file."""
+        self._buffer = bytearray()
+        if self._handle is not None:
+            handle, self._handle = self._handle, None
+            await asyncio.to_thread(handle.close)
+        await remove_files([self.path])
+
+
+def _concat_atomic(parts: List[str], dest: str) -> str:
+    tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+    digest = hashlib.sha256()
+    try:
+        with open(tmp, "wb") as out:
+            for part in parts:
+                with open(part, "rb") as src:
+                    while True:
+                        block = src.read(COPY_BUFFER_SIZE)
+                        if not block:
+                            break
+                        digest.update(block)
+                        out.write(block)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return digest.hexdigest()
+
+
+async def concat_atomic(parts: List[str], dest: str) -> str:
+    """
+    Concatenate part files into `dest` in a worker thread; `dest` appears atomically.
+    Returns the SHA-256 hex digest of the result (used for content-addressed names).
+    """
+    return await asyncio.to_thread(_concat_atomic, parts, dest)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+async def write_atomic(path: str, data: bytes):
+    """Write a small file from a worker thread; it appears atomically."""
+    await asyncio.to_thread(_write_atomic, path, data)
+
+
+def _remove_files(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+async def remove_files(paths: List[str]):
+    if paths:
+        await asyncio.to_thread(_remove_files, paths)
@@ -0,0 +1,95 @@
+"""
+Cheap structured logging for provider calls.
+
+Provider responses can carry multi-megabyte base64 images, so never
+serialize them just to log a preview. `log_event` is level-gated (nothing is
+formatted when the level is disabled), optionally sampled, measures sizes
+instead of dumping bodies and redacts anything that looks like a credential.
+
+    log_event(logger, logging.INFO, "openrouter.response", status=200, body=result)
+    -> openrouter.response status=200 body={choices:[{message:{content:'', images:[{image_url:{url:data:image/png(812367B)}}]}}]}
+
+Error bodies are small and their text is the point, so wrap them in
+`preview()` to log the first ERROR_PREVIEW_CHARS characters instead of a size.
+"""
+import logging
+import random
+from typing import Any
+
+from app.core.config import settings
+
+REDACT_KEYS = ("api_key", "apikey", "access_token", "secret", "authorization", "password", "cookie")
+MAX_STR_PREVIEW = 80
+MAX_ITEMS = 5
+MAX_DEPTH = 8
+ERROR_PREVIEW_CHARS = 300
+
+
+class Preview(str):
+    """Text that `describe` shows as is; built by `preview()`, already truncated."""
+
+
+def preview(body: Any) -> Preview:
+    """One-line, truncated text of an error body (bytes or str) for log_event."""
+    if isinstance(body, (bytes, bytearray)):
+        body = bytes(body[:ERROR_PREVIEW_CHARS * 4]).decode(errors="replace")
+    text = " ".join(str(body).split())
+    if len(text) > ERROR_PREVIEW_CHARS:
+        text = f"{text[:ERROR_PREVIEW_CHARS]}...(+{len(text) - ERROR_PREVIEW_CHARS} chars)"
+    return Preview(text)
+
+
+def _redacted(key: str) -> bool:
+    key = key.lower().replace("-", "_")
+    return key == "token" or any(marker in key for marker in REDACT_KEYS)
+
+
+def describe(value: Any, depth: int = 0) -> str:
+    """Compact shape/size description of a value. Cost is O(structure), never O(bytes)."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return repr(value)
+    if isinstance(value, Preview):
+        return repr(str(value))
+    if isinstance(value, str):
+        if value.startswith("data:"):
+            mime = value[5:value.find(";")] if ";" in value[:64] else "data"
+            return f"data:{mime}({len(value)}B)"
+        if len(value) > MAX_STR_PREVIEW:
+            return f"str({len(value)})"
+        return repr(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"bytes({len(value)})"
+    if depth >= MAX_DEPTH:
+        return f"{type(value).__name__}(...)"
+    if isinstance(value, dict):
+        parts = []
+        for i, (k, v) in enumerate(value.items()):
+            if i >= MAX_ITEMS:
+                parts.append(f"+{len(value) - MAX_ITEMS} more")
+                break
+            parts.append(f"{k}:{'***' if _redacted(str(k)) else describe(v, depth + 1)}")
+        return "{" + ", ".join(parts) + "}"
+    if isinstance(value, (list, tuple)):
+        parts = [describe(v, depth + 1) for v in value[:MAX_ITEMS]]
+        if len(value) > MAX_ITEMS:
+            parts.append(f"+{len(value) - MAX_ITEMS} more")
+        return "[" + ", ".join(parts) + "]"
+    return f"<{type(value).__name__}>"
+
+
+def log_event(logger: logging.Logger, level: int, event: str, sample_rate: float = None, **fields):
+    """
+    Log `event key=value ...` where every value goes through `describe`.
+    `sample_rate` (default settings.LOG_PAYLOAD_SAMPLE_RATE) only applies below WARNING,
+    so errors are always logged.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if level < logging.WARNING:
+        rate = settings.LOG_PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+        if rate < 1.0 and random.random() >= rate:
+            return
+    parts = [event]
+    for key, value in fields.items():
+        parts.append(f"{key}={'***' if _redacted(key) else describe(value)}")
+    logger.log(level, " ".join(parts))
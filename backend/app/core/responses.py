@@ -0,0 +1,35 @@
+"""
+JSON encoding of API responses.
+
+Routes that declare a response model (/generate, /generate-audio,
+/audio-jobs) are serialized by FastAPI straight to bytes in pydantic-core:
+no jsonable_encoder walk over every alignment entry, no json.dumps. That
+covers the large payloads.
+
+Everything else (stats, chat, extraction, errors) still goes through
+jsonable_encoder; JSONResponse here renders the result with orjson when it
+is installed (in requirements.txt) and with the standard library
+otherwise. `dumps` is the same encoder for places that write JSON
+themselves, such as the NDJSON batch stream. FastAPI's own ORJSONResponse
+is deprecated in favour of response models, hence this small class.
+"""
+import json
+from typing import Any
+
+from starlette.responses import JSONResponse as StarletteJSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class JSONResponse(StarletteJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,95 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+
+When a story goes viral, many clients ask for the same audio, character
+extraction or story at the same moment. `flight.do(key, fn)` runs `fn()`
+once per key while it is in flight; every concurrent caller with the same
+key awaits that one task and gets its result (or its exception).
+
+Cancellation rules:
+- a caller that is cancelled (client disconnected) only stops waiting; the
+  shared call keeps running for the others;
+- when the last waiter leaves, the shared call is cancelled and forgotten,
+  so a later caller starts a fresh one instead of joining a dying task.
+
+Results are shared, not copied: callers must treat them as read-only.
+"""
+import asyncio
+import hashlib
+import json
+import re
+from typing import Any, Awaitable, Callable, Dict
+
+from app.core.config import settings
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return re.sub(r"[ \t]+", " ", value.replace("\r\n", "\n")).strip()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def payload_key(namespace: str, payload: dict) -> str:
+    """Stable key for a request payload; insignificant whitespace is ignored."""
+    encoded = json.dumps(_normalize(payload), sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}:{hashlib.sha256(encoded.encode('utf-8')).hexdigest()}"
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await fn()
+
+        call = self._calls.get(key)
+        if call is None:
+            call = self._calls[key] = _Call(asyncio.create_task(fn()))
+            call.task.add_done_callback(lambda task, key=key, call=call: self._finished(key, call))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # shield: cancelling one waiter must not cancel the shared task
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _finished(self, key: str, call: _Call):
+        self._forget(key, call)
+        # Nobody may be left to see the exception; retrieve it so asyncio does not warn
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {"started": self.started, "coalesced": self.coalesced, "in_flight": self.in_flight()}
+
+
+flight = SingleFlight()
@@ -0,0 +1,183 @@
+"""
+Compact audio output profiles for /generate-audio (AudioRequest.audioFormat).
+
+edge-tts always returns audio-24khz-48kbitrate-mono-mp3: 7.3.x hardcodes the
+output format in its speech.config message and Communicate has no option to
+change it. Narration is speech, and mono speech is perfectly intelligible at
+a fraction of that, so a request may ask for a smaller profile:
+
+    standard   48 kbps MP3   what edge-tts produced, served as is
+    mp3-32k    32 kbps MP3   plays everywhere
+    mp3-24k    24 kbps MP3
+    opus-24k   24 kbps Opus in WebM; better than MP3 at the same rate
+    opus-16k   16 kbps Opus in WebM
+
+Compact profiles are encoded by ffmpeg (optional, found on PATH or at
+FFMPEG_PATH) from the merged 48 kbps file, once per story and profile:
+
+- Paragraphs are still synthesized, cached as segments and merged as MP3,
+  and the alignment is computed from those CBR bytes exactly as before;
+  transcoding the merged file keeps every offset valid. Encoding each
+  paragraph separately would add the encoder's priming delay at every
+  paragraph boundary instead of once, which ffmpeg records in the
+  container (LAME gapless header / WebM CodecDelay) for players to trim.
+- The output is stored next to the source as "audio/<source hash>.<kbps>k.<ext>"
+  and reused if it already exists.
+- Without ffmpeg, or if encoding fails, the response falls back to standard
+  and says so in audioFormat.
+"""
+import asyncio
+import logging
+import os
+import shutil
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+from app.core.files import AsyncFileWriter, remove_files
+from app.services.registry import providers
+from app.services.storage import BlobStorage, LocalStorage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    name: str
+    bitrate: int  # bits per second
+    ext: str
+    content_type: str
+    codec: str = ""  # ffmpeg encoder; "" = the synthesized MP3 as is
+
+    @property
+    def bytes_per_s(self) -> float:
+        return self.bitrate / 8
+
+
+STANDARD = AudioFormat("standard", 48_000, "mp3", "audio/mpeg")
+
+PROFILES = {
+    fmt.name: fmt for fmt in (
+        STANDARD,
+        AudioFormat("mp3-32k", 32_000, "mp3", "audio/mpeg", "libmp3lame"),
+        AudioFormat("mp3-24k", 24_000, "mp3", "audio/mpeg", "libmp3lame"),
+        AudioFormat("opus-24k", 24_000, "webm", "audio/webm", "libopus"),
+        AudioFormat("opus-16k", 16_000, "webm", "audio/webm", "libopus"),
+    )
+}
+
+_counts = {"encoded": 0, "reused": 0, "fallback": 0}
+
+
+def choose(name: Optional[str]) -> AudioFormat:
+    """The requested profile; unknown or empty names get AUDIO_DEFAULT_FORMAT."""
+    name = (name or settings.AUDIO_DEFAULT_FORMAT or "standard").lower()
+    return PROFILES.get(name) or PROFILES.get(settings.AUDIO_DEFAULT_FORMAT, STANDARD)
+
+
+def output_key(source_key: str, fmt: AudioFormat) -> str:
+    """Storage key of `source_key` (a merged "audio/<hash>.mp3") in `fmt`."""
+    if fmt is STANDARD:
+        return source_key
+    return f"{source_key.rsplit('.', 1)[0]}.{fmt.bitrate // 1000}k.{fmt.ext}"
+
+
+class FfmpegTranscoder:
+    """Runs ffmpeg as a subprocess; the event loop only waits on it."""
+
+    def __init__(self, binary: str):
+        self.binary = binary
+
+    def command(self, source: str, target: str, fmt: AudioFormat) -> list:
+        args = [self.binary, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                "-i", source, "-vn", "-ac", "1", "-c:a", fmt.codec, "-b:a", str(fmt.bitrate)]
+        if fmt.codec == "libopus":
+            # Tuned for speech rather than music
+            args += ["-application", "voip"]
+        return args + ["-f", fmt.ext, target]
+
+    async def transcode(self, source: str, target: str, fmt: AudioFormat):
+        process = await asyncio.create_subprocess_exec(
+            *self.command(source, target, fmt),
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg exited with {process.returncode}: {stderr.decode(errors='replace')[-300:]}")
+
+
+def _load_ffmpeg() -> Optional[FfmpegTranscoder]:
+    """None when ffmpeg simply isn't installed; an explicit FFMPEG_PATH that is missing is an error."""
+    if settings.FFMPEG_PATH:
+        if not os.path.exists(settings.FFMPEG_PATH):
+            raise RuntimeError(f"FFMPEG_PATH {settings.FFMPEG_PATH} does not exist")
+        return FfmpegTranscoder(settings.FFMPEG_PATH)
+    binary = shutil.which("ffmpeg")
+    if not binary:
+        logger.info("ffmpeg not found; compact audio formats fall back to standard")
+        return None
+    return FfmpegTranscoder(binary)
+
+
+providers.register("ffmpeg", _load_ffmpeg)
+
+
+async def _source_path(storage: BlobStorage, source_key: str) -> Optional[str]:
+    """A local path for the stored source; a scratch download for remote storage (caller removes it)."""
+    if isinstance(storage, LocalStorage):
+        return None
+    writer = await AsyncFileWriter.open(storage.scratch_path(".mp3"))
+    try:
+        async for chunk in storage.open_range(source_key):
+            await writer.write(chunk)
+    finally:
+        await writer.close()
+    return writer.path
+
+
+async def encode(storage: BlobStorage, source_key: str, fmt: AudioFormat, source_path: str = "") -> Optional[str]:
+    """
+    Store the merged audio `source_key` in `fmt` and return its key, or None
+    if it cannot be produced (the caller serves standard). `source_path` is
+    the merged file if the caller still has it on disk.
+    """
+    if fmt is STANDARD:
+        return source_key
+    key = output_key(source_key, fmt)
+    if await storage.stat(key) is not None:
+        _counts["reused"] += 1
+        return key
+    transcoder = providers.get("ffmpeg")
+    if transcoder is None:
+        _counts["fallback"] += 1
+        return None
+    downloaded = None
+    target = storage.scratch_path(f".{fmt.ext}")
+    try:
+        if not source_path:
+            downloaded = await _source_path(storage, source_key)
+            source_path = downloaded or storage.path_for(source_key)
+        await transcoder.transcode(source_path, target, fmt)
+        await storage.put_file(key, target, fmt.content_type)
+    except Exception as e:
+        logger.error(f"Could not encode {source_key} as {fmt.name}, serving standard: {e}")
+        _counts["fallback"] += 1
+        return None
+    finally:
+        await remove_files([target] + ([downloaded] if downloaded else []))
+    _counts["encoded"] += 1
+    return key
+
+
+def stats() -> dict:
+    return dict(_counts, ffmpeg=providers.get("ffmpeg") is not None)
+
+
+def reset():
+    for key in _counts:
+        _counts[key] = 0
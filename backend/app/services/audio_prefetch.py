@@ -0,0 +1,180 @@
+"""
+Speculative audio for freshly generated stories.
+
+Users almost always press "listen" on a new story and then wait for
+/generate-audio to synthesize every paragraph. With StoryRequest.preloadAudio
+the story endpoint starts that synthesis in the background as soon as the
+text is ready and returns an audioJobId:
+
+- the job narrates with the voice generate_story_audio would pick and is
+  keyed by (text as read aloud, voice), so a later /generate-audio for the
+  story joins the running job, or gets its result at once, whatever
+  language hint it sends;
+- GET /audio-jobs/{id} waits for the job and returns the audio; DELETE
+  cancels it, as does the client leaving /generate before its response;
+- the work is speculative, so it is budgeted: at most
+  AUDIO_PREFETCH_MAX_JOBS run at once, each holds an ordinary TTS admission
+  slot, and none start while live TTS load is at AUDIO_PREFETCH_MAX_TTS_LOAD
+  or above.
+
+Finished results are kept in memory for AUDIO_PREFETCH_TTL_MINUTES (at most
+AUDIO_PREFETCH_MAX_RESULTS). Failed and cancelled jobs are dropped from the
+lookup at once, so the next request synthesizes normally.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.core import admission
+from app.core.admission import AdmissionRejected
+from app.core.config import settings
+from app.core.singleflight import payload_key
+from app.services.audio_service import generate_story_audio, narration
+
+logger = logging.getLogger(__name__)
+
+
+class AudioJob:
+    __slots__ = ("id", "key", "task", "created")
+
+    def __init__(self, key: str, task: asyncio.Task):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.task = task
+        self.created = time.monotonic()
+
+    @property
+    def status(self) -> str:
+        if not self.task.done():
+            return "running"
+        if self.task.cancelled():
+            return "cancelled"
+        return "done" if self.task.exception() is None and self.task.result() else "failed"
+
+
+_jobs: "OrderedDict[str, AudioJob]" = OrderedDict()  # id -> job, oldest first
+_by_key: Dict[str, AudioJob] = {}
+_counts = {"scheduled": 0, "skipped_budget": 0, "completed": 0, "failed": 0, "cancelled": 0, "served": 0, "joined": 0}
+
+
+def _key(text: str, story_type: str, language: str) -> str:
+    clean_text, _, voice = narration(text, story_type, language)
+    return payload_key("audio_voice", {"text": clean_text, "voice": voice})
+
+
+def _tts_load() -> float:
+    tts = admission.stats().get("tts")
+    return tts["in_flight"] / max(1, tts["limit"]) if tts else 0.0
+
+
+def _expire():
+    ttl = settings.AUDIO_PREFETCH_TTL_MINUTES * 60
+    now = time.monotonic()
+    finished = [job for job in _jobs.values() if job.task.done()]
+    excess = len(finished) - settings.AUDIO_PREFETCH_MAX_RESULTS
+    for job in finished:
+        if excess > 0 or now - job.created > ttl:
+            _drop(job)
+            excess -= 1
+
+
+def _drop(job: AudioJob):
+    _jobs.pop(job.id, None)
+    if _by_key.get(job.key) is job:
+        del _by_key[job.key]
+
+
+def _finished(job: AudioJob):
+    status = job.status
+    _counts["completed" if status == "done" else status] += 1
+    if status != "done":
+        # Nothing to serve; a later request must not wait on this job
+        if _by_key.get(job.key) is job:
+            del _by_key[job.key]
+
+
+async def _synthesize(text: str, story_type: str, language: str) -> Optional[dict]:
+    try:
+        async with admission.slot("tts"):
+            return await generate_story_audio(text, story_type, language)
+    except AdmissionRejected as e:
+        logger.info(f"Audio prefetch skipped: {e.reason}")
+        return None
+
+
+def schedule(text: str, story_type: str, language: str) -> Optional[str]:
+    """Start background synthesis of `text` if the budget allows; returns the job id."""
+    if settings.AUDIO_PREFETCH_MAX_JOBS <= 0 or not text.strip():
+        return None
+    _expire()
+    key = _key(text, story_type, language)
+    existing = _by_key.get(key)
+    if existing:
+        return existing.id
+    running = sum(1 for job in _jobs.values() if not job.task.done())
+    if running >= settings.AUDIO_PREFETCH_MAX_JOBS or _tts_load() >= settings.AUDIO_PREFETCH_MAX_TTS_LOAD:
+        _counts["skipped_budget"] += 1
+        return None
+    job = AudioJob(key, asyncio.create_task(_synthesize(text, story_type, language)))
+    job.task.add_done_callback(lambda task, job=job: _finished(job))
+    _jobs[job.id] = job
+    _by_key[key] = job
+    _counts["scheduled"] += 1
+    return job.id
+
+
+def get(job_id: str) -> Optional[AudioJob]:
+    _expire()
+    return _jobs.get(job_id)
+
+
+async def result(job: AudioJob) -> Optional[dict]:
+    """The job's audio, waiting for it if it is still running; None if it failed or was cancelled."""
+    try:
+        # shield: a caller that goes away must not cancel the job for everyone else
+        return await asyncio.shield(job.task)
+    except asyncio.CancelledError:
+        if job.task.cancelled():
+            return None
+        raise
+    except Exception:
+        return None  # logged by generate_story_audio
+
+
+async def join(text: str, story_type: str, language: str) -> Optional[dict]:
+    """Audio for a /generate-audio request from a prefetch job, or None if there is none to use."""
+    if not _by_key:
+        return None
+    job = _by_key.get(_key(text, story_type, language))
+    if job is None:
+        return None
+    _counts["served" if job.task.done() else "joined"] += 1
+    return await result(job)
+
+
+def cancel(job_id: str) -> bool:
+    job = _jobs.get(job_id)
+    if job is None or job.task.done():
+        return False
+    job.task.cancel()
+    return True
+
+
+def cancel_all():
+    for job in list(_jobs.values()):
+        job.task.cancel()
+
+
+def stats() -> dict:
+    return dict(_counts, running=sum(1 for job in _jobs.values() if not job.task.done()), kept=len(_jobs))
+
+
+def reset():
+    cancel_all()
+    _jobs.clear()
+    _by_key.clear()
+    for key in _counts:
+        _counts[key] = 0
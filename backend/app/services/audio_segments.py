@@ -0,0 +1,102 @@
+"""
+Per-paragraph audio segments.
+
+An edited or forked story (Story.forkedFromId) usually differs from the
+original in a paragraph or two, yet used to go through edge-tts in full.
+generate_story_audio now stores each paragraph it synthesizes as a segment:
+
+    audio/segments/<sha256(voice, paragraph)>.mp3    the paragraph's audio
+    audio/segments/<sha256(voice, paragraph)>.json   {"bytes", "alignment"}
+
+with alignment relative to the start of the segment. When a story is
+narrated again, paragraphs whose text and voice are unchanged come from
+storage and only new or changed ones are synthesized; the merged MP3 and
+alignment are assembled from both with the same offsets a full synthesis
+would give.
+
+The .json is written after the .mp3, so a readable .json means the segment
+is complete. Segments are shared between stories and no story references
+them, so gc_media.py leaves them out of reference GC and deletes them by
+age (--segment-max-age-days); the retention sweep ages them out like the
+merged files.
+"""
+import hashlib
+import json
+import logging
+from typing import Optional
+
+from app.core.files import AsyncFileWriter, write_atomic
+from app.services.storage import BlobStorage, LocalStorage
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = "audio/segments/"
+
+_counts = {"reused": 0, "missed": 0, "stored": 0, "store_failed": 0}
+
+
+def segment_key(text: str, voice: str) -> str:
+    """Storage key of the segment, without extension."""
+    digest = hashlib.sha256(f"{voice}\n{text}".encode("utf-8")).hexdigest()
+    return f"{SEGMENT_PREFIX}{digest}"
+
+
+async def _read(storage: BlobStorage, key: str) -> Optional[bytes]:
+    if await storage.stat(key) is None:
+        return None
+    return b"".join([chunk async for chunk in storage.open_range(key)])
+
+
+async def load(storage: BlobStorage, key: str, path: str) -> Optional[dict]:
+    """
+    A stored segment in the shape _synthesize_chunk returns, or None. Local
+    storage hands out the stored file itself; other backends download it to
+    `path` (a scratch file the caller removes).
+    """
+    try:
+        raw = await _read(storage, f"{key}.json")
+        if raw is None or await storage.stat(f"{key}.mp3") is None:
+            _counts["missed"] += 1
+            return None
+        meta = json.loads(raw)
+        if isinstance(storage, LocalStorage):
+            path = storage.path_for(f"{key}.mp3")
+        else:
+            writer = await AsyncFileWriter.open(path)
+            try:
+                async for chunk in storage.open_range(f"{key}.mp3"):
+                    await writer.write(chunk)
+            finally:
+                await writer.close()
+    except Exception as e:
+        logger.warning(f"Audio segment {key} unreadable, synthesizing again: {e}")
+        _counts["missed"] += 1
+        return None
+    _counts["reused"] += 1
+    return {"path": path, "bytes": meta["bytes"], "alignment": meta["alignment"]}
+
+
+async def save(storage: BlobStorage, key: str, result: dict):
+    """Store a freshly synthesized paragraph. Consumes result["path"]; failures are only logged."""
+    try:
+        await storage.put_file(f"{key}.mp3", result["path"], "audio/mpeg")
+        # One paragraph's alignment is small enough to encode on the loop
+        meta = json.dumps({"bytes": result["bytes"], "alignment": result["alignment"]}, separators=(",", ":"))
+        path = storage.scratch_path()
+        await write_atomic(path, meta.encode("utf-8"))
+        await storage.put_file(f"{key}.json", path, "application/json")
+        _counts["stored"] += 1
+    except Exception as e:
+        # The story's merged audio is already done; the next edit just synthesizes this paragraph again
+        _counts["store_failed"] += 1
+        logger.error(f"Could not store audio segment {key}: {e}")
+
+
+def stats() -> dict:
+    total = _counts["reused"] + _counts["missed"]
+    return dict(_counts, reuse_rate=round(_counts["reused"] / total, 3) if total else None)
+
+
+def reset():
+    for key in _counts:
+        _counts[key] = 0
@@ -1,152 +1,149 @@
 
-import edge_tts
-import os
-import uuid
 import asyncio
+import gzip
+import json
 import re
+from typing import Tuple
 from app.core.config import settings
+from app.core.files import AsyncFileWriter, concat_atomic, remove_files, write_atomic
+from app.services import audio_formats, audio_segments
+from app.services.language import LANGUAGE_VOICE_MAP, resolve_voice
+from app.services.registry import providers
+from app.services.storage import get_storage, media_url
 import logging
 
 logger = logging.getLogger(__name__)
 
-AUDIO_DIR = "static/audio"
-os.makedirs(AUDIO_DIR, exist_ok=True)
-
-# Language-specific voice mappings
-# Each language has a default voice and optionally style-based voices
-LANGUAGE_VOICE_MAP = {
-    "Hindi": {
-        "Default": "hi-IN-SwaraNeural",       # Female Hindi
-        "Male": "hi-IN-MadhurNeural",          # Male Hindi
-        "Historical": "hi-IN-MadhurNeural",
-        "Creative": "hi-IN-SwaraNeural",
-        "Mythology": "hi-IN-SwaraNeural",
-        "Mystery": "hi-IN-MadhurNeural",
-    },
-    "Marathi": {
-        "Default": "mr-IN-AarohiNeural",       # Female Marathi
-        "Male": "mr-IN-ManoharNeural",          # Male Marathi
-        "Historical": "mr-IN-ManoharNeural",
-        "Creative": "mr-IN-AarohiNeural",
-        "Mythology": "mr-IN-AarohiNeural",
-        "Mystery": "mr-IN-ManoharNeural",
-    },
-    "English": {
-        "Default": "en-US-ChristopherNeural",
-        "Historical": "en-GB-SoniaNeural",
-        "Creative": "en-US-GuyNeural",
-        "Mythology": "en-IN-NeerjaNeural",
-        "TimeTravel": "en-US-AriaNeural",
-        "SciFi": "en-US-DavisNeural",
-        "Mystery": "en-US-GuyNeural",
-    },
-}
-
-# Fallback: English voice mapping for backwards compatibility
-VOICE_MAPPING = LANGUAGE_VOICE_MAP["English"]
 
+def _load_edge_tts():
+    # edge-tts pulls in aiohttp; keep it out of the import path of the API process
+    import edge_tts
+    return edge_tts
 
-def _detect_language_from_text(text: str) -> str:
-    """Detect language from text by checking Unicode script ranges."""
-    # Take a sample of the text (first 500 chars, skip spaces/punctuation)
-    sample = text[:500]
-    
-    # Count characters in different script ranges
-    devanagari_count = len(re.findall(r'[\u0900-\u097F]', sample))  # Hindi, Marathi
-    latin_count = len(re.findall(r'[a-zA-Z]', sample))
-    
-    # If very few non-latin characters, default to English
-    if devanagari_count < 10 and latin_count > 20:
-        return "English"
-    
-    # If Devanagari script is dominant, default to Hindi
-    # (Marathi also uses Devanagari, but user can explicitly select Marathi if needed)
-    if devanagari_count > latin_count:
-        logger.info(f"Language auto-detected as: Hindi (Devanagari count: {devanagari_count})")
-        return "Hindi"
-    
-    logger.info(f"Language auto-detected as: English (Latin count: {latin_count})")
-    return "English"
 
+providers.register("edge_tts", _load_edge_tts)
+
+# Storage key prefix for merged story audio (see app.services.storage)
+AUDIO_KEY_PREFIX = "audio"
+
+# Voice tables live in app.services.language; kept here for older imports
+VOICE_MAPPING = LANGUAGE_VOICE_MAP["English"]
+
+# edge-tts's default output (audio-24khz-48kbitrate-mono-mp3) is constant bitrate,
+# so a paragraph's audio lasts exactly its size / byte rate
+OUTPUT_BYTES_PER_S = 48_000 / 8
 
-def _get_voice_for_language(language: str, story_type: str) -> str:
-    """Get the best voice for a given language and story type."""
-    lang_voices = LANGUAGE_VOICE_MAP.get(language, LANGUAGE_VOICE_MAP["English"])
+
+def narration(text: str, story_type: str = "Historical", language: str = "") -> Tuple[str, str, str]:
+    """(text as read aloud, language, voice) that generate_story_audio uses for `text`."""
+    # Clean Markdown bold tags (**) so they aren't read aloud as "star star" or "double asterisk"
+    # Also clean italics (*) if present
+    clean_text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
+    clean_text = re.sub(r'\*(.*?)\*', r'\1', clean_text)
     
-    # Try story-type-specific voice first, then default for that language
-    voice = lang_voices.get(story_type, lang_voices.get("Default", "en-US-ChristopherNeural"))
-    logger.info(f"Selected voice: {voice} (language={language}, story_type={story_type})")
-    return voice
+    # Language: explicit param if supported, else detected from the text; voice from language + story type
+    detected_language, voice = resolve_voice(clean_text, language, story_type)
+    return clean_text, detected_language, voice
 
 
-async def generate_story_audio(text: str, story_type: str = "Historical", language: str = ""):
+async def generate_story_audio(text: str, story_type: str = "Historical", language: str = "", audio_format: str = ""):
     try:
-        # Clean Markdown bold tags (**) so they aren't read aloud as "star star" or "double asterisk"
-        # Also clean italics (*) if present
-        clean_text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-        clean_text = re.sub(r'\*(.*?)\*', r'\1', clean_text)
-        
-        # Determine language: use explicit param, or auto-detect from text
-        if language and language in LANGUAGE_VOICE_MAP:
-            detected_language = language
-        else:
-            detected_language = _detect_language_from_text(clean_text)
-        
-        # Select voice based on language + story type
-        voice = _get_voice_for_language(detected_language, story_type)
+        fmt = audio_formats.choose(audio_format)
+        clean_text, detected_language, voice = narration(text, story_type, language)
         logger.info(f"Generating audio: language={detected_language}, story_type={story_type}, voice={voice}")
         
         # Split text into chunks by paragraph for parallel synthesis
         paragraphs = [p.strip() for p in clean_text.split("\n\n") if p.strip()]
         
-        # Synthesize paragraphs in parallel
-        tasks = [_synthesize_chunk(p, voice) for p in paragraphs]
-        results = await asyncio.gather(*tasks)
-        
-        # Merge results
-        combined_audio = bytearray()
-        combined_alignment = []
-        current_time_offset = 0.0
-        
-        for res in results:
-            if not res: continue
+        # Synthesize paragraphs in parallel; each one streams its audio to its own part file.
+        # Paragraphs narrated before with this voice come from stored segments instead.
+        storage = get_storage()
+        filepath = storage.scratch_path(".mp3")
+        part_paths = [f"{filepath}.{i}.part" for i in range(len(paragraphs))]
+        tasks = [_paragraph_audio(storage, p, voice, part) for p, part in zip(paragraphs, part_paths)]
+        try:
+            results = await asyncio.gather(*tasks)
             
-            # Add audio
-            combined_audio.extend(res["audio_data"])
+            # Merge alignment; audio is merged on disk below
+            combined_parts = []
+            combined_alignment = []
+            current_time_offset = 0.0
             
-            # Add alignment with offset
-            for align in res["alignment"]:
-                # Deep copy and offset
-                new_align = align.copy()
-                new_align["start"] += current_time_offset
-                new_align["end"] += current_time_offset
-                combined_alignment.append(new_align)
+            for res in results:
+                if not res: continue
+                
+                combined_parts.append(res["path"])
+                
+                # Add alignment with offset
+                for align in res["alignment"]:
+                    # Deep copy and offset
+                    new_align = align.copy()
+                    new_align["start"] += current_time_offset
+                    new_align["end"] += current_time_offset
+                    combined_alignment.append(new_align)
+                
+                # The next paragraph starts where this one's audio ends
+                current_time_offset += res["bytes"] / OUTPUT_BYTES_PER_S
             
-            # Update offset (using the end time of the last word in this chunk)
-            if res["alignment"]:
-                current_time_offset = res["alignment"][-1]["end"] + 0.1 # Reduced pause between paragraphs
+            # Save merged audio: concatenate parts off the event loop, then hand the file to storage.
+            # The name is the content hash, so the URL can be cached forever (see app.api.media).
+            digest = await concat_atomic(combined_parts, filepath)
+            key = f"{AUDIO_KEY_PREFIX}/{digest[:32]}.mp3"
+            # Compact profiles are encoded from the merged file (put_file consumes it); the alignment above stays valid
+            served_key = await audio_formats.encode(storage, key, fmt, filepath)
+            if await storage.stat(key) is None:
+                await storage.put_file(key, filepath, "audio/mpeg")
+            # Keep the newly synthesized paragraphs for the next edit of this story
+            await asyncio.gather(*(audio_segments.save(storage, res["new_segment"], res)
+                                   for res in results if res and res.get("new_segment")))
+        finally:
+            await remove_files(part_paths + [filepath])
         
         # FALLBACK: If no WordBoundary events, synthesize them from sentences
         word_boundaries = [a for a in combined_alignment if a["type"] == "WordBoundary"]
         if len(word_boundaries) == 0:
             logger.warning("No WordBoundary events found, synthesizing from sentences...")
             combined_alignment = _synthesize_word_boundaries(combined_alignment, clean_text)
-        
-        # Save merged audio
-        filename = f"{uuid.uuid4()}.mp3"
-        filepath = os.path.join(AUDIO_DIR, filename)
-        with open(filepath, "wb") as f:
-            f.write(combined_audio)
             
-        return {
-            "audioUrl": f"/static/audio/{filename}",
-            "alignment": combined_alignment
+        result = {
+            "audioUrl": media_url(served_key or key),
+            "alignment": combined_alignment,
+            "audioFormat": fmt.name if served_key else audio_formats.STANDARD.name,
+            "sourceKey": key,
         }
+        if settings.AUDIO_ALIGNMENT_SIDECAR:
+            result["alignmentUrl"] = await _save_alignment_sidecar(storage, key, combined_alignment)
+        return result
         
     except Exception as e:
         logger.error(f"FATAL: Error generating audio for language='{language}', story_type='{story_type}': {e}", exc_info=True)
         return None
 
+async def with_format(result: dict, audio_format: str) -> dict:
+    """`result` of generate_story_audio (e.g. a prefetched one) served in `audio_format` instead."""
+    fmt = audio_formats.choose(audio_format)
+    if fmt.name == result.get("audioFormat", audio_formats.STANDARD.name) or not result.get("sourceKey"):
+        return result
+    key = await audio_formats.encode(get_storage(), result["sourceKey"], fmt)
+    if key is None:
+        return dict(result, audioUrl=media_url(result["sourceKey"]), audioFormat=audio_formats.STANDARD.name)
+    return dict(result, audioUrl=media_url(key), audioFormat=fmt.name)
+
+async def _save_alignment_sidecar(storage, audio_key: str, alignment: list) -> str:
+    """
+    Store alignment next to the audio as JSON plus a precompressed .gz copy,
+    so /media can send it gzip-encoded without compressing per request.
+    """
+    key = audio_key.rsplit(".", 1)[0] + ".alignment.json"
+    if await storage.stat(key) is None:
+        data = await asyncio.to_thread(lambda: json.dumps(alignment, separators=(",", ":")).encode())
+        compressed = await asyncio.to_thread(gzip.compress, data, 6)
+        for sidecar_key, payload in ((key, data), (key + ".gz", compressed)):
+            path = storage.scratch_path()
+            await write_atomic(path, payload)
+            await storage.put_file(sidecar_key, path, "application/json")
+    return media_url(key)
+
 def _synthesize_word_boundaries(sentence_alignment: list, full_text: str) -> list:
     """Generate word-level alignment from sentence boundaries."""
     new_alignment = []
@@ -189,31 +186,58 @@ def _synthesize_word_boundaries(sentence_alignment: list, full_text: str) -> lis
     logger.info(f"Synthesized {len([a for a in new_alignment if a['type'] == 'WordBoundary'])} word boundaries")
     return new_alignment
 
-async def _synthesize_chunk(text: str, voice: str):
+async def _paragraph_audio(storage, text: str, voice: str, path: str):
+    """One paragraph's audio: its stored segment if this text was narrated with this voice before, else synthesized to `path`."""
+    if not settings.AUDIO_SEGMENT_CACHE:
+        return await _synthesize_chunk(text, voice, path)
+    key = audio_segments.segment_key(text, voice)
+    stored = await audio_segments.load(storage, key, path)
+    if stored:
+        return stored
+    result = await _synthesize_chunk(text, voice, path)
+    if result:
+        result["new_segment"] = key
+    return result
+
+async def _synthesize_chunk(text: str, voice: str, path: str):
+    """Stream one paragraph to `path`. Only the writer's buffer is held in memory."""
+    writer = None
     try:
+        writer = await AsyncFileWriter.open(path)
         # Add rate parameter - sometimes helps with word boundary generation
-        communicate = edge_tts.Communicate(text, voice, rate="+0%")
-        audio_data = bytearray()
+        communicate = providers.get("edge_tts").Communicate(text, voice, rate="+0%")
         alignment = []
         event_types = set()
         
-        async for message in communicate.stream():
-            if message["type"] == "audio":
-                audio_data.extend(message["data"])
-            elif message["type"] in ["WordBoundary", "SentenceBoundary"]:
-                event_types.add(message["type"])
-                alignment.append({
-                    "word": message.get("text", ""),
-                    "start": message["offset"] / 10_000_000,
-                    "end": (message["offset"] + message["duration"]) / 10_000_000,
-                    "type": message["type"]
-                })
+        stream = communicate.stream()
+        try:
+            async for message in stream:
+                if message["type"] == "audio":
+                    await writer.write(message["data"])
+                elif message["type"] in ["WordBoundary", "SentenceBoundary"]:
+                    event_types.add(message["type"])
+                    alignment.append({
+                        "word": message.get("text", ""),
+                        "start": message["offset"] / 10_000_000,
+                        "end": (message["offset"] + message["duration"]) / 10_000_000,
+                        "type": message["type"]
+                    })
+        finally:
+            # Cancelled mid-paragraph (client gone): close the websocket now rather than at GC
+            await stream.aclose()
+        await writer.close()
         
         logger.info(f"Synthesis complete. Events captured: {event_types}, Total events: {len(alignment)}")
         if "WordBoundary" not in event_types:
             logger.warning(f"WARNING: No WordBoundary events received! Only got: {event_types}")
         
-        return {"audio_data": audio_data, "alignment": alignment}
+        return {"path": path, "bytes": writer.bytes_written, "alignment": alignment}
+    except asyncio.CancelledError:
+        if writer:
+            await writer.discard()
+        raise
     except Exception as e:
         logger.error(f"Error in chunk synthesis: {e}")
+        if writer:
+            await writer.discard()
         return None
@@ -0,0 +1,256 @@
+"""
+Bounded memory for character chat.
+
+The frontend sends the whole conversation with every /chat turn. The prompt
+used to keep only the last five messages, forgetting everything older,
+so prompt size swung with message length.
+
+With CHAT_MEMORY_ENABLED the prompt has three bounded parts:
+
+- the story excerpt: its first CHAT_CONTEXT_CHARS characters, as the chat
+  has always had. Counted in characters, not tokens, so Devanagari stories (about three
+  bytes a character) keep as much of the story as English ones;
+- a rolling summary of the older turns, at most CHAT_SUMMARY_TOKENS;
+- the most recent turns verbatim, newest first while they fit in
+  CHAT_HISTORY_TOKENS (the newest is always kept, clipped if need be).
+
+Summaries are never computed while the user waits. After each reply,
+`remember()` looks at the history the *next* request will send (this one
+plus the user's message and the reply). If its recent turns would overflow
+CHAT_HISTORY_TOKENS past the newest summary, it summarizes in the
+background up to where only half the window is left verbatim, folding the
+turns that left the window into the previous summary; so there is one
+small summary call every few turns, not one per turn. Summaries are keyed by a
+hash chain over (character, story, turns...), so any prefix of any
+conversation can be looked up without server-side sessions. If a turn
+arrives before its summary is ready, the newest shorter summary is used and
+the turns in between are left out of that one prompt (counted as
+forgotten). At most CHAT_SUMMARY_MAX_JOBS run at once, each in an ordinary
+LLM admission slot.
+
+Per-turn prompt size and reply latency are kept for /chat-memory/stats.
+"""
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.core import admission
+from app.core.admission import AdmissionRejected
+from app.core.config import settings
+from app.services.story_limits import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+STATS_WINDOW = 500  # recent turns kept for percentiles
+# Turns given to one summarization call beyond the previous summary (newest kept)
+SUMMARY_INPUT_TOKENS = 3000
+# Without memory: what the chat prompt always used
+LEGACY_TURNS = 5
+
+Summarizer = Callable[[str, str, str], Awaitable[str]]  # (character, previous summary, turns) -> summary
+
+
+@dataclass
+class ChatMemory:
+    context: str  # story excerpt
+    summary: str  # older turns, "" if none
+    recent: List[dict]  # turns kept verbatim, oldest first
+    turns: List[dict] = field(default_factory=list)  # the whole conversation before this message
+    summary_state: str = "none"  # none / hit / stale / miss / off
+    forgotten: int = 0  # older turns neither summarized nor kept
+
+    def history_text(self) -> str:
+        return format_turns(self.recent)
+
+
+def format_turns(turns: List[dict]) -> str:
+    return "\n".join(f"{turn.get('role', 'user')}: {turn.get('content', '')}" for turn in turns)
+
+
+def clip(text: str, tokens: int, keep_end: bool = False) -> str:
+    """`text` cut to about `tokens` (estimate_tokens counts 4 bytes a token)."""
+    data = text.encode("utf-8")
+    if len(data) <= tokens * 4:
+        return text
+    data = data[-tokens * 4:] if keep_end else data[:tokens * 4]
+    return data.decode("utf-8", "ignore")
+
+
+def _chain(story_context: str, character_name: str, turns: List[dict]) -> List[str]:
+    """Key of every prefix of `turns`: chain[k] identifies the conversation's first k turns."""
+    story = hashlib.sha256(story_context.encode("utf-8")).hexdigest()
+    keys = [hashlib.sha256(f"{character_name}\n{story}".encode("utf-8")).hexdigest()]
+    for turn in turns:
+        raw = f"{keys[-1]}\n{turn.get('role', '')}\n{turn.get('content', '')}"
+        keys.append(hashlib.sha256(raw.encode("utf-8")).hexdigest())
+    return keys
+
+
+def _window_start(turns: List[dict], budget: int) -> int:
+    """Index of the oldest turn that still fits in `budget` tokens, counting back from the newest."""
+    start, used = len(turns), 0
+    while start > 0:
+        cost = estimate_tokens(format_turns([turns[start - 1]])) + 1
+        if used + cost > budget and start < len(turns):
+            break
+        used += cost
+        start -= 1
+    return start
+
+
+def _settled(history: List[dict], message: str) -> List[dict]:
+    # The frontend's history already ends with the message being sent; the prompt adds it separately
+    if history and history[-1].get("role") == "user" and history[-1].get("content") == message:
+        return list(history[:-1])
+    return list(history)
+
+
+# Summary store
+
+_summaries: "OrderedDict[str, str]" = OrderedDict()  # prefix key -> summary, least recently used first
+_jobs: Dict[str, asyncio.Task] = {}
+_counts = {
+    "turns": 0, "summary_hit": 0, "summary_stale": 0, "summary_miss": 0, "turns_forgotten": 0,
+    "summaries": 0, "summaries_failed": 0, "summaries_skipped": 0,
+}
+_prompt_tokens = deque(maxlen=STATS_WINDOW)
+_latency_ms = deque(maxlen=STATS_WINDOW)
+
+
+def _lookup(key: str) -> Optional[str]:
+    summary = _summaries.get(key)
+    if summary is not None:
+        _summaries.move_to_end(key)
+    return summary
+
+
+def _store(key: str, summary: str):
+    _summaries[key] = summary
+    _summaries.move_to_end(key)
+    while len(_summaries) > settings.CHAT_MEMORY_MAX_SUMMARIES:
+        _summaries.popitem(last=False)
+
+
+def _best_summary(chain: List[str], upto: int) -> tuple:
+    """(k, summary) for the longest prefix of at most `upto` turns that has a summary; (0, "") if none."""
+    for k in range(upto, 0, -1):
+        summary = _lookup(chain[k])
+        if summary is not None:
+            return k, summary
+    return 0, ""
+
+
+def build(story_context: str, character_name: str, history: List[dict], message: str) -> ChatMemory:
+    """What the prompt for this turn carries."""
+    turns = _settled(history, message)
+    if not settings.CHAT_MEMORY_ENABLED:
+        return ChatMemory(story_context[:settings.CHAT_CONTEXT_CHARS], "", list(history[-LEGACY_TURNS:]), turns, "off",
+                          max(0, len(history) - LEGACY_TURNS))
+    context = story_context[:settings.CHAT_CONTEXT_CHARS]
+    start = _window_start(turns, settings.CHAT_HISTORY_TOKENS)
+    if start == 0:
+        return ChatMemory(context, "", _fit(turns), turns)
+    covered, summary = _best_summary(_chain(story_context, character_name, turns), len(turns))
+    if covered >= start:
+        # The summary reaches into the window: everything after it fits verbatim
+        return ChatMemory(context, summary, turns[covered:], turns, "hit")
+    state = "stale" if covered else "miss"
+    return ChatMemory(context, summary, _fit(turns[start:]), turns, state, start - covered)
+
+
+def _fit(recent: List[dict]) -> List[dict]:
+    if recent and estimate_tokens(format_turns(recent)) > settings.CHAT_HISTORY_TOKENS:
+        # A single very long message: keep its end
+        last = recent[-1]
+        return [dict(last, content=clip(last.get("content", ""), settings.CHAT_HISTORY_TOKENS, keep_end=True))]
+    return recent
+
+
+def record_turn(memory: ChatMemory, prompt: str, seconds: float):
+    _counts["turns"] += 1
+    if memory.summary_state in ("hit", "stale", "miss"):
+        _counts[f"summary_{memory.summary_state}"] += 1
+    _counts["turns_forgotten"] += memory.forgotten
+    _prompt_tokens.append(estimate_tokens(prompt))
+    _latency_ms.append(seconds * 1000)
+
+
+async def _summarize(story_context: str, character_name: str, turns: List[dict], upto: int, summarizer: Summarizer):
+    chain = _chain(story_context, character_name, turns[:upto])
+    covered, previous = _best_summary(chain, upto)
+    new_turns = clip(format_turns(turns[covered:upto]), SUMMARY_INPUT_TOKENS, keep_end=True)
+    try:
+        async with admission.slot("llm"):
+            summary = await summarizer(character_name, previous, new_turns)
+    except AdmissionRejected as e:
+        _counts["summaries_skipped"] += 1
+        logger.info(f"Chat summary skipped: {e.reason}")
+        return
+    except Exception as e:
+        _counts["summaries_failed"] += 1
+        logger.error(f"Chat summary failed: {e}")
+        return
+    if not summary:
+        _counts["summaries_failed"] += 1
+        return
+    _store(chain[upto], clip(summary.strip(), settings.CHAT_SUMMARY_TOKENS))
+    _counts["summaries"] += 1
+
+
+def remember(memory: ChatMemory, story_context: str, character_name: str, message: str, reply: str,
+             summarizer: Summarizer):
+    """After a reply: start summarizing what the next turn will need, unless it is already there."""
+    if not settings.CHAT_MEMORY_ENABLED:
+        return
+    turns = memory.turns + [{"role": "user", "content": message}, {"role": "assistant", "content": reply}]
+    start = _window_start(turns, settings.CHAT_HISTORY_TOKENS)
+    if start == 0:
+        return
+    chain = _chain(story_context, character_name, turns)
+    if _best_summary(chain, len(turns))[0] >= start:
+        return  # the next turn still fits after the current summary
+    # Summarize down to half the window, so the next few turns fit without another call
+    upto = _window_start(turns, settings.CHAT_HISTORY_TOKENS // 2)
+    key = chain[upto]
+    if key in _jobs:
+        return
+    if len(_jobs) >= settings.CHAT_SUMMARY_MAX_JOBS:
+        _counts["summaries_skipped"] += 1
+        return
+    task = asyncio.create_task(_summarize(story_context, character_name, turns, upto, summarizer))
+    _jobs[key] = task
+    task.add_done_callback(lambda _, key=key: _jobs.pop(key, None))
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] if ordered else 0.0
+
+
+def stats() -> dict:
+    return dict(
+        _counts,
+        summaries_kept=len(_summaries),
+        summaries_running=len(_jobs),
+        prompt_tokens={"p50": _percentile(_prompt_tokens, 50), "p95": _percentile(_prompt_tokens, 95),
+                       "max": max(_prompt_tokens, default=0)},
+        latency_ms={"p50": round(_percentile(_latency_ms, 50), 1), "p95": round(_percentile(_latency_ms, 95), 1)},
+    )
+
+
+def cancel_all():
+    for task in list(_jobs.values()):
+        task.cancel()
+
+
+def reset():
+    cancel_all()
+    _jobs.clear()
+    _summaries.clear()
+    _prompt_tokens.clear()
+    _latency_ms.clear()
+    for key in _counts:
+        _counts[key] = 0
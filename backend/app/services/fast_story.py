@@ -0,0 +1,178 @@
+"""
+Fast story mode: outline first, then the sections in parallel.
+
+The standard path asks for the whole 800-1000 word story as one JSON
+object, so its latency is the model's sequential decode time for all of
+it. Here a short call plans the story (title, era, timeline, summary,
+moral and a 3-4 section outline), then every section's paragraph is
+written by its own concurrent call. Each section call sees the whole
+outline, its own position and its neighbours' beats, so the paragraphs
+hand over to each other; they are stitched back with blank lines into
+the same keys the standard path returns.
+
+Wall time becomes roughly outline + the slowest section instead of the
+whole story. The trade-off is continuity: no section sees the others'
+actual prose, so transitions and repeated details are only as good as
+the outline (see benchmarks/bench_fast_story.py).
+
+Every outline and section call holds its own LLM admission slot, so
+LLM_MAX_CONCURRENCY counts the calls the provider actually sees.
+"""
+import asyncio
+import logging
+from typing import List
+
+from app.core import admission
+from app.core.admission import AdmissionRejected
+from app.core.config import settings
+from app.services import llm_output
+from app.services.gemini_service import complete_gemini
+from app.services.groq_service import complete_groq
+
+logger = logging.getLogger(__name__)
+
+MIN_SECTIONS = 3
+MAX_SECTIONS = 4
+OUTLINE_MAX_TOKENS = 1024
+# Devanagari text costs several tokens per word; leave room for it
+TOKENS_PER_WORD = 3
+
+# Story types whose standard prompts forbid a timeline
+NO_TIMELINE_TYPES = {"Creative", "Mythology", "SciFi", "Mystery", "TimeTravel"}
+
+# One-line versions of the standard prompts' per-type requirements
+TYPE_BRIEFS = {
+    "Historical": "a historically accurate, engaging narrative; use **bold** for important names and dates",
+    "Creative": "an imaginative fictional story with compelling characters, vivid settings and world-building",
+    "Hybrid": "real historical context blended with creative storytelling; fictional characters allowed, major events accurate",
+    "Mythology": "a myth or legend with its cultural significance and symbolism, mystical yet educational",
+    "SciFi": "science fiction with advanced technology or a futuristic society, conflict and vivid world-building",
+    "Mystery": "a gripping mystery: the central crime early, clues, red herrings and suspects, a satisfying reveal",
+    "TimeTravel": "a time traveller's experience: modern perspective vs historical reality, sensory details",
+    "AltHistory": "a 'What If?' scenario from a real historical divergence point, with logical consequences",
+}
+
+
+def _brief(story_type: str) -> str:
+    return TYPE_BRIEFS.get(story_type, TYPE_BRIEFS["Historical"])
+
+
+def outline_prompts(topic: str, era: str, style: str, story_type: str, language: str):
+    """(system, user) prompts for the planning call."""
+    timeline = ('"timeline": [],' if story_type in NO_TIMELINE_TYPES
+                else '"timeline": [{"date": "...", "event": "..."}],')
+    system_prompt = f"""You are a storytelling AI planning a story before it is written.
+Output the title, summary, moral, headings and beats entirely in {language} language. Keep JSON keys in English.
+Output ONLY valid JSON in this exact structure (no markdown, no extra text):
+{{
+  "title": "Story Title",
+  "era": "Era Name",
+  {timeline}
+  "main_events_summary": ["event 1", "event 2", "event 3"],
+  "sections": [{{"heading": "...", "beats": "what happens in this part, 2-3 sentences"}}],
+  "moral": "Moral of the story"
+}}"""
+    user_prompt = f"""STORY OUTLINE for {_brief(story_type)}:
+- Topic: {topic}
+- Era/Setting: {era}
+- Style: {style}
+
+Requirements:
+1. {MIN_SECTIONS}-{MAX_SECTIONS} sections forming one narrative arc (beginning, middle, end)
+2. Beats name the characters, places and turning points each section must cover, so the sections connect
+3. Main events summary (3-5 key points){"" if story_type in NO_TIMELINE_TYPES else chr(10) + "4. Timeline with key dates/events"}
+
+Output ONLY the JSON object."""
+    return system_prompt, user_prompt
+
+
+def section_prompts(outline: dict, index: int, topic: str, style: str, story_type: str, language: str, words: int):
+    """(system, user) prompts for writing section `index` of the outline."""
+    sections = outline["sections"]
+    plan = "\n".join(f"{i + 1}. {s['heading']}: {s['beats']}" for i, s in enumerate(sections))
+    position = ("the opening: set the scene and introduce the characters" if index == 0
+                else "the ending: resolve the story and let the moral emerge" if index == len(sections) - 1
+                else "a middle part: continue directly from the previous section")
+    neighbours = []
+    if index > 0:
+        neighbours.append(f"The previous section ends with: {sections[index - 1]['beats']}")
+    if index < len(sections) - 1:
+        neighbours.append(f"The next section begins with: {sections[index + 1]['beats']}")
+    system_prompt = f"""You are a storytelling AI writing one part of a longer story in {style} style.
+Write entirely in {language} language.
+Output ONLY the paragraph text: no heading, no title, no markdown other than **bold** for key names."""
+    user_prompt = f"""Story: "{outline['title']}" ({outline.get('era', '')}) - {_brief(story_type)}, about {topic}.
+Moral: {outline.get('moral', '')}
+
+Full outline:
+{plan}
+
+Write SECTION {index + 1} OF {len(sections)} ("{sections[index]['heading']}"), {position}.
+{chr(10).join(neighbours)}
+Cover only this section's beats; do not retell other sections. One rich paragraph of about {words} words."""
+    return system_prompt, user_prompt
+
+
+async def _complete(use_groq: bool, system_prompt: str, user_prompt: str, max_tokens: int, json_mode: bool) -> str:
+    async with admission.slot("llm"):
+        if use_groq:
+            return await complete_groq(system_prompt, user_prompt, max_tokens, json_mode=json_mode)
+        return await complete_gemini(f"{system_prompt}\n\n{user_prompt}", max_tokens, json_mode=json_mode)
+
+
+def _valid_outline(outline) -> bool:
+    """A title and at least MIN_SECTIONS sections with beats; extras past MAX_SECTIONS are dropped later."""
+    if not isinstance(outline, dict) or not outline.get("title"):
+        return False
+    sections = outline.get("sections")
+    return (isinstance(sections, list) and len(sections) >= MIN_SECTIONS
+            and all(isinstance(s, dict) and s.get("beats") for s in sections[:MAX_SECTIONS]))
+
+
+def stitch(outline: dict, paragraphs: List[str], era: str) -> dict:
+    """The standard path's story dict from an outline and its section paragraphs."""
+    return {
+        "title": outline["title"],
+        "era": outline.get("era") or era,
+        "timeline": outline.get("timeline") or [],
+        "main_events_summary": outline.get("main_events_summary") or [],
+        "story_content": "\n\n".join(p.strip() for p in paragraphs),
+        "moral": outline.get("moral") or "[moral not generated]",
+    }
+
+
+async def generate_story_fast(topic: str, era: str, style: str, story_type: str = "Historical",
+                              language: str = "English", use_groq: bool = True) -> dict:
+    """Same result shape as generate_story_groq/generate_story; {"error": ...} on failure."""
+    try:
+        system_prompt, user_prompt = outline_prompts(topic, era, style, story_type, language)
+        outline, _ = llm_output.loads(await _complete(use_groq, system_prompt, user_prompt, OUTLINE_MAX_TOKENS, json_mode=True))
+        if not _valid_outline(outline):
+            return {"error": f"Outline needs a title and {MIN_SECTIONS}-{MAX_SECTIONS} sections"}
+        outline["sections"] = [dict(s, heading=s.get("heading") or f"Part {i + 1}")
+                               for i, s in enumerate(outline["sections"][:MAX_SECTIONS])]
+
+        words = settings.FAST_STORY_TARGET_WORDS // len(outline["sections"])
+
+        async def write(index: int) -> str:
+            system_prompt, user_prompt = section_prompts(outline, index, topic, style, story_type, language, words)
+            text = await _complete(use_groq, system_prompt, user_prompt, words * TOKENS_PER_WORD, json_mode=False)
+            if not text or not text.strip():
+                raise ValueError(f"Section {index + 1} came back empty")
+            return text
+
+        tasks = [asyncio.ensure_future(write(i)) for i in range(len(outline["sections"]))]
+        try:
+            paragraphs = await asyncio.gather(*tasks)
+        except BaseException:
+            # One bad section sinks the story; stop paying for the others
+            for task in tasks:
+                task.cancel()
+            raise
+        logger.info(f"⚡ Fast story '{outline['title']}': {len(paragraphs)} sections written in parallel")
+        return stitch(outline, paragraphs, era)
+    except AdmissionRejected:
+        raise  # overloaded: a single-shot fallback would only add to it
+    except Exception as e:
+        logger.error(f"Fast story generation error: {e}")
+        return {"error": str(e)}
@@ -1,14 +1,13 @@
-import google.generativeai as genai
 from app.core.config import settings
-import json
+from app.services import chat_memory, llm_output, model_tiers, story_limits
+from app.services.registry import providers
+import asyncio
 import logging
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-if settings.GEMINI_API_KEY:
-    genai.configure(api_key=settings.GEMINI_API_KEY)
-
 # Generation Config
 generation_config = {
     "temperature": 0.7,
@@ -18,16 +17,7 @@ generation_config = {
     "response_mime_type": "application/json",
 }
 
-model = genai.GenerativeModel(
-    model_name="gemini-3-flash-preview",
-    generation_config={
-        "temperature": 0.7,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 8192,
-        "response_mime_type": "application/json",
-    },
-    system_instruction="""You are a versatile storytelling AI capable of generating both historical and creative fictional content.
+STORY_SYSTEM_INSTRUCTION = """You are a versatile storytelling AI capable of generating both historical and creative fictional content.
 You can adapt your approach based on the task:
 - For historical stories: Use accurate facts and historical knowledge
 - For creative stories: Use imagination and creativity to craft engaging narratives
@@ -45,34 +35,8 @@ You must ALWAYS output VALID JSON in this structure:
 
 Follow the specific instructions provided in each prompt carefully.
 """
-)
-
 
-# Dedicated model for Chat (Text Output, No Story System Prompt)
-chat_model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config={
-        "temperature": 0.7,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 1024,
-        "response_mime_type": "text/plain",
-    }
-)
-
-# Dedicated model for JSON Extraction tasks (No Story System Prompt)
-extraction_model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config={
-        "response_mime_type": "application/json",
-    }
-)
-
-
-image_prompt_model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config={"response_mime_type": "application/json"},
-    system_instruction="""You are an expert AI art director for historical visualizations.
+IMAGE_PROMPT_SYSTEM_INSTRUCTION = """You are an expert AI art director for historical visualizations.
     Your goal is to convert story events into SAFE, SCENE-BASED image prompts.
     CRITICAL RULES:
     1. NO realistic faces of historical figures.
@@ -80,7 +44,144 @@ image_prompt_model = genai.GenerativeModel(
     3. Output a list of props/scenes.
     Format: {"image_prompts": [{"scene_description": "...", "negative_prompt": "..."}]}
     """
-)
+
+
+def _genai():
+    # google.generativeai takes about a second to import, so only load it on first use
+    import google.generativeai as genai
+    if settings.GEMINI_API_KEY:
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+    return genai
+
+
+def _story_model():
+    return _genai().GenerativeModel(
+        model_name="gemini-3-flash-preview",
+        generation_config=generation_config,
+        system_instruction=STORY_SYSTEM_INSTRUCTION,
+    )
+
+
+# Auxiliary tasks: each task's model comes from its settings.AUX_MODELS ladder
+AUX_MODEL_OPTIONS = {
+    # Chat: text output, no story system prompt
+    "gemini.chat": {
+        "generation_config": {
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "top_k": 40,
+            "max_output_tokens": 1024,
+            "response_mime_type": "text/plain",
+        },
+    },
+    # Rolling summaries of older chat turns (app.services.chat_memory)
+    "gemini.chat_summary": {
+        "generation_config": {
+            "temperature": 0.2,
+            "max_output_tokens": 512,
+            "response_mime_type": "text/plain",
+        },
+    },
+    # JSON extraction tasks, no story system prompt
+    "gemini.extraction": {
+        "generation_config": {"response_mime_type": "application/json"},
+    },
+    "gemini.image_prompts": {
+        "generation_config": {"response_mime_type": "application/json"},
+        "system_instruction": IMAGE_PROMPT_SYSTEM_INSTRUCTION,
+    },
+}
+
+
+_aux_registered = set()
+
+
+def _register_aux(task: str, model_name: str) -> str:
+    """Registry name of the model for one rung of a task's ladder ("gemini.chat:<model>")."""
+    name = f"{task}:{model_name}"
+    if name not in _aux_registered:
+        factory = lambda: _genai().GenerativeModel(model_name=model_name, **AUX_MODEL_OPTIONS[task])
+        providers.register(name, factory, configured=_gemini_configured)
+        _aux_registered.add(name)
+    return name
+
+
+def _aux_model(task: str, model_name: str):
+    # Ladders edited at runtime register their new rungs here
+    model = providers.get(_register_aux(task, model_name))
+    if model is None:
+        raise RuntimeError(f"Gemini model {model_name} unavailable")
+    return model
+
+
+# Plain model for prompts that bring their own instructions (fast story mode)
+def _text_model():
+    return _genai().GenerativeModel(model_name="gemini-3-flash-preview")
+
+
+def _gemini_configured() -> bool:
+    return bool(settings.GEMINI_API_KEY)
+
+
+providers.register("gemini.story", _story_model, configured=_gemini_configured)
+providers.register("gemini.text", _text_model, configured=_gemini_configured)
+for _task in AUX_MODEL_OPTIONS:
+    for _model_name in model_tiers.models_for(_task):
+        _register_aux(_task, _model_name)
+
+
+async def complete_gemini(prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+    """One generation with per-call limits; raises on provider errors."""
+    response = await providers.get("gemini.text").generate_content_async(prompt, generation_config={
+        "temperature": 0.7,
+        "top_p": 0.95,
+        "max_output_tokens": max_tokens,
+        "response_mime_type": "application/json" if json_mode else "text/plain",
+    })
+    return response.text
+
+
+async def _stream_story(response, monitor: story_limits.StreamMonitor) -> str:
+    """Feeds a streamed response into `monitor` until it ends or the monitor stops it. Returns the finish reason."""
+    finish_reason = "complete"
+    finished = False
+    try:
+        async for chunk in response:
+            candidate = chunk.candidates[0] if chunk.candidates else None
+            if candidate is not None and getattr(candidate.finish_reason, "name", "") == "MAX_TOKENS":
+                finish_reason = "length"
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # no text parts in this chunk
+            if text and monitor.feed(text):
+                break
+        else:
+            finished = True
+    finally:
+        if not finished:
+            _close_stream(response)
+    return finish_reason
+
+
+_cancel_warned = False
+
+
+def _close_stream(response):
+    # The SDK has no public close; cancelling the underlying call stops the upstream generation.
+    # That is a private attribute, so count (and say once) when it is not there.
+    global _cancel_warned
+    cancel = getattr(getattr(response, "_iterator", None), "cancel", None)
+    try:
+        if not callable(cancel):
+            raise AttributeError("response has no _iterator.cancel()")
+        cancel()
+    except Exception as e:
+        story_limits.record_uncancelled()
+        if not _cancel_warned:
+            _cancel_warned = True
+            logger.warning(f"Could not cancel Gemini story stream, upstream generation continues: {e}")
+
 
 async def generate_story(topic: str, era: str, style: str, story_type: str = "Historical", language: str = "English"):
     # Language Instruction
@@ -318,8 +419,26 @@ async def generate_story(topic: str, era: str, style: str, story_type: str = "Hi
         """
     
     try:
-        response = await model.generate_content_async(prompt)
-        return json.loads(response.text)
+        # Streamed, so generation can stop as soon as the JSON closes or the model loops
+        budget = story_limits.token_budget(story_type, language)
+        max_tokens = story_limits.thinking_budget(budget)
+        monitor = story_limits.StreamMonitor()
+        response = await providers.get("gemini.story").generate_content_async(
+            prompt, stream=True, generation_config={"max_output_tokens": max_tokens}
+        )
+        try:
+            finish_reason = await _stream_story(response, monitor)
+        except asyncio.CancelledError:
+            monitor.abort()
+            raise
+        stop_reason = story_limits.record(budget, monitor, finish_reason)
+        # Small defects are repaired locally; one short fix-up call if that fails,
+        # and a continuation call if the story was cut off
+        return await llm_output.parse(
+            monitor.text(), llm_output.StoryOutput, "story",
+            followup=lambda fix: complete_gemini(fix, max_tokens, json_mode=True),
+            require_complete=True, truncated=stop_reason == "length",
+        )
     except Exception as e:
         logger.error(f"Error generating story: {e}")
         # Return error as dictionary to bubble up detail
@@ -405,12 +524,11 @@ async def generate_image_prompts(story_text: str, topic: str = "", era: str = ""
         
         Generate prompts that are visually compelling for the {era} era and {topic} topic.
         """
-    try:
-        response = await image_prompt_model.generate_content_async(prompt)
-        return json.loads(response.text)
-    except Exception as e:
-        logger.error(f"Error generating image prompts: {e}")
-        return {"image_prompts": []}
+    async def attempt(model_name: str):
+        response = await _aux_model("gemini.image_prompts", model_name).generate_content_async(prompt)
+        return await llm_output.parse(response.text, llm_output.ImagePromptsOutput, "image_prompts")
+
+    return await model_tiers.run("gemini.image_prompts", attempt, model_tiers.valid_image_prompts, {"image_prompts": []})
 
 
 async def extract_characters(story_text: str):
@@ -442,64 +560,66 @@ async def extract_characters(story_text: str):
     Example of INCORRECT extraction (DO NOT DO THIS):
     {{"characters": ["Maratha Empire", "the poor", "foreign invaders", "Mughals", "Ashta Pradhan", "soldiers"]}}
     """
-    try:
-        # Use extraction_model to avoid system prompt interference
-        response = await extraction_model.generate_content_async(prompt)
-        text = response.text.strip()
-        # Remove potential markdown backticks if present
-        if text.startswith("```json"):
-            text = text.replace("```json", "", 1).replace("```", "", 1).strip()
-        elif text.startswith("```"):
-            text = text.replace("```", "", 2).strip()
-        
-        result = json.loads(text)
-        
-        # Additional filtering on the backend to catch any mistakes
+    async def attempt(model_name: str):
+        # Extraction models carry no story system prompt to interfere
+        response = await _aux_model("gemini.extraction", model_name).generate_content_async(prompt)
+        # Markdown fences and other small defects are repaired by the parser
+        result = await llm_output.parse(response.text, llm_output.CharactersOutput, "characters")
         if "characters" in result:
-            filtered_chars = []
-            exclude_keywords = [
-                "empire", "kingdom", "sultanate", "army", "forces", "troops", 
-                "soldiers", "warriors", "cavalry", "infantry", "people", "poor",
-                "rich", "villagers", "citizens", "invaders", "friends", "enemies",
-                "ministers", "council", "court", "dynasty", "clan", "tribe",
-                "navy", "fleet", "regiment", "battalion"
-            ]
-            
-            for char in result["characters"]:
-                char_lower = char.lower()
-                # Skip if it's a plural (ends with 's' and doesn't end with specific patterns)
-                if char_lower.endswith('s') and not any(char_lower.endswith(suffix) for suffix in ['us', 'is', 'as', 'os', 'ji', 'ais', 'ess']):
-                    continue
-                # Skip if contains any exclude keywords
-                if any(keyword in char_lower for keyword in exclude_keywords):
-                    continue
-                # Skip if it's too short (likely not a proper name)
-                if len(char.strip()) < 3:
-                    continue
-                # Skip if it starts with "the " (generic reference)
-                if char_lower.startswith("the "):
-                    continue
-                    
-                filtered_chars.append(char)
-            
-            result["characters"] = filtered_chars[:10]  # Limit to 10 characters
-            
+            result["characters"] = _filter_characters(result["characters"])
         return result
-    except Exception as e:
-        logger.error(f"Error extracting characters: {e}")
-        return {"characters": []}
+
+    return await model_tiers.run("gemini.extraction", attempt, model_tiers.valid_characters, {"characters": []})
+
+
+def _filter_characters(names: list) -> list:
+    """Additional filtering on the backend to catch any mistakes"""
+    filtered_chars = []
+    exclude_keywords = [
+        "empire", "kingdom", "sultanate", "army", "forces", "troops", 
+        "soldiers", "warriors", "cavalry", "infantry", "people", "poor",
+        "rich", "villagers", "citizens", "invaders", "friends", "enemies",
+        "ministers", "council", "court", "dynasty", "clan", "tribe",
+        "navy", "fleet", "regiment", "battalion"
+    ]
+    
+    for char in names:
+        if not isinstance(char, str):
+            continue
+        char_lower = char.lower()
+        # Skip if it's a plural (ends with 's' and doesn't end with specific patterns)
+        if char_lower.endswith('s') and not any(char_lower.endswith(suffix) for suffix in ['us', 'is', 'as', 'os', 'ji', 'ais', 'ess']):
+            continue
+        # Skip if contains any exclude keywords
+        if any(keyword in char_lower for keyword in exclude_keywords):
+            continue
+        # Skip if it's too short (likely not a proper name)
+        if len(char.strip()) < 3:
+            continue
+        # Skip if it starts with "the " (generic reference)
+        if char_lower.startswith("the "):
+            continue
+            
+        filtered_chars.append(char)
+    
+    return filtered_chars[:10]  # Limit to 10 characters
 
 
 async def generate_character_chat_response(story_context: str, character_name: str, chat_history: list, user_message: str):
-    # Construct history context
-    history_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in chat_history[-5:]])
+    # Story excerpt, summary of older turns and recent turns, each within its budget
+    memory = chat_memory.build(story_context, character_name, chat_history, user_message)
+    history_text = memory.history_text()
+    earlier = f"""
+    Earlier in this conversation:
+    {memory.summary}
+    """ if memory.summary else ""
     
     prompt = f"""
     You are {character_name}, a character from the story below.
     Your goal is to converse with the user IN CHARACTER.
     
     Context Story:
-    {story_context[:4000]}
+    {memory.context}
     
     Instructions:
     1. Stay strictly in character as {character_name}.
@@ -507,7 +627,7 @@ async def generate_character_chat_response(story_context: str, character_name: s
     3. Refer to events in the story if relevant, but you can also improvise based on your persona.
     4. Keep responses concise (under 3 sentences) and engaging.
     5. Do not break character.
-    
+    {earlier}
     Chat History:
     {history_text}
     
@@ -515,10 +635,36 @@ async def generate_character_chat_response(story_context: str, character_name: s
     {character_name}:
     """
     
-    try:
-        # Use chat_model (Text response) to avoid forcing JSON
-        response = await chat_model.generate_content_async(prompt)
-        return {"response": response.text.strip()}
-    except Exception as e:
-        logger.error(f"Error generating chat response: {e}")
-        return {"response": "I am lost for words..."}
+    async def attempt(model_name: str):
+        # Chat models answer in text, without forcing JSON
+        response = await _aux_model("gemini.chat", model_name).generate_content_async(prompt)
+        return response.text.strip()
+
+    started = time.perf_counter()
+    reply = await model_tiers.run("gemini.chat", attempt, model_tiers.valid_chat_reply, "I am lost for words...")
+    chat_memory.record_turn(memory, prompt, time.perf_counter() - started)
+    # Summarize what the next turn will need while the user reads and types
+    chat_memory.remember(memory, story_context, character_name, user_message, reply, summarize_chat)
+    return {"response": reply}
+
+
+async def summarize_chat(character_name: str, previous_summary: str, turns: str) -> str:
+    """Fold `turns` into the running summary of a chat with `character_name`."""
+    prompt = f"""
+    Summarize a conversation between a user and {character_name}, a story character, for
+    {character_name} to remember it. Keep names, facts the user shared, promises, questions
+    still open and the tone of the exchange. Write plain prose of at most
+    {settings.CHAT_SUMMARY_TOKENS * 3 // 5} words, no preamble.
+    
+    Summary so far:
+    {previous_summary or "(none)"}
+    
+    New turns:
+    {turns}
+    """
+    
+    async def attempt(model_name: str):
+        response = await _aux_model("gemini.chat_summary", model_name).generate_content_async(prompt)
+        return response.text.strip()
+
+    return await model_tiers.run("gemini.chat_summary", attempt, model_tiers.valid_chat_summary, "")
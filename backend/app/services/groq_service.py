@@ -1,29 +1,88 @@
-from groq import Groq
 from app.core.config import settings
-import json
+from app.services import llm_output, model_tiers, story_limits
+from app.services.registry import providers
+import asyncio
 import logging
 import os
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Debug: Check what we're getting
-logger.info(f"🔍 GROQ_API_KEY from settings: {settings.GROQ_API_KEY[:20] if settings.GROQ_API_KEY else 'NONE'}...")
-logger.info(f"🔍 GROQ_API_KEY from env: {os.getenv('GROQ_API_KEY', 'NONE')[:20]}...")
 
-# Initialize Groq client only if API key is provided and not empty
-client = None
-groq_key = settings.GROQ_API_KEY or os.getenv('GROQ_API_KEY', '')
+def _groq_key() -> str:
+    return (settings.GROQ_API_KEY or os.getenv('GROQ_API_KEY', '')).strip()
 
-if groq_key and len(groq_key.strip()) > 0:
+
+def _create_client():
+    # Imported here so the SDK is only loaded when Groq is actually configured/used
+    from groq import Groq
+
+    groq_key = _groq_key()
+    if not groq_key:
+        logger.warning("⚠️ GROQ_API_KEY not set - Groq service unavailable")
+        return None
+    client = Groq(api_key=groq_key)
+    logger.info("✅ Groq client initialized successfully")
+    return client
+
+
+providers.register("groq", _create_client, configured=lambda: bool(_groq_key()))
+
+
+def get_client():
+    """Groq client, created on first use; None when GROQ_API_KEY is missing."""
+    return providers.get("groq")
+
+
+async def complete_groq(system_prompt: str, user_prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+    """One chat completion, run off the event loop (the Groq client is synchronous)."""
+    client = get_client()
+    if not client:
+        raise RuntimeError("Groq API not configured")
+    kwargs = {}
+    if json_mode:
+        kwargs["response_format"] = {"type": "json_object"}
+    response = await asyncio.to_thread(
+        client.chat.completions.create,
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.7,
+        max_tokens=max_tokens,
+        top_p=0.95,
+        **kwargs
+    )
+    return response.choices[0].message.content
+
+
+def _stream_story(client, messages: list, max_tokens: int, monitor: story_limits.StreamMonitor) -> str:
+    """Blocking: streams one JSON completion into `monitor` until it ends or the monitor stops it. Returns the finish reason."""
+    stream = client.chat.completions.create(
+        model="llama-3.3-70b-versatile",  # Fast and high-quality
+        messages=messages,
+        temperature=0.7,
+        max_tokens=max_tokens,
+        top_p=0.95,
+        response_format={"type": "json_object"},  # Ensures JSON output
+        stream=True
+    )
+    finish_reason = "complete"
     try:
-        client = Groq(api_key=groq_key.strip())
-        logger.info("✅ Groq client initialized successfully")
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize Groq client: {e}")
-        client = None
-else:
-    logger.warning("⚠️ GROQ_API_KEY not set - Groq service unavailable")
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason == "length":
+                finish_reason = "length"
+            if choice.delta.content and monitor.feed(choice.delta.content):
+                break
+    finally:
+        # Closing the HTTP stream is what stops the upstream generation
+        stream.close()
+    return finish_reason
 
 
 async def generate_story_groq(topic: str, era: str, style: str, story_type: str = "Historical", language: str = "English"):
@@ -31,6 +90,7 @@ async def generate_story_groq(topic: str, era: str, style: str, story_type: str
     Generate story using Groq's ultra-fast inference with Llama 3.3 70B
     Much faster than Gemini while maintaining quality
     """
+    client = get_client()
     if not client:
         logger.error("Groq client not initialized - missing API key")
         return {"error": "Groq API not configured"}
@@ -227,27 +287,36 @@ Requirements:
 
 Output ONLY the JSON object - no markdown formatting."""
 
+    result_text = ""
     try:
         # Use Groq's ultra-fast Llama 3.3 70B model
         logger.info(f"🚀 Generating {story_type} story with Groq (topic: {topic})")
+        started = time.perf_counter()
         
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",  # Fast and high-quality
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7,
-            max_tokens=8192,
-            top_p=0.95,
-            response_format={"type": "json_object"}  # Ensures JSON output
-        )
+        # Streamed, so generation can stop as soon as the JSON closes or the model loops
+        budget = story_limits.token_budget(story_type, language)
+        monitor = story_limits.StreamMonitor()
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        try:
+            finish_reason = await asyncio.to_thread(_stream_story, client, messages, budget, monitor)
+        except asyncio.CancelledError:
+            monitor.abort()
+            raise
+        stop_reason = story_limits.record(budget, monitor, finish_reason)
         
-        result_text = response.choices[0].message.content
-        logger.info(f"✅ Groq generation completed in {response.usage.total_time if hasattr(response, 'usage') else 'N/A'}s")
+        result_text = monitor.text()
+        logger.info(f"✅ Groq generation completed in {time.perf_counter() - started:.1f}s ({stop_reason})")
         
-        # Parse JSON
-        story_data = json.loads(result_text)
+        # Parse JSON, repairing small defects locally; one short fix-up call if that fails,
+        # and a continuation call if the story was cut off
+        story_data = await llm_output.parse(
+            result_text, llm_output.StoryOutput, "story",
+            followup=lambda prompt: complete_groq(system_prompt, prompt, budget, json_mode=True),
+            require_complete=True, truncated=stop_reason == "length",
+        )
         
         # Validate required fields
         required_fields = ["title", "story_content", "moral"]
@@ -266,7 +335,7 @@ Output ONLY the JSON object - no markdown formatting."""
             
         return story_data
         
-    except json.JSONDecodeError as e:
+    except ValueError as e:
         logger.error(f"JSON parsing error: {e}")
         logger.error(f"Response text: {result_text[:500]}")
         return {"error": f"Failed to parse AI response: {str(e)}"}
@@ -277,6 +346,7 @@ Output ONLY the JSON object - no markdown formatting."""
 
 async def generate_image_prompts_groq(story_text: str, topic: str = "", era: str = "", story_type: str = "Historical"):
     """Generate image prompts from story using Groq"""
+    client = get_client()
     if not client:
         return {"image_prompts": []}
     
@@ -295,7 +365,7 @@ RULES:
 2. Focus on: Architecture, Landscapes, Environments, Symbolic elements
 3. Output valid JSON: {"image_prompts": [{"scene_description": "...", "negative_prompt": "..."}]}"""
 
-    user_prompt = f"""Create 2-3 visual prompts from this {story_type} story:
+    user_prompt = f"""Create 3 visual prompts from this {story_type} story:
 
 TOPIC: {topic}
 ERA: {era}
@@ -309,9 +379,11 @@ Each prompt needs:
 
 Output ONLY the JSON object."""
 
-    try:
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
+    async def attempt(model: str):
+        # Off the event loop, so a disconnect can cancel the request while the call runs
+        response = await asyncio.to_thread(
+            client.chat.completions.create,
+            model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
@@ -320,10 +392,6 @@ Output ONLY the JSON object."""
             max_tokens=1024,
             response_format={"type": "json_object"}
         )
-        
-        result = json.loads(response.choices[0].message.content)
-        return result
-        
-    except Exception as e:
-        logger.error(f"Image prompt generation error: {e}")
-        return {"image_prompts": []}
+        return await llm_output.parse(response.choices[0].message.content, llm_output.ImagePromptsOutput, "image_prompts")
+
+    return await model_tiers.run("groq.image_prompts", attempt, model_tiers.valid_image_prompts, {"image_prompts": []})
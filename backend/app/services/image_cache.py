@@ -0,0 +1,185 @@
+"""
+Prompt-to-image cache.
+
+Stories on the same topic ask Flux for nearly the same scenes. A generated
+image is stored in blob storage under its content hash
+("images/<sha256>.png") and a small pointer blob, keyed on the normalized
+prompt, negative prompt and model, maps the request to it
+("image-cache/<key>.json"). A repeat prompt is answered from storage
+without a provider call, in the same shape generate_image returns (data URL,
+or the provider's remote URL).
+
+Optional perceptual dedupe: when Pillow is installed, each new image gets a
+64-bit difference hash; an image within IMAGE_PHASH_MAX_DISTANCE bits of
+one already stored reuses that blob instead of storing a near-copy.
+
+Placeholders (no key, provider errors) are never cached.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import re
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.files import write_atomic
+from app.services.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+POINTER_PREFIX = "image-cache/"
+IMAGE_PREFIX = "images/"
+PLACEHOLDER_HOST = "placehold.co"
+DATA_URL = re.compile(r"^data:(image/[\w.+-]+);base64,(.*)$", re.S)
+PHASH_INDEX_SIZE = 4096
+
+
+def normalize_prompt(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").lower()).strip(" .,;")
+
+
+def cache_key(prompt: str, negative_prompt: str, model: str) -> str:
+    raw = json.dumps([normalize_prompt(prompt), normalize_prompt(negative_prompt), model])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def difference_hash(data: bytes) -> Optional[int]:
+    """64-bit dHash of the image, or None when Pillow is unavailable or the bytes do not decode."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            pixels = list(image.convert("L").resize((9, 8)).getdata())
+    except Exception:
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+class ImageCache:
+    def __init__(self, memory_entries: int = 1024):
+        self.memory_entries = memory_entries
+        self.pointers: "OrderedDict[str, dict]" = OrderedDict()  # hot pointer blobs
+        self.phashes: "OrderedDict[str, int]" = OrderedDict()  # image key -> dHash
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.deduped = 0
+
+    def _remember(self, key: str, pointer: dict):
+        self.pointers[key] = pointer
+        self.pointers.move_to_end(key)
+        while len(self.pointers) > self.memory_entries:
+            self.pointers.popitem(last=False)
+
+    async def _read(self, key: str) -> Optional[bytes]:
+        storage = get_storage()
+        if await storage.stat(key) is None:
+            return None
+        return b"".join([chunk async for chunk in storage.open_range(key)])
+
+    async def _put_bytes(self, key: str, data: bytes, content_type: str):
+        storage = get_storage()
+        path = storage.scratch_path()
+        await write_atomic(path, data)
+        await storage.put_file(key, path, content_type)
+
+    async def get(self, prompt: str, negative_prompt: str, model: str) -> Optional[str]:
+        if not settings.IMAGE_CACHE_ENABLED:
+            return None
+        key = cache_key(prompt, negative_prompt, model)
+        pointer = self.pointers.get(key)
+        if pointer is None:
+            raw = await self._read(f"{POINTER_PREFIX}{key}.json")
+            pointer = json.loads(raw) if raw else None
+        result = await self._resolve(pointer) if pointer else None
+        if result is None:
+            self.misses += 1
+            self.pointers.pop(key, None)
+            return None
+        self._remember(key, pointer)
+        self.hits += 1
+        return result
+
+    async def _resolve(self, pointer: dict) -> Optional[str]:
+        if "url" in pointer:
+            return pointer["url"]
+        # The image blob may have been garbage-collected since; that is a miss
+        data = await self._read(pointer["image"])
+        if data is None:
+            return None
+        return f"data:{pointer['mime']};base64,{base64.b64encode(data).decode('ascii')}"
+
+    def _near_duplicate(self, phash: int) -> Optional[str]:
+        for image_key, other in self.phashes.items():
+            if bin(phash ^ other).count("1") <= settings.IMAGE_PHASH_MAX_DISTANCE:
+                return image_key
+        return None
+
+    async def put(self, prompt: str, negative_prompt: str, model: str, result: str):
+        if not settings.IMAGE_CACHE_ENABLED or not result or PLACEHOLDER_HOST in result:
+            return
+        key = cache_key(prompt, negative_prompt, model)
+        try:
+            pointer = await self._store(result)
+            if pointer is None:
+                return
+            await self._put_bytes(f"{POINTER_PREFIX}{key}.json", json.dumps(pointer).encode("utf-8"), "application/json")
+            self._remember(key, pointer)
+        except Exception as e:
+            # The cache is an optimization; the request already has its image
+            logger.error(f"Image cache store failed: {e}")
+
+    async def _store(self, result: str) -> Optional[dict]:
+        match = DATA_URL.match(result)
+        if not match:
+            return {"url": result} if result.startswith(("http://", "https://")) else None
+        mime = match.group(1)
+        try:
+            data = await asyncio.to_thread(base64.b64decode, match.group(2), validate=False)
+        except (binascii.Error, ValueError):
+            return None
+        extension = mimetypes.guess_extension(mime) or ".img"
+        image_key = f"{IMAGE_PREFIX}{hashlib.sha256(data).hexdigest()}{extension}"
+
+        if settings.IMAGE_PHASH_DEDUPE:
+            phash = await asyncio.to_thread(difference_hash, data)
+            if phash is not None:
+                duplicate = self._near_duplicate(phash)
+                if duplicate and duplicate != image_key:
+                    self.deduped += 1
+                    return {"image": duplicate, "mime": mime}
+                self.phashes[image_key] = phash
+                while len(self.phashes) > PHASH_INDEX_SIZE:
+                    self.phashes.popitem(last=False)
+
+        if await get_storage().stat(image_key) is None:
+            await self._put_bytes(image_key, data, mime)
+            self.stored += 1
+        return {"image": image_key, "mime": mime}
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+            "images_stored": self.stored,
+            "near_duplicates_reused": self.deduped,
+            "memory_entries": len(self.pointers),
+            "phash_indexed": len(self.phashes),
+        }
+
+
+cache = ImageCache(settings.IMAGE_CACHE_MEMORY_ENTRIES)
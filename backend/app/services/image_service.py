@@ -1,12 +1,14 @@
 import httpx
 from app.core.config import settings
+from app.core.log_utils import log_event, preview
 import logging
-import json
 import asyncio
 
 logger = logging.getLogger(__name__)
 
-async def generate_image(prompt: str, negative_prompt: str = "", retry_count: int = 0):
+IMAGE_MODEL = "black-forest-labs/flux.2-klein-4b"
+
+async def generate_image(prompt: str, negative_prompt: str = "", retry_count: int = 0, model: str = IMAGE_MODEL):
     if not settings.OPENROUTER_API_KEY:
         logger.warning("OPENROUTER_API_KEY not set. Returning placeholder.")
         return "https://placehold.co/600x400?text=No+API+Key+For+Image"
@@ -25,7 +27,7 @@ async def generate_image(prompt: str, negative_prompt: str = "", retry_count: in
 
     # OpenRouter FLUX image generation - simpler format
     payload = {
-        "model": "black-forest-labs/flux.2-klein-4b",
+        "model": model,
         "messages": [
             {
                 "role": "user",
@@ -45,21 +47,21 @@ async def generate_image(prompt: str, negative_prompt: str = "", retry_count: in
             )
             
             if response.status_code == 404:
-                logger.error(f"OpenRouter 404 Error - Model might be unavailable: {response.text}")
+                log_event(logger, logging.ERROR, "openrouter.model_unavailable", status=404, bytes=len(response.content), body=preview(response.content))
                 # Retry with exponential backoff (max 2 retries)
                 if retry_count < 2:
                     wait_time = (retry_count + 1) * 2  # 2s, 4s
                     logger.info(f"Retrying after {wait_time}s... (attempt {retry_count + 1}/2)")
                     await asyncio.sleep(wait_time)
-                    return await generate_image(prompt, negative_prompt, retry_count + 1)
+                    return await generate_image(prompt, negative_prompt, retry_count + 1, model)
                 return f"https://placehold.co/600x400?text=Model+Unavailable"
             
             if response.status_code != 200:
-                logger.error(f"OpenRouter API Error: {response.status_code} - {response.text}")
+                log_event(logger, logging.ERROR, "openrouter.error", status=response.status_code, bytes=len(response.content), body=preview(response.content))
                 return f"https://placehold.co/600x400?text=Error+{response.status_code}"
             
             result = response.json()
-            logger.info(f"OpenRouter Response Structure: {json.dumps(result, indent=2)[:500]}")
+            log_event(logger, logging.DEBUG, "openrouter.response", status=response.status_code, bytes=len(response.content), body=result)
             
             # According to OpenRouter docs: "The generated images are returned as 
             # base64-encoded data URLs in the assistant message"
@@ -68,20 +70,16 @@ async def generate_image(prompt: str, negative_prompt: str = "", retry_count: in
             
             if result.get("choices") and len(result["choices"]) > 0:
                 message = result["choices"][0]["message"]
-                logger.info(f"Message keys: {message.keys()}")
-                logger.info(f"Message content: {message.get('content', 'NO CONTENT')[:200]}")
-                logger.info(f"Message images: {message.get('images', 'NO IMAGES')}")
                 
                 # Method 1: Check for images array (documented format)
                 if message.get("images") and len(message["images"]) > 0:
                     image_data = message["images"][0]
-                    logger.info(f"Found image data: {type(image_data)}")
                     if isinstance(image_data, dict) and "image_url" in image_data:
                         image_url = image_data["image_url"]["url"]
-                        logger.info(f"Returning image URL (length: {len(image_url)})")
+                        log_event(logger, logging.INFO, "openrouter.image", source="images", url=image_url)
                         return image_url
                     elif isinstance(image_data, str):
-                        logger.info(f"Returning direct image string (length: {len(image_data)})")
+                        log_event(logger, logging.INFO, "openrouter.image", source="images", url=image_data)
                         return image_data
                 
                 # Method 2: Check content field for base64 data URL
@@ -97,7 +95,7 @@ async def generate_image(prompt: str, negative_prompt: str = "", retry_count: in
                     if match:
                         return match.group(1)
 
-            logger.error(f"Unexpected response format. Full response: {result}")
+            log_event(logger, logging.ERROR, "openrouter.unexpected_format", body=result)
             return "https://placehold.co/600x400?text=Format+Error"
 
     except Exception as e:
@@ -0,0 +1,85 @@
+"""
+Image generation tiers.
+
+A tier fixes how many illustrations a story gets and which Flux model
+draws them. The tier for a request is the one it asks for (`imageTier`,
+default "auto"), capped by current load on the image provider: the images
+already promised to stories in flight, relative to IMAGE_MAX_CONCURRENCY,
+and the recent time each generation holds an admission slot.
+During a spike stories drop to fewer, cheaper images instead of everyone
+waiting on the image queue. When the provider is idle "auto" gets
+IMAGE_TIER_AUTO_MAX (standard unless configured), so adaptive tiers never
+raise the cost of a default request; "rich" must be asked for or enabled.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from app.core import admission
+from app.core.config import settings
+from app.services.image_service import IMAGE_MODEL
+
+
+@dataclass(frozen=True)
+class ImageTier:
+    name: str
+    count: int
+    model: str
+
+
+def tiers() -> dict:
+    return {
+        "rich": ImageTier("rich", 3, settings.IMAGE_TIER_RICH_MODEL or IMAGE_MODEL),
+        "standard": ImageTier("standard", 2, IMAGE_MODEL),
+        "lite": ImageTier("lite", 1, IMAGE_MODEL),
+    }
+
+
+ORDER = ["lite", "standard", "rich"]
+
+# Images promised to stories that are currently in their image phase (queued,
+# rendering or about to be); the load signal used to pick tiers
+_reserved = 0
+
+
+def load_allows() -> Tuple[str, str]:
+    """Best tier the image provider can take right now, and why."""
+    pressure = _reserved / max(1, settings.IMAGE_MAX_CONCURRENCY)
+    gate = admission.stats().get("image")
+    hold = gate["avg_hold_s"] if gate else 0.0
+    if pressure >= settings.IMAGE_TIER_LITE_PRESSURE or hold >= settings.IMAGE_TIER_SLOW_S:
+        return "lite", f"pressure={pressure:.2f} hold={hold:.1f}s"
+    if pressure >= settings.IMAGE_TIER_RICH_MAX_PRESSURE:
+        return "standard", f"pressure={pressure:.2f}"
+    return "rich", f"pressure={pressure:.2f}"
+
+
+def choose(requested: Optional[str]) -> Tuple[ImageTier, dict]:
+    """Returns the tier to use and a record of the decision for the response."""
+    requested = (requested or "auto").lower()
+    if requested not in ORDER:
+        requested = "auto"
+    # "auto" is standard, or whatever the load allows when adaptive; it only counts as degraded below standard
+    baseline = "standard" if requested == "auto" else requested
+    if settings.IMAGE_TIERS_ADAPTIVE:
+        allowed, reason = load_allows()
+        auto_max = settings.IMAGE_TIER_AUTO_MAX if settings.IMAGE_TIER_AUTO_MAX in ORDER else "standard"
+        wanted = auto_max if requested == "auto" else requested
+        name = ORDER[min(ORDER.index(wanted), ORDER.index(allowed))]
+    else:
+        name, reason = baseline, "fixed"
+    tier = tiers()[name]
+    return tier, {"name": name, "requested": requested, "count": tier.count, "model": tier.model,
+                  "degraded": ORDER.index(name) < ORDER.index(baseline), "reason": reason}
+
+
+@contextmanager
+def reserve(requested: Optional[str]):
+    """Choose a tier and count its images against the load until the block exits."""
+    global _reserved
+    tier, info = choose(requested)
+    _reserved += tier.count
+    try:
+        yield tier, info
+    finally:
+        _reserved -= tier.count
@@ -0,0 +1,141 @@
+"""
+Language detection and narrator voice selection for story audio.
+
+Detection works on a bounded prefix of the text and only uses C-level
+string operations (no per-character Python loop, no regex):
+1. Script histogram from the UTF-8 encoding: every Devanagari code point
+   (U+0900-U+097F) starts with the byte pair E0 A4 or E0 A5, so counting
+   those pairs counts Devanagari letters; deleting every byte that is not
+   an ASCII letter leaves the Latin count.
+2. For Devanagari text, Hindi vs Marathi is decided by weighted character
+   n-grams that are common in one language and rare in the other
+   ("आहे", "च्या", "ळ" vs " है", " में ", "नहीं", ...).
+
+Everything here is pure and cheap (tens of microseconds on long texts), so
+it can run on the event loop.
+"""
+import logging
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Language-specific voice mappings
+# Each language has a default voice and optionally style-based voices
+LANGUAGE_VOICE_MAP = {
+    "Hindi": {
+        "Default": "hi-IN-SwaraNeural",       # Female Hindi
+        "Male": "hi-IN-MadhurNeural",          # Male Hindi
+        "Historical": "hi-IN-MadhurNeural",
+        "Creative": "hi-IN-SwaraNeural",
+        "Mythology": "hi-IN-SwaraNeural",
+        "Mystery": "hi-IN-MadhurNeural",
+    },
+    "Marathi": {
+        "Default": "mr-IN-AarohiNeural",       # Female Marathi
+        "Male": "mr-IN-ManoharNeural",          # Male Marathi
+        "Historical": "mr-IN-ManoharNeural",
+        "Creative": "mr-IN-AarohiNeural",
+        "Mythology": "mr-IN-AarohiNeural",
+        "Mystery": "mr-IN-ManoharNeural",
+    },
+    "English": {
+        "Default": "en-US-ChristopherNeural",
+        "Historical": "en-GB-SoniaNeural",
+        "Creative": "en-US-GuyNeural",
+        "Mythology": "en-IN-NeerjaNeural",
+        "TimeTravel": "en-US-AriaNeural",
+        "SciFi": "en-US-DavisNeural",
+        "Mystery": "en-US-GuyNeural",
+    },
+}
+
+DEFAULT_LANGUAGE = "English"
+DEFAULT_VOICE = "en-US-ChristopherNeural"
+
+# Detection looks at this many characters; the n-gram vote needs fewer to settle
+SAMPLE_CHARS = 1000
+NGRAM_SAMPLE_CHARS = 800
+
+_NOT_ASCII_LETTERS = bytes(b for b in range(256) if not (65 <= b <= 90 or 97 <= b <= 122))
+_DEVANAGARI_LEADS = (b"\xe0\xa4", b"\xe0\xa5")
+
+# The usual word ends besides spaces, so word-boundary n-grams match
+_BOUNDARIES = ("।", "\n", ",", ".", "?", "!")
+
+# Positive weight: Marathi; negative: Hindi
+DEVANAGARI_NGRAMS = {
+    "ळ": 2.0,
+    "आहे": 3.0,
+    " आणि ": 3.0,
+    "च्या": 2.5,
+    "मध्ये": 3.0,
+    "नाही": 2.5,
+    "झाल": 2.0,
+    "ांनी": 2.0,
+    "ांना": 2.0,
+    "ाचे ": 2.0,
+    "ाची ": 2.0,
+    "ाचा ": 2.0,
+    " हे ": 1.0,
+    " है": -2.5,
+    "हैं": -1.0,
+    " और ": -3.0,
+    " में ": -3.0,
+    "नहीं": -2.5,
+    " के ": -2.0,
+    " की ": -2.0,
+    " का ": -1.5,
+    " से ": -2.0,
+    " को ": -2.0,
+    " ने ": -1.5,
+    " था ": -1.5,
+    " थी ": -1.5,
+    " यह ": -1.5,
+}
+
+
+def script_histogram(text: str) -> Dict[str, int]:
+    """Latin and Devanagari letter counts in the sampled prefix."""
+    sample = text[:SAMPLE_CHARS].encode("utf-8")
+    return {
+        "latin": len(sample.translate(None, _NOT_ASCII_LETTERS)),
+        "devanagari": sum(sample.count(lead) for lead in _DEVANAGARI_LEADS),
+    }
+
+
+def devanagari_language(text: str) -> Tuple[str, float]:
+    """Hindi or Marathi for Devanagari text, with the n-gram score (> 0 leans Marathi)."""
+    # str.count on the (2-byte-per-char) str beats bytes.count on 3-byte UTF-8 here
+    sample = text[:NGRAM_SAMPLE_CHARS]
+    for boundary in _BOUNDARIES:
+        sample = sample.replace(boundary, " ")
+    sample = f" {sample} "
+    score = sum(weight * sample.count(ngram) for ngram, weight in DEVANAGARI_NGRAMS.items())
+    return ("Marathi" if score > 0 else "Hindi"), score
+
+
+def detect_language(text: str) -> str:
+    """Best guess among the languages we have voices for."""
+    counts = script_histogram(text)
+    # If very few non-latin characters, default to English
+    if counts["devanagari"] < 10 and counts["latin"] > 20:
+        return DEFAULT_LANGUAGE
+    if counts["devanagari"] <= counts["latin"]:
+        return DEFAULT_LANGUAGE
+    language, score = devanagari_language(text)
+    logger.debug(f"Language auto-detected as {language} (devanagari={counts['devanagari']}, score={score:.1f})")
+    return language
+
+
+def voice_for(language: str, story_type: str) -> str:
+    """Get the best voice for a given language and story type."""
+    lang_voices = LANGUAGE_VOICE_MAP.get(language, LANGUAGE_VOICE_MAP[DEFAULT_LANGUAGE])
+    # Try story-type-specific voice first, then default for that language
+    return lang_voices.get(story_type, lang_voices.get("Default", DEFAULT_VOICE))
+
+
+def resolve_voice(text: str, language: str = "", story_type: str = "Historical") -> Tuple[str, str]:
+    """(language, voice) for narrating `text`: the explicit language if we support it, else detected."""
+    if not (language and language in LANGUAGE_VOICE_MAP):
+        language = detect_language(text)
+    return language, voice_for(language, story_type)
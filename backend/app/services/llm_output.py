@@ -0,0 +1,324 @@
+"""
+Parsing and validation of structured LLM output.
+
+Models occasionally return JSON that is almost right: wrapped in markdown
+fences, with a trailing comma, raw newlines inside strings, prose after the
+object, or cut off mid-string when they hit the token limit. Failing the
+request there costs the user a full regeneration. `parse()` instead:
+
+1. tries json.loads as is;
+2. runs a local repair pass (strip fences, drop trailing commas, escape
+   control characters in strings, close an unterminated string and any open
+   brackets) and parses again;
+3. validates the result against the pydantic schema for the task;
+4. only if that still fails, and the caller passed `followup`, makes one
+   short "fix this JSON" call and validates its answer.
+
+Closing a cut-off object locally is fine for a list of prompts (the partial
+item is dropped) but not for a story: the text would end mid-sentence and
+the fields after it would be missing. With `require_complete`, output that
+was cut off (the repair had to close it, or the caller says the stream hit
+its token limit) is instead sent to a "continue" follow-up, which returns
+only the rest of the open field and the missing fields; these are merged
+into what was received.
+
+Outcomes are counted per schema; `regenerations_saved` is the number of
+responses that would have failed without steps 2-4.
+"""
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+FENCE = re.compile(r"^\s*```[\w-]*\s*|\s*```\s*$")
+DANGLING_KEY = re.compile(r'[,{]\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+TRAILING_COMMA = re.compile(r",\s*([}\]])")
+CLOSERS = {"{": "}", "[": "]"}
+CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+class OutputError(ValueError):
+    """The output could not be parsed or validated, even after repair."""
+
+
+# Schemas
+
+class TimelineEntry(BaseModel):
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+    date: str = ""
+    event: str = ""
+
+
+class StoryOutput(BaseModel):
+    model_config = ConfigDict(extra="allow", coerce_numbers_to_str=True)
+    title: str = Field(min_length=1)
+    era: str = ""
+    timeline: List[TimelineEntry] = []
+    main_events_summary: List[str] = []
+    story_content: str = Field(min_length=1)
+    moral: str = ""
+
+
+class ImagePrompt(BaseModel):
+    scene_description: str = Field(min_length=1)
+    negative_prompt: str = ""
+
+
+class ImagePromptsOutput(BaseModel):
+    image_prompts: List[ImagePrompt] = Field(min_length=1)
+
+
+class CharactersOutput(BaseModel):
+    characters: List[str] = []
+
+
+# Repair
+
+def repair_json(text: str) -> str:
+    """Best-effort fix of common JSON damage; the result may still not parse."""
+    return _repair(text)[0]
+
+
+def _repair(text: str) -> Tuple[str, bool, bool]:
+    """
+    (repaired text, cut_off, open_value): cut_off if the text ended inside the
+    top-level value, open_value if it ended inside a string value of the
+    top-level object (the last key of the repaired object).
+    """
+    # Only the left side: trailing whitespace of a cut-off string is content the continuation follows
+    text = FENCE.sub("", text.lstrip())
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return text, False, False
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escaped = False
+    string_start = 0
+    for ch in text[start:]:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            elif ch in CONTROL_ESCAPES:
+                ch = CONTROL_ESCAPES[ch]
+            out.append(ch)
+            continue
+        if ch == '"':
+            in_string = True
+            string_start = len(out)
+        elif ch in CLOSERS:
+            stack.append(ch)
+        elif ch in "}]":
+            if not stack or CLOSERS[stack[-1]] != ch:
+                continue  # stray closer
+            _drop_trailing_comma(out)
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                break  # anything after the top-level value is prose
+            continue
+        out.append(ch)
+
+    if not stack:
+        return "".join(out), False, False
+
+    open_value = in_string and stack == ["{"] and "".join(out[:string_start]).rstrip().endswith(":")
+    # Cut off: finish the open string (a cut-off list item such as a name is
+    # dropped instead), then close the brackets, dropping a half-written key
+    # ("sto or "story": with no value) if that is what breaks it
+    if in_string and stack[-1] == "[":
+        del out[string_start:]
+    elif in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    tail = "".join(out)
+    closers = "".join(CLOSERS[opener] for opener in reversed(stack))
+    if not tail.rstrip().endswith(":"):
+        candidate = _strip_comma(tail) + closers
+        try:
+            json.loads(candidate)
+            return candidate, True, open_value
+        except ValueError:
+            pass
+    match = DANGLING_KEY.search(tail)
+    if match:
+        tail = tail[:match.start() + 1]
+    return _strip_comma(tail) + closers, True, open_value
+
+
+def _drop_trailing_comma(out: List[str]):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def _strip_comma(text: str) -> str:
+    text = text.rstrip()
+    return text[:-1] if text.endswith(",") else text
+
+
+def _quick_candidates(text: str):
+    # C-speed fixes that cover most damage: fences/prose around the object
+    # (strict=False also accepts raw control characters in strings), then
+    # trailing commas. The character-level repair_json is the last resort.
+    start, end = text.find("{"), text.rfind("}")
+    if 0 <= start < end:
+        body = text[start:end + 1]
+        yield body
+        yield TRAILING_COMMA.sub(r"\1", body)
+
+
+def loads(text: str) -> Tuple[Any, bool]:
+    """(value, repaired); raises ValueError if even the repaired text does not parse."""
+    value, repaired, _, _ = _loads(text)
+    return value, repaired
+
+
+def _loads(text: str) -> Tuple[Any, bool, bool, bool]:
+    """(value, repaired, cut_off, open_value); see _repair."""
+    try:
+        return json.loads(text), False, False, False
+    except (TypeError, ValueError):
+        if not isinstance(text, str):
+            raise
+    for candidate in _quick_candidates(text):
+        try:
+            return json.loads(candidate, strict=False), True, False, False
+        except ValueError:
+            pass
+    repaired, cut_off, open_value = _repair(text)
+    return json.loads(repaired), True, cut_off, open_value
+
+
+# Parse + validate + follow-up
+
+_counts: Dict[str, Dict[str, int]] = {}
+
+
+def _record(schema: str, outcome: str):
+    counts = _counts.setdefault(schema, {"clean": 0, "repaired": 0, "followup_fixed": 0, "continued": 0, "failed": 0})
+    counts[outcome] += 1
+
+
+def fix_prompt(text: str, error: Exception) -> str:
+    return f"""The JSON below is malformed or does not match the required structure.
+Error: {str(error)[:300]}
+
+Return ONLY the corrected JSON object with the same content and keys (no markdown, no extra text).
+If it was cut off, complete the missing part briefly.
+
+{text}"""
+
+
+def continue_prompt(text: str, open_key: str, missing: List[str]) -> str:
+    parts = []
+    if open_key:
+        parts.append(f'"{open_key}": only the text that comes after where "{open_key}" stops below, '
+                     f"starting with the very next character (do not repeat what is there)")
+    if missing:
+        parts.append(f"complete values for the missing keys: {', '.join(missing)}")
+    return f"""The JSON below was cut off before it was finished.
+
+Return ONLY a JSON object (no markdown, no extra text) with:
+{chr(10).join(f"- {part}" for part in parts)}
+
+{text}"""
+
+
+async def _continue(text: str, data: dict, open_key: str, schema: Type[BaseModel], name: str,
+                    followup: Callable[[str], Awaitable[str]]) -> dict:
+    """Ask for the rest of cut-off output and merge it into `data`."""
+    missing = [key for key in schema.model_fields if key not in data]
+    logger.warning(f"{name} output was cut off{f' in {open_key}' if open_key else ''}, asking for the rest")
+    try:
+        rest, _ = loads(await followup(continue_prompt(text, open_key, missing)))
+        if not isinstance(rest, dict):
+            raise ValueError("continuation is not a JSON object")
+        merged = dict(data)
+        if open_key and isinstance(rest.get(open_key), str):
+            merged[open_key] = data[open_key] + rest[open_key]
+        for key in missing:
+            if key in rest:
+                merged[key] = rest[key]
+        result = schema.model_validate(merged).model_dump(exclude_unset=True)
+    except Exception as e:
+        _record(name, "failed")
+        raise OutputError(f"Invalid {name} output after continuation call: {e}") from e
+    _record(name, "continued")
+    return result
+
+
+async def parse(text: str, schema: Type[BaseModel], name: str,
+                followup: Optional[Callable[[str], Awaitable[str]]] = None,
+                require_complete: bool = False, truncated: bool = False) -> dict:
+    """
+    Validated output as a dict with only the keys the model actually sent
+    (so callers' defaults for missing optional fields still apply).
+
+    With `require_complete`, output that was cut off is continued through
+    `followup` rather than closed locally; `truncated` says the stream ended
+    at its token limit (or was cut back), so any repair means it was cut off.
+    """
+    if not settings.LLM_OUTPUT_REPAIR:
+        # Plain json.loads, as before repair existed
+        try:
+            data = json.loads(text)
+        except ValueError:
+            _record(name, "failed")
+            raise
+        _record(name, "clean")
+        return data
+    data = None
+    cut_off = False
+    try:
+        data, repaired, cut_off, open_value = _loads(text)
+        cut_off = require_complete and (cut_off or (truncated and repaired))
+        if not cut_off:
+            result = schema.model_validate(data).model_dump(exclude_unset=True)
+            _record(name, "repaired" if repaired else "clean")
+            if repaired:
+                logger.info(f"Repaired malformed {name} JSON locally")
+            return result
+        error = OutputError(f"{name} output was cut off")
+    except ValueError as e:  # includes JSONDecodeError and pydantic's ValidationError
+        error = e
+    if followup is None:
+        _record(name, "failed")
+        raise OutputError(f"Invalid {name} output: {error}")
+    if cut_off and isinstance(data, dict):
+        open_key = next(reversed(data), "") if open_value else ""
+        if not isinstance(data.get(open_key), str):
+            open_key = ""
+        return await _continue(text, data, open_key, schema, name, followup)
+
+    logger.warning(f"{name} output invalid after local repair ({str(error)[:120]}), asking for a fix")
+    try:
+        data, _ = loads(await followup(fix_prompt(text, error)))
+        result = schema.model_validate(data).model_dump(exclude_unset=True)
+    except Exception as e:
+        _record(name, "failed")
+        raise OutputError(f"Invalid {name} output after fix-up call: {e}") from e
+    _record(name, "followup_fixed")
+    return result
+
+
+def stats() -> dict:
+    return {
+        name: dict(counts, regenerations_saved=counts["repaired"] + counts["followup_fixed"] + counts["continued"])
+        for name, counts in _counts.items()
+    }
+
+
+def reset():
+    _counts.clear()
@@ -0,0 +1,141 @@
+"""
+Per-task model ladders for the short auxiliary LLM calls.
+
+Image-prompt generation, character extraction, character chat and chat
+summaries are small structured tasks that do not need the large models. Each task has a ladder
+in settings.AUX_MODELS, smallest first, e.g.
+
+    "gemini.extraction": ["gemini-2.5-flash-lite", "gemini-1.5-flash"]
+
+`run()` tries the first model and only moves up the ladder when the call
+fails or its output does not pass the task's validator. Every attempt is
+recorded per task and model (latency, valid/invalid/error counts), so the
+ladders can be tuned from /aux-models/stats.
+"""
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 500  # recent attempts per model kept for percentiles
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))] if ordered else 0.0
+
+
+class TaskStats:
+    def __init__(self):
+        self.calls = 0
+        self.escalated = 0  # calls that needed more than the first model
+        self.failed = 0  # calls where no model produced valid output
+        self.models: Dict[str, dict] = {}
+
+    def record(self, model: str, outcome: str, seconds: float):
+        entry = self.models.setdefault(model, {
+            "attempts": 0, "valid": 0, "invalid": 0, "error": 0, "latency_ms": deque(maxlen=LATENCY_WINDOW),
+        })
+        entry["attempts"] += 1
+        entry[outcome] += 1
+        entry["latency_ms"].append(seconds * 1000)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "escalated": self.escalated,
+            "failed": self.failed,
+            "escalation_rate": round(self.escalated / self.calls, 3) if self.calls else None,
+            "models": {
+                model: {
+                    "attempts": entry["attempts"],
+                    "valid": entry["valid"],
+                    "invalid": entry["invalid"],
+                    "error": entry["error"],
+                    "valid_rate": round(entry["valid"] / entry["attempts"], 3),
+                    "p50_ms": round(_percentile(entry["latency_ms"], 50), 1),
+                    "p95_ms": round(_percentile(entry["latency_ms"], 95), 1),
+                }
+                for model, entry in self.models.items()
+            },
+        }
+
+
+_stats: Dict[str, TaskStats] = {}
+
+
+def models_for(task: str) -> List[str]:
+    """The task's ladder; only its first rung when escalation is off."""
+    ladder = settings.AUX_MODELS.get(task) or []
+    if isinstance(ladder, str):
+        ladder = [ladder]
+    return list(ladder if settings.AUX_MODEL_ESCALATION else ladder[:1])
+
+
+async def run(task: str, attempt: Callable[[str], Awaitable[Any]], validate: Callable[[Any], bool], fallback: Any) -> Any:
+    """
+    `attempt(model)` makes the call; ValueError (including JSON decode
+    errors) counts as invalid output, any other exception as a provider
+    error. Returns the first valid result, else the last non-empty
+    invalid result, else `fallback`.
+    """
+    best = fallback
+    ladder = models_for(task)
+    stats = _stats.setdefault(task, TaskStats())
+    stats.calls += 1
+    for rung, model in enumerate(ladder):
+        if rung == 1:
+            stats.escalated += 1
+        started = time.perf_counter()
+        try:
+            result = await attempt(model)
+            outcome = "valid" if validate(result) else "invalid"
+            best = result or best
+        except ValueError as e:
+            outcome = "invalid"
+            logger.warning(f"{task} output from {model} did not parse: {e}")
+        except Exception as e:
+            outcome = "error"
+            logger.error(f"{task} call to {model} failed: {e}")
+        stats.record(model, outcome, time.perf_counter() - started)
+        if outcome == "valid":
+            return result
+        if rung + 1 < len(ladder):
+            logger.info(f"{task}: {model} gave {outcome} output, escalating to {ladder[rung + 1]}")
+    stats.failed += 1
+    return best
+
+
+# Validators: does the output have the shape the caller needs?
+
+def valid_image_prompts(result) -> bool:
+    prompts = result.get("image_prompts") if isinstance(result, dict) else None
+    return bool(prompts) and all(isinstance(p, dict) and isinstance(p.get("scene_description"), str)
+                                 and p["scene_description"].strip() for p in prompts)
+
+
+def valid_characters(result) -> bool:
+    names = result.get("characters") if isinstance(result, dict) else None
+    return bool(names) and all(isinstance(name, str) for name in names)
+
+
+def valid_chat_reply(text) -> bool:
+    # Small models sometimes answer out of character or run on past the requested length
+    return (isinstance(text, str) and 0 < len(text) <= 1200
+            and "as an ai" not in text.lower() and "language model" not in text.lower())
+
+
+def valid_chat_summary(text) -> bool:
+    return isinstance(text, str) and len(text.split()) >= 5 and "as an ai" not in text.lower()
+
+
+def stats() -> dict:
+    return {task: task_stats.snapshot() for task, task_stats in _stats.items()}
+
+
+def reset():
+    _stats.clear()
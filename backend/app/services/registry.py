@@ -0,0 +1,72 @@
+"""
+Lazy provider registry.
+
+Service modules register a factory for each SDK client/model they need
+instead of building it at import time. Nothing heavy (SDK imports, client
+construction) happens until a provider is first used or until the FastAPI
+lifespan calls `init_configured()`, which warms only the providers that
+have credentials.
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderRegistry:
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._configured: Dict[str, Callable[[], bool]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Callable[[], Any], configured: Callable[[], bool] = lambda: True):
+        """
+        `factory` builds the provider, or returns None for an optional one that
+        isn't available; `configured` says whether credentials are present.
+        """
+        self._factories[name] = factory
+        self._configured[name] = configured
+
+    def is_configured(self, name: str) -> bool:
+        check = self._configured.get(name)
+        return bool(check and check())
+
+    def get(self, name: str) -> Optional[Any]:
+        """Return the provider, building it on first use. None if the factory fails."""
+        if name in self._instances:
+            return self._instances[name]
+        with self._lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                try:
+                    self._instances[name] = self._factories[name]()
+                    if self._instances[name] is not None:
+                        logger.info(f"Provider '{name}' initialized in {(time.perf_counter() - started) * 1000:.0f}ms")
+                except Exception as e:
+                    logger.error(f"Failed to initialize provider '{name}': {e}")
+                    self._instances[name] = None
+        return self._instances[name]
+
+    def set(self, name: str, instance: Any):
+        """Install a ready-made instance (benchmarks and stubs)."""
+        self._instances[name] = instance
+
+    def reset(self, name: str = None):
+        if name is None:
+            self._instances.clear()
+        else:
+            self._instances.pop(name, None)
+
+    def init_configured(self) -> Dict[str, bool]:
+        """Build every provider that has credentials. Blocking; run it in a thread."""
+        status = {}
+        for name in self._factories:
+            if self.is_configured(name):
+                status[name] = self.get(name) is not None
+        return status
+
+
+providers = ProviderRegistry()
@@ -0,0 +1,380 @@
+"""
+Blob storage for generated media (audio today, images if we ever persist them).
+
+Two backends, picked by MEDIA_STORAGE:
+- "local": files under MEDIA_ROOT, sharded two levels deep by key hash so no
+  directory grows unbounded.
+- "s3": any S3-compatible store (AWS, MinIO, R2...) via boto3, so several API
+  instances can share media. boto3 is only imported when this backend is used.
+
+Keys look like "audio/<content hash>.mp3". Clients always get "/media/<key>"
+URLs, served by app.api.media with Range and cache validator support.
+"""
+import abc
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Compact narration (app.services.audio_formats) is Opus in WebM; mimetypes only knows video/webm
+mimetypes.add_type("audio/webm", ".webm")
+
+MEDIA_URL_PREFIX = "/media/"
+READ_CHUNK_SIZE = 256 * 1024
+# Scratch files left behind by a crash are removed by gc after this long
+SCRATCH_MAX_AGE_S = 3600
+
+
+@dataclass
+class BlobInfo:
+    key: str
+    size: int
+    modified: float
+    content_type: str
+    etag: str = ""
+
+
+# "audio/<32+ hex chars>.mp3" (and its sidecars): name derived from the content, never rewritten
+CONTENT_ADDRESSED = re.compile(r"(?:^|/)([0-9a-f]{32,64})(?:\.[\w.]+)?$")
+
+
+def content_type_for(key: str) -> str:
+    if key.endswith(".gz"):
+        return "application/gzip"
+    return mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+def is_content_addressed(key: str) -> bool:
+    return CONTENT_ADDRESSED.search(key) is not None
+
+
+def etag_for(key: str, size: int, modified: float) -> str:
+    """Strong validator: the content hash for content-addressed keys, else size+mtime."""
+    match = CONTENT_ADDRESSED.search(key)
+    if match:
+        suffix = key[match.end(1):]
+        return match.group(1) + (f"-{hashlib.sha1(suffix.encode()).hexdigest()[:8]}" if suffix != ".mp3" else "")
+    return f"{size:x}-{int(modified * 1_000_000):x}"
+
+
+def media_url(key: str) -> str:
+    return MEDIA_URL_PREFIX + key
+
+
+def key_from_url(url: str) -> Optional[str]:
+    """Inverse of media_url; returns None for legacy /static URLs or anything else."""
+    if url and url.startswith(MEDIA_URL_PREFIX):
+        return url[len(MEDIA_URL_PREFIX):]
+    return None
+
+
+def key_stem(key: str) -> str:
+    """
+    `key` up to the first dot of its name. Files derived from a blob share its
+    stem: "audio/<hash>.mp3", "audio/<hash>.alignment.json.gz", "audio/<hash>.32k.webm".
+    """
+    directory, slash, name = key.rpartition("/")
+    return directory + slash + name.split(".", 1)[0]
+
+
+def _safe_key(key: str) -> str:
+    parts = key.split("/")
+    if not key or key.startswith("/") or any(p in ("", ".", "..") for p in parts):
+        raise ValueError(f"Invalid storage key: {key!r}")
+    return key
+
+
+class BlobStorage(abc.ABC):
+    """Interface shared by the storage backends. All methods are async and never block the loop."""
+
+    @abc.abstractmethod
+    def scratch_path(self, suffix: str = "") -> str:
+        """Local path for building a file before `put_file`. Same filesystem as the store when possible."""
+
+    @abc.abstractmethod
+    async def put_file(self, key: str, local_path: str, content_type: Optional[str] = None):
+        """Move/upload `local_path` to `key`. The local file is consumed."""
+
+    @abc.abstractmethod
+    async def stat(self, key: str) -> Optional[BlobInfo]:
+        ...
+
+    @abc.abstractmethod
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield bytes [start, end] (inclusive, like HTTP Range)."""
+
+    @abc.abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abc.abstractmethod
+    async def list(self, prefix: str = "") -> List[BlobInfo]:
+        ...
+
+    def public_url(self, key: str) -> Optional[str]:
+        """Direct URL (CDN / public bucket) if configured; None means proxy through /media."""
+        return None
+
+    async def gc(self, max_age_s: float = 0, referenced: Optional[Iterable[str]] = None, prefix: str = "",
+                 skip_prefixes: Iterable[str] = ()) -> dict:
+        """
+        Delete orphaned blobs. With `referenced` (keys still in use), any other
+        blob older than `max_age_s` is orphaned, except files derived from a
+        referenced one (same key_stem); without it only age counts, and
+        max_age_s=0 deletes nothing. Keys under `skip_prefixes` are left alone.
+        """
+        keep = {key_stem(key) for key in referenced} if referenced is not None else None
+        if keep is None and max_age_s <= 0:
+            return {"scanned": 0, "deleted": 0, "bytes_freed": 0}
+        skip = tuple(skip_prefixes)
+        now = time.time()
+        scanned = deleted = freed = 0
+        for info in await self.list(prefix):
+            if skip and info.key.startswith(skip):
+                continue
+            scanned += 1
+            if now - info.modified < max_age_s:
+                continue
+            if keep is not None and key_stem(info.key) in keep:
+                continue
+            await self.delete(info.key)
+            deleted += 1
+            freed += info.size
+        logger.info(f"Media GC: scanned={scanned} deleted={deleted} bytes_freed={freed}")
+        return {"scanned": scanned, "deleted": deleted, "bytes_freed": freed}
+
+
+class LocalStorage(BlobStorage):
+    def __init__(self, root: str):
+        self.root = root
+        self.scratch_dir = os.path.join(root, ".scratch")
+        os.makedirs(self.scratch_dir, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        key = _safe_key(key)
+        directory, _, name = key.rpartition("/")
+        digest = hashlib.sha1(name.encode()).hexdigest()
+        return os.path.join(self.root, directory, digest[:2], digest[2:4], name)
+
+    def scratch_path(self, suffix: str = "") -> str:
+        return os.path.join(self.scratch_dir, f"{uuid.uuid4().hex}{suffix}")
+
+    def _put(self, key: str, local_path: str):
+        dest = self.path_for(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            os.replace(local_path, dest)
+        except OSError:
+            # Scratch on another filesystem: copy beside the target, then rename atomically
+            tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+            shutil.copyfile(local_path, tmp)
+            os.replace(tmp, dest)
+            os.remove(local_path)
+
+    async def put_file(self, key: str, local_path: str, content_type: Optional[str] = None):
+        await asyncio.to_thread(self._put, key, local_path)
+
+    def _stat(self, key: str) -> Optional[BlobInfo]:
+        try:
+            st = os.stat(self.path_for(key))
+        except FileNotFoundError:
+            return None
+        return BlobInfo(key=key, size=st.st_size, modified=st.st_mtime, content_type=content_type_for(key),
+                        etag=etag_for(key, st.st_size, st.st_mtime))
+
+    async def stat(self, key: str) -> Optional[BlobInfo]:
+        return await asyncio.to_thread(self._stat, key)
+
+    async def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        handle = await asyncio.to_thread(open, self.path_for(key), "rb")
+        try:
+            await asyncio.to_thread(handle.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining)
+                chunk = await asyncio.to_thread(handle.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(handle.close)
+
+    async def delete(self, key: str):
+        try:
+            await asyncio.to_thread(os.remove, self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def _list(self, prefix: str) -> List[BlobInfo]:
+        blobs = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d != ".scratch"]
+            rel = os.path.relpath(dirpath, self.root)
+            parts = [] if rel == "." else rel.split(os.sep)
+            # Strip the two shard levels to get back to the key's directory
+            if len(parts) < 2:
+                continue
+            directory = "/".join(parts[:-2])
+            for name in filenames:
+                if name.endswith(".tmp"):
+                    continue
+                key = f"{directory}/{name}" if directory else name
+                if not key.startswith(prefix):
+                    continue
+                st = os.stat(os.path.join(dirpath, name))
+                blobs.append(BlobInfo(key=key, size=st.st_size, modified=st.st_mtime, content_type=content_type_for(key)))
+        return blobs
+
+    async def list(self, prefix: str = "") -> List[BlobInfo]:
+        return await asyncio.to_thread(self._list, prefix)
+
+    def _sweep_scratch(self) -> int:
+        removed = 0
+        cutoff = time.time() - SCRATCH_MAX_AGE_S
+        for name in os.listdir(self.scratch_dir):
+            path = os.path.join(self.scratch_dir, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    async def gc(self, max_age_s: float = 0, referenced: Optional[Iterable[str]] = None, prefix: str = "",
+                 skip_prefixes: Iterable[str] = ()) -> dict:
+        stats = await super().gc(max_age_s, referenced, prefix, skip_prefixes)
+        stats["scratch_deleted"] = await asyncio.to_thread(self._sweep_scratch)
+        return stats
+
+
+class S3Storage(BlobStorage):
+    def __init__(self, bucket: str, endpoint_url: str = "", region: str = "", access_key_id: str = "",
+                 secret_access_key: str = "", prefix: str = "", public_base_url: str = "", scratch_dir: str = ""):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("MEDIA_STORAGE=s3 requires boto3 (pip install boto3)") from e
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.public_base_url = public_base_url.rstrip("/")
+        self.scratch_dir = scratch_dir or os.path.join("media", ".scratch")
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+        )
+
+    def _object_key(self, key: str) -> str:
+        return self.prefix + _safe_key(key)
+
+    def scratch_path(self, suffix: str = "") -> str:
+        return os.path.join(self.scratch_dir, f"{uuid.uuid4().hex}{suffix}")
+
+    def _put(self, key: str, local_path: str, content_type: str):
+        try:
+            self.client.upload_file(local_path, self.bucket, self._object_key(key), ExtraArgs={"ContentType": content_type})
+        finally:
+            os.remove(local_path)
+
+    async def put_file(self, key: str, local_path: str, content_type: Optional[str] = None):
+        await asyncio.to_thread(self._put, key, local_path, content_type or content_type_for(key))
+
+    def _stat(self, key: str) -> Optional[BlobInfo]:
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return BlobInfo(
+            key=key,
+            size=head["ContentLength"],
+            modified=head["LastModified"].timestamp(),
+            content_type=head.get("ContentType") or content_type_for(key),
+            etag=head.get("ETag", "").strip('"'),
+        )
+
+    async def stat(self, key: str) -> Optional[BlobInfo]:
+        return await asyncio.to_thread(self._stat, key)
+
+    async def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        obj = await asyncio.to_thread(self.client.get_object, Bucket=self.bucket, Key=self._object_key(key), Range=byte_range)
+        body = obj["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await asyncio.to_thread(body.close)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._object_key(key))
+
+    def _list(self, prefix: str) -> List[BlobInfo]:
+        blobs = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"][len(self.prefix):]
+                blobs.append(BlobInfo(key=key, size=obj["Size"], modified=obj["LastModified"].timestamp(), content_type=content_type_for(key)))
+        return blobs
+
+    async def list(self, prefix: str = "") -> List[BlobInfo]:
+        return await asyncio.to_thread(self._list, prefix)
+
+    def public_url(self, key: str) -> Optional[str]:
+        if self.public_base_url:
+            return f"{self.public_base_url}/{self._object_key(key)}"
+        return None
+
+
+_storage: Optional[BlobStorage] = None
+
+
+def get_storage() -> BlobStorage:
+    """Storage backend configured in settings, created on first use."""
+    global _storage
+    if _storage is None:
+        if settings.MEDIA_STORAGE == "s3":
+            _storage = S3Storage(
+                bucket=settings.S3_BUCKET,
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                region=settings.S3_REGION,
+                access_key_id=settings.S3_ACCESS_KEY_ID,
+                secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+                prefix=settings.S3_PREFIX,
+                public_base_url=settings.MEDIA_PUBLIC_BASE_URL,
+                scratch_dir=os.path.join(settings.MEDIA_ROOT, ".scratch"),
+            )
+        else:
+            _storage = LocalStorage(settings.MEDIA_ROOT)
+        logger.info(f"Media storage: {type(_storage).__name__}")
+    return _storage
+
+
+def set_storage(storage: Optional[BlobStorage]):
+    """Swap the backend (benchmarks, one-off scripts). None resets to settings on next use."""
+    global _storage
+    _storage = storage
@@ -0,0 +1,220 @@
+"""
+Near-duplicate story index.
+
+Many story requests differ only trivially ("Battle of Panipat" vs "the
+battle of panipat 1761"). Every generated story is indexed by a MinHash
+sketch of its normalized topic; a new request whose topic is similar enough
+to a stored one, with the same era, style, story type, language and
+generation mode, reuses that story instead of running a full LLM generation.
+
+Lookup is LSH banding over the MinHash signature (candidate retrieval in
+roughly constant time), followed by an exact Jaccard check on the stored
+shingle sets. The index lives in memory and is saved to STORY_INDEX_PATH
+as JSON so it survives restarts.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.files import write_atomic
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1761)  # fixed seed: persisted signatures must stay comparable
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+STOPWORDS = {"the", "a", "an", "of", "in", "on", "at", "and", "to", "for", "about", "story", "tale"}
+
+
+def topic_shingles(topic: str) -> Set[str]:
+    """Character trigrams of each significant word; word order does not matter."""
+    words = [w for w in re.findall(r"\w+", topic.lower()) if w not in STOPWORDS]
+    shingles = set()
+    for word in words:
+        padded = f"#{word}#"
+        shingles.update(padded[i:i + 3] for i in range(max(1, len(padded) - 2)))
+    return shingles
+
+
+def _hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(shingles: Set[str]) -> List[int]:
+    hashes = [_hash(s) for s in shingles] or [0]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS]
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def partition_key(era: str, style: str, story_type: str, language: str, mode: str = "standard") -> str:
+    """Only stories that agree on these are interchangeable."""
+    key = "|".join(v.strip().lower() for v in (era, style, story_type, language))
+    # Standard keys stay as they were before modes existed, so saved indexes still match
+    return key if mode == "standard" else f"{key}|{mode}"
+
+
+class StoryMatch:
+    def __init__(self, topic: str, similarity: float, story: dict):
+        self.topic = topic
+        self.similarity = similarity
+        self.story = story
+
+
+class StoryIndex:
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        # id -> {"partition", "topic", "shingles", "signature", "story", "created"}
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.buckets: Dict[Tuple, Set[str]] = {}
+        self.dirty = False
+
+    def _band_keys(self, partition: str, signature: List[int]):
+        for band in range(BANDS):
+            yield (partition, band, tuple(signature[band * ROWS:(band + 1) * ROWS]))
+
+    def add(self, partition: str, topic: str, story: dict, signature: List[int] = None, created: float = None):
+        entry_id = hashlib.sha256(f"{partition}\n{topic.strip().lower()}".encode("utf-8")).hexdigest()[:16]
+        if entry_id in self.entries:
+            self._remove(entry_id)
+        shingles = topic_shingles(topic)
+        signature = signature or minhash(shingles)
+        self.entries[entry_id] = {
+            "partition": partition,
+            "topic": topic,
+            "shingles": shingles,
+            "signature": signature,
+            "story": story,
+            "created": created or time.time(),
+        }
+        for key in self._band_keys(partition, signature):
+            self.buckets.setdefault(key, set()).add(entry_id)
+        while len(self.entries) > self.max_entries:
+            self._remove(next(iter(self.entries)))
+        self.dirty = True
+
+    def _remove(self, entry_id: str):
+        entry = self.entries.pop(entry_id)
+        for key in self._band_keys(entry["partition"], entry["signature"]):
+            bucket = self.buckets.get(key)
+            if bucket:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self.buckets[key]
+
+    def candidates(self, partition: str, signature: List[int]) -> Set[str]:
+        found = set()
+        for key in self._band_keys(partition, signature):
+            found.update(self.buckets.get(key, ()))
+        return found
+
+    def lookup(self, partition: str, topic: str, threshold: float) -> Optional[StoryMatch]:
+        shingles = topic_shingles(topic)
+        if not shingles:
+            return None
+        best_id, best = None, 0.0
+        for entry_id in self.candidates(partition, minhash(shingles)):
+            similarity = jaccard(shingles, self.entries[entry_id]["shingles"])
+            if similarity > best:
+                best_id, best = entry_id, similarity
+        if best_id is None or best < threshold:
+            return None
+        entry = self.entries[best_id]
+        return StoryMatch(entry["topic"], best, entry["story"])
+
+    # Persistence
+
+    def snapshot(self) -> List[dict]:
+        """Cheap shallow copy of the entries (they are never mutated in place), safe to dump off-loop."""
+        return [{k: v for k, v in entry.items() if k != "shingles"} for entry in self.entries.values()]
+
+    @staticmethod
+    def dumps(rows: List[dict]) -> bytes:
+        return json.dumps({"version": 1, "num_perm": NUM_PERM, "entries": rows}, ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def loads(cls, data: bytes, max_entries: int = 10_000) -> "StoryIndex":
+        index = cls(max_entries)
+        payload = json.loads(data)
+        if payload.get("num_perm") != NUM_PERM:
+            logger.warning("Story index was built with different MinHash parameters; starting empty")
+            return index
+        for row in payload.get("entries", []):
+            index.add(row["partition"], row["topic"], row["story"], row["signature"], row["created"])
+        index.dirty = False
+        return index
+
+
+_index: Optional[StoryIndex] = None
+_last_save = 0.0
+
+
+def get_index() -> StoryIndex:
+    global _index
+    if _index is None:
+        path = settings.STORY_INDEX_PATH
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    _index = StoryIndex.loads(f.read(), settings.STORY_INDEX_MAX_ENTRIES)
+                logger.info(f"Story index loaded: {len(_index.entries)} stories")
+            except Exception as e:
+                logger.error(f"Could not load story index {path}: {e}")
+        if _index is None:
+            _index = StoryIndex(settings.STORY_INDEX_MAX_ENTRIES)
+    return _index
+
+
+def set_index(index: Optional[StoryIndex]):
+    global _index
+    _index = index
+
+
+def find_similar(topic: str, era: str, style: str, story_type: str, language: str,
+                 mode: str = "standard") -> Optional[StoryMatch]:
+    if not settings.STORY_REUSE_ENABLED:
+        return None
+    return get_index().lookup(partition_key(era, style, story_type, language, mode), topic,
+                              settings.STORY_REUSE_THRESHOLD)
+
+
+async def remember(topic: str, era: str, style: str, story_type: str, language: str, story: dict,
+                   mode: str = "standard"):
+    """Index a freshly generated story; persists at most every STORY_INDEX_SAVE_INTERVAL_S."""
+    global _last_save
+    if not settings.STORY_REUSE_ENABLED:
+        return
+    index = get_index()
+    index.add(partition_key(era, style, story_type, language, mode), topic, story)
+    if settings.STORY_INDEX_PATH and time.monotonic() - _last_save >= settings.STORY_INDEX_SAVE_INTERVAL_S:
+        _last_save = time.monotonic()
+        await save()
+
+
+async def save():
+    index = _index
+    if index is None or not index.dirty or not settings.STORY_INDEX_PATH:
+        return
+    index.dirty = False
+    try:
+        data = await asyncio.to_thread(StoryIndex.dumps, index.snapshot())
+        await write_atomic(settings.STORY_INDEX_PATH, data)
+    except Exception as e:
+        index.dirty = True
+        logger.error(f"Could not save story index: {e}")
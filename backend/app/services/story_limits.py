@@ -0,0 +1,210 @@
+"""
+Length control for single-shot story generation.
+
+The prompts ask for 800-1000 words, but both providers were given an 8192
+token budget, so a model that rambles or loops is paid for (in latency) up
+to the full budget. Two limits instead:
+
+- `token_budget()`: max output tokens derived from the prompt template's
+  word range, the fields around the story (timeline, summary, moral) and the
+  tokens-per-word cost of the output language, plus a safety margin.
+  `thinking_budget()` adds STORY_THINKING_TOKENS for models whose reasoning
+  is paid out of the same max_output_tokens (gemini-3-flash-preview);
+  without it the thinking would eat the story and cut it off.
+- `StreamMonitor`: fed the streamed output, it says when to stop early:
+  * json_closed: the top-level JSON object is complete; anything after it
+    (notes, a second object) is waste;
+  * repetition: the same sentence (of at least STORY_REPEAT_MIN_WORDS
+    words) has appeared STORY_REPEAT_MAX times, i.e. the model is looping.
+    The text is cut back to where the loop started; llm_output repairs the
+    unterminated JSON.
+Both checks use regex scans per chunk rather than per-character Python, as
+they run on the event loop for every streamed chunk.
+
+Per-call numbers (budget, tokens generated, tokens kept, stop reason) are
+aggregated for /story-limits/stats. Token counts are estimates (UTF-8
+bytes / 4) so both providers are measured the same way.
+"""
+import re
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+# The word range every story-type prompt asks for ("800-1000 words")
+STORY_WORDS = (800, 1000)
+# Words of JSON around the story: title, era, summary, moral; timeline types add dated events
+FIELD_WORDS = 200
+TIMELINE_WORDS = 120
+TIMELINE_TYPES = {"Historical", "Hybrid", "AltHistory"}
+# Output tokens per word; Devanagari splits into many more tokens than English
+TOKENS_PER_WORD = {"English": 1.4, "Hindi": 3.5, "Marathi": 4.0}
+DEFAULT_TOKENS_PER_WORD = 2.5
+MAX_TOKENS = 8192
+
+
+def token_budget(story_type: str, language: str) -> int:
+    if not settings.STORY_TOKEN_BUDGETS:
+        return MAX_TOKENS
+    words = STORY_WORDS[1] + FIELD_WORDS + (TIMELINE_WORDS if story_type in TIMELINE_TYPES else 0)
+    per_word = TOKENS_PER_WORD.get(language, DEFAULT_TOKENS_PER_WORD)
+    return min(MAX_TOKENS, int(words * per_word * settings.STORY_TOKEN_MARGIN))
+
+
+def thinking_budget(budget: int) -> int:
+    """max_output_tokens for a thinking model that should still have `budget` tokens left for the answer."""
+    if not settings.STORY_TOKEN_BUDGETS:
+        return MAX_TOKENS
+    return budget + settings.STORY_THINKING_TOKENS
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text.encode("utf-8")) // 4
+
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURAL = re.compile(r'["{}\[\]]')
+# A sentence ends at terminal punctuation followed by space, an escaped newline or the closing quote
+_SENTENCE_END = re.compile(r'[.!?\u0964]+(?=\s|\\n|")')
+
+
+class StreamMonitor:
+    """Accumulates streamed text; `feed()` returns True when generation should stop."""
+
+    def __init__(self, min_words: int = None, max_repeats: int = None):
+        self.enabled = settings.STORY_EARLY_STOP
+        self.min_words = min_words or settings.STORY_REPEAT_MIN_WORDS
+        self.max_repeats = max_repeats or settings.STORY_REPEAT_MAX
+        self.parts: List[str] = []
+        self.length = 0
+        self.stop_reason: Optional[str] = None
+        self.cut_at: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._pending = ""  # text after the last complete sentence
+        self._pending_start = 0
+        self._seen: Dict[str, List[int]] = {}
+
+    def feed(self, chunk: str) -> bool:
+        if self.stop_reason:
+            return True
+        offset = self.length
+        self.parts.append(chunk)
+        self.length += len(chunk)
+        if not self.enabled:
+            return False
+        closed_at = self._track_json(chunk)
+        if closed_at is not None:
+            self._stop("json_closed", offset + closed_at + 1)
+            return True
+        return self._track_sentences(chunk)
+
+    def _track_json(self, chunk: str) -> Optional[int]:
+        """Index in `chunk` of the character that closes the top-level JSON value, if any."""
+        i = 0
+        while i < len(chunk):
+            if self._escaped:
+                self._escaped = False
+                i += 1
+                continue
+            match = (_STRING_SPECIAL if self._in_string else _STRUCTURAL).search(chunk, i)
+            if not match:
+                return None
+            ch, i = match.group(), match.end()
+            if self._in_string:
+                if ch == "\\":
+                    self._escaped = True
+                else:
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    return i - 1
+        return None
+
+    def _track_sentences(self, chunk: str) -> bool:
+        text = self._pending + chunk
+        last = 0
+        # The pending text was already scanned; only its last characters can start a new match
+        for match in _SENTENCE_END.finditer(text, max(0, len(self._pending) - 4)):
+            sentence = " ".join(text[last:match.end()].replace("\\n", " ").lower().split())
+            start = self._pending_start + last
+            last = match.end()
+            # Short sentences ("He said no.") legitimately repeat
+            if len(sentence.split(" ")) < self.min_words:
+                continue
+            occurrences = self._seen.setdefault(sentence, [])
+            occurrences.append(start)
+            if len(occurrences) >= self.max_repeats:
+                # Keep the first occurrence; the loop starts at the second
+                self._stop("repetition", occurrences[1])
+                return True
+        self._pending = text[last:]
+        self._pending_start += last
+        return False
+
+    def abort(self):
+        """Stop at the next chunk (the caller went away); keeps what was generated."""
+        if not self.stop_reason:
+            self._stop("cancelled", None)
+
+    def _stop(self, reason: str, cut_at: Optional[int]):
+        self.stop_reason = reason
+        self.cut_at = cut_at
+
+    @property
+    def generated(self) -> str:
+        return "".join(self.parts)
+
+    def text(self) -> str:
+        generated = self.generated
+        return generated[:self.cut_at] if self.cut_at is not None else generated
+
+
+# Aggregate stats
+
+_totals = {"calls": 0, "tokens_budgeted": 0, "tokens_generated": 0, "tokens_used": 0, "streams_not_cancelled": 0}
+_stops: Dict[str, int] = {}
+
+
+def record(budget: int, monitor: StreamMonitor, finish_reason: str = "complete") -> str:
+    """
+    `finish_reason` describes how the stream ended when the monitor did not stop it ("length" or "complete").
+    Returns the stop reason as counted: "length" means the output was cut off at the budget.
+    """
+    reason = monitor.stop_reason or finish_reason
+    generated = estimate_tokens(monitor.generated)
+    # A stream that ran into the budget is "length" even if the provider did not say so
+    if reason == "complete" and generated >= budget * 0.98:
+        reason = "length"
+    _totals["calls"] += 1
+    _totals["tokens_budgeted"] += budget
+    _totals["tokens_generated"] += generated
+    _totals["tokens_used"] += estimate_tokens(monitor.text())
+    _stops[reason] = _stops.get(reason, 0) + 1
+    return reason
+
+
+def record_uncancelled():
+    """A stream stopped early whose upstream generation could not be cancelled."""
+    _totals["streams_not_cancelled"] += 1
+
+
+def stats() -> dict:
+    generated = _totals["tokens_generated"]
+    return dict(
+        _totals,
+        stops=dict(_stops),
+        used_share=round(_totals["tokens_used"] / generated, 3) if generated else None,
+        budget_share=round(generated / _totals["tokens_budgeted"], 3) if _totals["tokens_budgeted"] else None,
+    )
+
+
+def reset():
+    for key in _totals:
+        _totals[key] = 0
+    _stops.clear()
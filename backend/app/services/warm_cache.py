@@ -0,0 +1,228 @@
+"""
+Warm cache for popular preset combinations.
+
+Most traffic asks for the same few (topic, era, style, type, language)
+presets from the dashboard. Every /generate request is counted here with
+time decay. During off-peak hours, and when the LLM gate has spare capacity,
+a background warmer pre-generates the top-N combinations: the story, its
+images and its audio. Live requests for a warmed combination, and for that
+story's audio, are then answered from memory without a provider call.
+
+Hit rates are tracked so it is visible whether warming pays for itself.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core import admission
+from app.core.config import settings
+from app.core.files import write_atomic
+from app.core.singleflight import payload_key
+
+logger = logging.getLogger(__name__)
+
+Combo = Tuple[str, str, str, str, str]  # topic, era, style, storyType, language
+
+
+def combo_key(topic: str, era: str, style: str, story_type: str, language: str) -> str:
+    return payload_key("combo", {
+        "topic": topic.lower(), "era": era.lower(), "style": style.lower(),
+        "storyType": story_type, "language": language.lower(),
+    })
+
+
+def audio_key(text: str, story_type: str, language: str, audio_format: str = "standard") -> str:
+    # Same key single-flight uses for /generate-audio; standard audio keeps the keys it had before formats
+    payload = {"text": text, "storyType": story_type, "language": language}
+    if audio_format != "standard":
+        payload["audioFormat"] = audio_format
+    return payload_key("audio", payload)
+
+
+class PopularityTracker:
+    """Request counts per combination, halving every WARM_POPULARITY_HALF_LIFE_HOURS."""
+
+    def __init__(self, half_life_s: float):
+        self.decay = math.log(2) / half_life_s
+        self.scores: Dict[str, dict] = {}  # key -> {"combo", "score", "updated"}
+
+    def _decayed(self, row: dict, now: float) -> float:
+        return row["score"] * math.exp(-self.decay * (now - row["updated"]))
+
+    def record(self, combo: Combo, now: float = None):
+        now = now or time.time()
+        key = combo_key(*combo)
+        row = self.scores.get(key)
+        if row is None:
+            self.scores[key] = {"combo": list(combo), "score": 1.0, "updated": now}
+        else:
+            row["score"] = self._decayed(row, now) + 1.0
+            row["updated"] = now
+
+    def top(self, n: int, now: float = None) -> List[Tuple[Combo, float]]:
+        now = now or time.time()
+        ranked = sorted(((tuple(r["combo"]), self._decayed(r, now)) for r in self.scores.values()),
+                        key=lambda item: item[1], reverse=True)
+        return ranked[:n]
+
+    def prune(self, keep: int):
+        """Drop the long tail so the tracker stays small."""
+        if len(self.scores) > keep:
+            now = time.time()
+            ranked = sorted(self.scores.items(), key=lambda kv: self._decayed(kv[1], now), reverse=True)
+            self.scores = dict(ranked[:keep])
+
+
+class WarmCache:
+    def __init__(self):
+        self.stories: Dict[str, dict] = {}  # combo key -> {"response", "warmed_at"}
+        self.audio: Dict[str, dict] = {}  # audio key -> /generate-audio result
+        self.story_audio: Dict[str, str] = {}  # combo key -> audio key, so eviction drops both
+        self.popularity = PopularityTracker(settings.WARM_POPULARITY_HALF_LIFE_HOURS * 3600)
+        self.hits = {"story": 0, "audio": 0}
+        self.misses = {"story": 0, "audio": 0}
+        self.warm_runs = 0
+        self.warmed = 0
+        self.warm_failures = 0
+        self.last_run: Optional[float] = None
+
+    def get_story(self, combo: Combo) -> Optional[dict]:
+        entry = self.stories.get(combo_key(*combo))
+        if entry:
+            self.hits["story"] += 1
+            return entry["response"]
+        self.misses["story"] += 1
+        return None
+
+    def get_audio(self, text: str, story_type: str, language: str) -> Optional[dict]:
+        result = self.audio.get(audio_key(text, story_type, language))
+        if result:
+            self.hits["audio"] += 1
+        else:
+            self.misses["audio"] += 1
+        return result
+
+    def put(self, combo: Combo, response: dict, audio: Optional[dict]):
+        key = combo_key(*combo)
+        self._evict(key)
+        self.stories[key] = {"response": response, "warmed_at": time.time()}
+        if audio:
+            content = response["story"]["content"]
+            self.story_audio[key] = audio_key(content, combo[3], combo[4])
+            self.audio[self.story_audio[key]] = audio
+
+    def _evict(self, key: str):
+        self.stories.pop(key, None)
+        audio = self.story_audio.pop(key, None)
+        if audio:
+            self.audio.pop(audio, None)
+
+    def retain(self, keys: set):
+        for key in [k for k in self.stories if k not in keys]:
+            self._evict(key)
+
+    def stats(self) -> dict:
+        def rate(kind):
+            total = self.hits[kind] + self.misses[kind]
+            return round(self.hits[kind] / total, 3) if total else None
+
+        return {
+            "entries": len(self.stories),
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "hit_rate": {"story": rate("story"), "audio": rate("audio")},
+            "warm_runs": self.warm_runs,
+            "warmed": self.warmed,
+            "warm_failures": self.warm_failures,
+            "last_run": self.last_run,
+            "tracked_combinations": len(self.popularity.scores),
+        }
+
+
+cache = WarmCache()
+
+
+def record_request(combo: Combo):
+    if settings.WARM_ENABLED:
+        cache.popularity.record(combo)
+
+
+def in_offpeak_window(hour: int = None) -> bool:
+    """WARM_OFFPEAK_HOURS is "start-end" in server-local hours (may wrap midnight); empty means always."""
+    window = settings.WARM_OFFPEAK_HOURS.strip()
+    if not window:
+        return True
+    hour = datetime.now().hour if hour is None else hour
+    start, _, end = window.partition("-")
+    start, end = int(start), int(end)
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def _providers_idle() -> bool:
+    llm = admission.stats().get("llm")
+    return not llm or llm["in_flight"] < max(1, llm["limit"] // 2)
+
+
+async def warm_once(produce: Callable[[Combo], Awaitable[Tuple[dict, Optional[dict]]]]) -> int:
+    """Warm up to WARM_BUDGET_PER_RUN of the top-N combinations that are missing or stale."""
+    now = time.time()
+    top = cache.popularity.top(settings.WARM_TOP_N)
+    wanted = {combo_key(*combo): combo for combo, score in top if score >= settings.WARM_MIN_SCORE}
+    cache.retain(set(wanted))
+
+    ttl = settings.WARM_TTL_HOURS * 3600
+    todo = [(key, combo) for key, combo in wanted.items()
+            if key not in cache.stories or now - cache.stories[key]["warmed_at"] > ttl]
+    warmed = 0
+    for key, combo in todo[:settings.WARM_BUDGET_PER_RUN]:
+        if not _providers_idle():
+            logger.info("Warm cache: live traffic picked up, stopping this run early")
+            break
+        try:
+            response, audio = await produce(combo)
+            cache.put(combo, response, audio)
+            warmed += 1
+        except Exception as e:
+            cache.warm_failures += 1
+            logger.error(f"Warm cache: failed to warm {combo}: {e}")
+    cache.warm_runs += 1
+    cache.warmed += warmed
+    cache.last_run = now
+    cache.popularity.prune(settings.WARM_TOP_N * 20)
+    logger.info(f"Warm cache: warmed {warmed}, {len(cache.stories)} cached; {cache.stats()['hit_rate']}")
+    return warmed
+
+
+async def warm_loop(produce: Callable[[Combo], Awaitable[Tuple[dict, Optional[dict]]]]):
+    while True:
+        await asyncio.sleep(settings.WARM_INTERVAL_MINUTES * 60)
+        if not in_offpeak_window() or not _providers_idle():
+            continue
+        try:
+            await warm_once(produce)
+            await save_popularity()
+        except Exception as e:
+            logger.error(f"Warm cache run failed: {e}")
+
+
+def load_popularity():
+    """Restore request counts saved by a previous process. Blocking; run it in a thread."""
+    path = settings.WARM_POPULARITY_PATH
+    if not path or not os.path.exists(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cache.popularity.scores = json.load(f)
+    except Exception as e:
+        logger.error(f"Could not load popularity counts from {path}: {e}")
+
+
+async def save_popularity():
+    if settings.WARM_ENABLED and settings.WARM_POPULARITY_PATH:
+        data = json.dumps(cache.popularity.scores).encode("utf-8")
+        await write_atomic(settings.WARM_POPULARITY_PATH, data)
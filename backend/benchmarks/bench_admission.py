@@ -0,0 +1,85 @@
+"""
+Admission control under a synthetic burst: many users hammer /api/generate
+(withImages=True) at once. Reports how many requests were served, queued
+or turned away with 429, the Retry-After values handed out, and the peak
+concurrency each provider actually saw.
+
+Usage (from backend/):
+    python -m benchmarks.bench_admission --users 20 --per-user 8
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import asgi_client, summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+
+async def run(args) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed)
+    with tempfile.TemporaryDirectory() as audio_dir:
+        providers = install_stubs(profile, provider="gemini", audio_dir=audio_dir)
+        from app.core import admission
+        from app.core.config import settings
+        settings.ADMISSION_ENABLED = True
+        settings.LLM_MAX_CONCURRENCY = args.llm_limit
+        settings.IMAGE_MAX_CONCURRENCY = args.image_limit
+        settings.ADMISSION_MAX_QUEUE = args.max_queue
+        # Requests come in as the frontend's server actions would send them, one bucket per user
+        settings.INTERNAL_API_SECRET = "bench-secret"
+        admission.reset()
+        from main import app
+
+        latencies = {"200": [], "429": [], "other": []}
+        retry_after = []
+
+        async def one(client, user: int, n: int):
+            payload = {
+                "clerkId": f"user_{user}", "email": "bench@example.com",
+                "topic": f"Topic {n}", "era": "Medieval", "style": "Narrative", "withImages": True,
+            }
+            started = time.perf_counter()
+            headers = {"X-Internal-Secret": settings.INTERNAL_API_SECRET, "X-User-Id": f"user_{user}"}
+            response = await client.post("/api/generate", json=payload, headers=headers)
+            bucket = str(response.status_code) if response.status_code in (200, 429) else "other"
+            latencies[bucket].append(time.perf_counter() - started)
+            if response.status_code == 429:
+                retry_after.append(int(response.headers["retry-after"]))
+
+        async with asgi_client(app) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(one(client, u, n) for u in range(args.users) for n in range(args.per_user)))
+            wall = time.perf_counter() - started
+
+    return {
+        "requests": args.users * args.per_user,
+        "wall_s": wall,
+        "served": len(latencies["200"]),
+        "rejected_429": len(latencies["429"]),
+        "other": len(latencies["other"]),
+        "served_latency_ms": {k: v * 1000 for k, v in summarize(latencies["200"]).items() if k != "count"},
+        "rejected_latency_ms": {k: v * 1000 for k, v in summarize(latencies["429"]).items() if k != "count"},
+        "retry_after_s": summarize(retry_after),
+        "provider_gates": admission.stats(),
+        "provider_calls": providers.calls,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--per-user", type=int, default=8)
+    parser.add_argument("--llm-limit", type=int, default=8)
+    parser.add_argument("--image-limit", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--latency-scale", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Size and time to first audio per output profile (AudioRequest.audioFormat).
+
+For each profile, --stories fresh stories are narrated cold through
+/generate-audio (synthesis plus, for compact profiles, one ffmpeg encode of
+the merged file), then the returned /media URL is fetched: time to its first
+body chunk in-process and the file's size. On a real link the size is what
+matters, so the report also gives the time to buffer --buffer-s seconds of
+playback and to download the whole file at --bandwidth-kbps.
+
+ffmpeg is stubbed like the other providers (benchmarks.stubs.StubTranscoder):
+encode time follows transcode_realtime_factor and output size the profile's
+bitrate. Every compact result is checked against the standard one for the
+same text: identical alignment and the same audio duration.
+
+Usage (from backend/):
+    python -m benchmarks.bench_audio_formats --stories 5 --bandwidth-kbps 400
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import asgi_client, summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+
+async def first_byte(app, url: str) -> tuple:
+    """(ms until the first body chunk, total bytes) for GET `url`."""
+    state = {"first": None, "bytes": 0, "requested": False}
+    done = asyncio.Event()
+
+    async def receive():
+        if not state["requested"]:
+            state["requested"] = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            if message.get("body") and state["first"] is None:
+                state["first"] = time.perf_counter()
+            state["bytes"] += len(message.get("body", b""))
+            if not message.get("more_body"):
+                done.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": url, "raw_path": url.encode(), "root_path": "", "query_string": b"",
+        "headers": [], "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    return (state["first"] - started) * 1000, state["bytes"]
+
+
+def _story(providers, paragraphs: int) -> str:
+    return "\n\n".join(providers.section_text(providers.rng.randint(80, 160)) for _ in range(paragraphs))
+
+
+async def run(args) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed, tts_words_per_s=40.0)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, audio_dir=media_dir)
+        from app.core.config import settings
+        from app.services import audio_formats
+        from main import app
+        settings.WARM_ENABLED = False
+        settings.USER_RATE_PER_MINUTE = 1e6
+        settings.USER_RATE_BURST = 1e6
+        audio_formats.reset()
+        stories = [_story(providers, args.paragraphs) for _ in range(len(audio_formats.PROFILES) * args.stories)]
+
+        report, standard = {}, {}
+        async with asgi_client(app) as client:
+            for n, name in enumerate(audio_formats.PROFILES):
+                fmt = audio_formats.PROFILES[name]
+                generate_ms, ttfb_ms, sizes, durations = [], [], [], []
+                transcodes = providers.calls["transcode"]
+                # Cold: stories nobody has narrated, so each one is synthesized and encoded
+                for text in stories[n * args.stories:(n + 1) * args.stories]:
+                    started = time.perf_counter()
+                    response = await client.post("/api/generate-audio", json={"text": text, "audioFormat": name})
+                    generate_ms.append((time.perf_counter() - started) * 1000)
+                    body = response.json()
+                    assert response.status_code == 200 and body["audioFormat"] == name, body
+                    ms, size = await first_byte(app, body["audioUrl"])
+                    ttfb_ms.append(ms)
+                    sizes.append(size)
+                    durations.append(size / fmt.bytes_per_s)
+                    standard.setdefault(text, {})[name] = body
+                bytes_per_s = sum(sizes) / sum(durations)
+                start_ms = summarize(generate_ms)["p50"] + summarize(ttfb_ms)["p50"] \
+                    + args.buffer_s * bytes_per_s * 8 / args.bandwidth_kbps
+                report[name] = {
+                    "generate_audio_ms": summarize(generate_ms),
+                    "media_first_byte_ms": summarize(ttfb_ms)["p50"],
+                    "bytes_per_story": int(sum(sizes) / len(sizes)),
+                    "kbps": round(bytes_per_s * 8 / 1000, 1),
+                    "ffmpeg_runs": providers.calls["transcode"] - transcodes,
+                    f"playback_start_ms_at_{args.bandwidth_kbps}kbps": round(start_ms),
+                    f"full_download_s_at_{args.bandwidth_kbps}kbps": round(sum(sizes) / len(sizes) * 8 / args.bandwidth_kbps / 1000, 1),
+                }
+
+            # Same text in every profile: compact files must line up with the standard alignment
+            reuse_ms = []
+            for text in stories[:args.stories]:
+                reference = standard[text]["standard"]
+                reference_s = (await first_byte(app, reference["audioUrl"]))[1] / audio_formats.STANDARD.bytes_per_s
+                for name, fmt in audio_formats.PROFILES.items():
+                    transcodes = providers.calls["transcode"]
+                    for attempt in range(2):
+                        started = time.perf_counter()
+                        body = (await client.post("/api/generate-audio", json={"text": text, "audioFormat": name})).json()
+                        if attempt:
+                            # Second ask: segments and the encoded file are both reused
+                            reuse_ms.append((time.perf_counter() - started) * 1000)
+                    assert body["alignment"] == reference["alignment"], f"{name} alignment differs"
+                    seconds = (await first_byte(app, body["audioUrl"]))[1] / fmt.bytes_per_s
+                    assert abs(seconds - reference_s) < 0.05, (name, seconds, reference_s)
+                    assert providers.calls["transcode"] - transcodes <= (1 if fmt.codec else 0), name
+        formats = audio_formats.stats()
+    return {
+        "stories_per_profile": args.stories,
+        "paragraphs": args.paragraphs,
+        "profiles": report,
+        "repeat_request_ms": summarize(reuse_ms),
+        "audio_formats": formats,
+        "alignment_and_duration_match": True,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stories", type=int, default=5)
+    parser.add_argument("--paragraphs", type=int, default=6)
+    parser.add_argument("--bandwidth-kbps", type=int, default=400, help="client downlink for the estimates")
+    parser.add_argument("--buffer-s", type=float, default=2.0, help="seconds of audio a player buffers before starting")
+    parser.add_argument("--latency-scale", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
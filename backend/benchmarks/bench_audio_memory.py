@@ -0,0 +1,64 @@
+"""
+Peak Python memory and event-loop lag while many long stories are turned
+into audio at once (stub edge-tts, real disk writes).
+
+Usage (from backend/):
+    python -m benchmarks.bench_audio_memory --stories 16 --words 3000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.harness import LoopLagSampler
+from benchmarks.stubs import LatencyDist, StubProfile, install_stubs
+
+
+async def run(args) -> dict:
+    profile = StubProfile(
+        seed=args.seed,
+        tts_latency=LatencyDist(median_s=0.0),
+        story_words=(args.words, args.words),
+        paragraphs=(args.paragraphs, args.paragraphs),
+    )
+    with tempfile.TemporaryDirectory() as audio_dir:
+        providers = install_stubs(profile, audio_dir=audio_dir)
+        from app.services.audio_service import generate_story_audio
+
+        texts = [providers.story_text() for _ in range(args.stories)]
+        lag = LoopLagSampler(interval=0.005)
+
+        tracemalloc.start()
+        lag.start()
+        started = time.perf_counter()
+        results = await asyncio.gather(*(generate_story_audio(t, "Historical", "English") for t in texts))
+        wall = time.perf_counter() - started
+        await lag.stop()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "stories": args.stories,
+        "words_per_story": args.words,
+        "succeeded": sum(1 for r in results if r),
+        "wall_s": wall,
+        "peak_alloc_mb": peak / 1024 / 1024,
+        "loop_lag_ms": lag.report(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stories", type=int, default=16)
+    parser.add_argument("--words", type=int, default=3000)
+    parser.add_argument("--paragraphs", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Time from pressing "listen" to having the audio, with and without
+speculative pre-synthesis (StoryRequest.preloadAudio).
+
+Users arrive spread over --arrival seconds. Each generates a story, reads
+for a random --think seconds and then, with probability --listen, asks /generate-audio for it (the way
+the frontend does: text, storyType, language). Half the listeners that got
+an audioJobId fetch GET /audio-jobs/{id} instead. Speculation is not free:
+stories that are never listened to still cost a synthesis, which shows up
+in the TTS call counts.
+
+Usage (from backend/):
+    python -m benchmarks.bench_audio_prefetch --users 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import asgi_client, summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+
+async def run_pass(args, preload: bool) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed, tts_words_per_s=40.0)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, provider="gemini", audio_dir=media_dir)
+        from app.core import admission
+        from app.core.config import settings
+        from app.services import audio_prefetch
+        from main import app
+        settings.ADMISSION_ENABLED = True
+        settings.USER_RATE_PER_MINUTE = 1e6
+        settings.USER_RATE_BURST = 1e6
+        settings.STORY_REUSE_ENABLED = False
+        settings.AUDIO_PREFETCH_MAX_JOBS = args.max_jobs
+        admission.reset()
+        audio_prefetch.reset()
+
+        # Same arrivals, reading times and listeners in both passes
+        rng = random.Random(args.seed)
+        plans = [(rng.uniform(0, args.arrival), rng.uniform(0.2, 1.0) * args.think, rng.random() < args.listen)
+                 for _ in range(args.users)]
+        listen_ms, via_job, statuses = [], 0, {}
+
+        async def user(client, i: int):
+            nonlocal via_job
+            arrival, think, listens = plans[i]
+            await asyncio.sleep(arrival)
+            story = await client.post("/api/generate", json={
+                "clerkId": f"user-{i}", "email": "bench@example.com", "topic": f"Panipat ({i})",
+                "era": "Maratha Empire", "style": "Narrative", "withImages": False, "preloadAudio": preload,
+            })
+            body = story.json()
+            await asyncio.sleep(think)
+            if not listens:
+                return
+            started = time.perf_counter()
+            job_id = body.get("audioJobId")
+            if job_id and i % 2:
+                audio = await client.get(f"/api/audio-jobs/{job_id}")
+                via_job += 1
+            else:
+                audio = await client.post("/api/generate-audio", json={
+                    "text": body["story"]["content"], "storyType": "Historical", "language": "English",
+                })
+            listen_ms.append((time.perf_counter() - started) * 1000)
+            statuses[audio.status_code] = statuses.get(audio.status_code, 0) + 1
+
+        async with asgi_client(app) as client:
+            await asyncio.gather(*(user(client, i) for i in range(args.users)))
+        prefetch = audio_prefetch.stats()
+        audio_prefetch.reset()
+    return {
+        "listen_to_audio_ms": summarize(listen_ms),
+        "statuses": statuses,
+        "fetched_via_job_id": via_job,
+        "tts_paragraph_calls": providers.calls["tts"],
+        "tts_busy_s": round(providers.busy_s["tts"], 2),
+        "prefetch": prefetch,
+    }
+
+
+async def run(args) -> dict:
+    return {
+        "users": args.users,
+        "listen_rate": args.listen,
+        "on_demand": await run_pass(args, preload=False),
+        "preloaded": await run_pass(args, preload=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--listen", type=float, default=0.8, help="share of users who press listen")
+    parser.add_argument("--arrival", type=float, default=30.0, help="users arrive within this many seconds")
+    parser.add_argument("--think", type=float, default=4.0, help="max seconds between story and listen")
+    parser.add_argument("--max-jobs", type=int, default=2, help="AUDIO_PREFETCH_MAX_JOBS")
+    parser.add_argument("--latency-scale", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Re-narrating a story after a one-paragraph edit, with per-paragraph
+segments (AUDIO_SEGMENT_CACHE) against synthesizing the whole text again.
+
+For each of --stories stories: narrate it once (cold), change one paragraph,
+and narrate the edited text. The edited story's audio is also synthesized
+from scratch with the cache off, and the two results must match exactly:
+same merged MP3 (content-hashed URL) and same alignment, so assembling from
+segments changes nothing the listener can notice.
+
+Usage (from backend/):
+    python -m benchmarks.bench_audio_segments --stories 10 --paragraphs 8
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+
+def _story(providers, paragraphs: int) -> str:
+    return "\n\n".join(providers.section_text(providers.rng.randint(80, 160)) for _ in range(paragraphs))
+
+
+async def _timed(providers, text: str) -> tuple:
+    from app.services.audio_service import generate_story_audio
+    calls, busy = providers.calls["tts"], providers.busy_s["tts"]
+    started = time.perf_counter()
+    result = await generate_story_audio(text, "Historical", "English")
+    return result, {
+        "ms": (time.perf_counter() - started) * 1000,
+        "tts_calls": providers.calls["tts"] - calls,
+        "tts_busy_s": providers.busy_s["tts"] - busy,
+    }
+
+
+def _summary(runs: list) -> dict:
+    return {
+        "latency_ms": summarize([r["ms"] for r in runs]),
+        "tts_calls": sum(r["tts_calls"] for r in runs),
+        "tts_busy_s": round(sum(r["tts_busy_s"] for r in runs), 2),
+    }
+
+
+async def run(args) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed, tts_words_per_s=40.0)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, audio_dir=media_dir)
+        from app.core.config import settings
+        from app.services import audio_segments
+        settings.AUDIO_ALIGNMENT_SIDECAR = False
+        audio_segments.reset()
+
+        cold, full, incremental = [], [], []
+        for _ in range(args.stories):
+            text = _story(providers, args.paragraphs)
+            settings.AUDIO_SEGMENT_CACHE = True
+            _, stats = await _timed(providers, text)
+            cold.append(stats)
+
+            paragraphs = text.split("\n\n")
+            edited_at = providers.rng.randrange(len(paragraphs))
+            paragraphs[edited_at] = paragraphs[edited_at].replace(".", ", said the chronicler.", 1)
+            edited = "\n\n".join(paragraphs)
+
+            settings.AUDIO_SEGMENT_CACHE = False
+            from_scratch, stats = await _timed(providers, edited)
+            full.append(stats)
+            settings.AUDIO_SEGMENT_CACHE = True
+            assembled, stats = await _timed(providers, edited)
+            incremental.append(stats)
+
+            assert assembled["audioUrl"] == from_scratch["audioUrl"], "merged MP3 differs"
+            assert assembled["alignment"] == from_scratch["alignment"], "alignment differs"
+            starts = [a["start"] for a in assembled["alignment"] if a["type"] == "WordBoundary"]
+            assert starts == sorted(starts), "paragraph offsets overlap"
+        segments = audio_segments.stats()
+    return {
+        "stories": args.stories,
+        "paragraphs": args.paragraphs,
+        "cold_narration": _summary(cold),
+        "edit_full_resynthesis": _summary(full),
+        "edit_with_segments": _summary(incremental),
+        "segments": segments,
+        "identical_output": True,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stories", type=int, default=10)
+    parser.add_argument("--paragraphs", type=int, default=8)
+    parser.add_argument("--latency-scale", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
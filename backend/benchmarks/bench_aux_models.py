@@ -0,0 +1,93 @@
+"""
+Latency and output quality of the auxiliary LLM calls (image prompts,
+character extraction, character chat) with a small-model-first ladder
+against the large model alone.
+
+The stub's small models are faster (--small-speed) but return invalid
+output more often (--small-invalid); invalid output escalates to the large
+model, so the tiered numbers include the cost of those second calls.
+
+Usage (from backend/):
+    python -m benchmarks.bench_aux_models --calls 200
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+STORY = "Shivaji Maharaj was crowned at Raigad fort. Jijabai watched as the lamps were lit. " * 20
+
+
+async def run_pass(args, small: bool) -> dict:
+    from app.core.config import Settings, settings
+    defaults = Settings.model_fields["AUX_MODELS"].default
+    small_models = {ladder[0] for ladder in defaults.values()}
+    settings.AUX_MODELS = {task: list(ladder) if small else ladder[-1:] for task, ladder in defaults.items()}
+    profile = StubProfile.scaled(
+        args.latency_scale, seed=args.seed,
+        model_latency_factor={m: args.small_speed for m in small_models},
+        model_invalid_rate=dict({m: args.small_invalid for m in small_models},
+                                **{ladder[-1]: args.large_invalid for ladder in defaults.values()}),
+    )
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, audio_dir=media_dir)
+        from app.services import gemini_service, groq_service, model_tiers
+        model_tiers.reset()
+
+        tasks = {
+            "groq.image_prompts": lambda: groq_service.generate_image_prompts_groq(STORY, "Coronation", "Maratha Empire"),
+            "gemini.image_prompts": lambda: gemini_service.generate_image_prompts(STORY, "Coronation", "Maratha Empire"),
+            "gemini.extraction": lambda: gemini_service.extract_characters(STORY),
+            "gemini.chat": lambda: gemini_service.generate_character_chat_response(STORY, "Jijabai", [], "What did you feel?"),
+        }
+        results = {}
+        for task, call in tasks.items():
+            latencies = []
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one():
+                async with semaphore:
+                    started = time.perf_counter()
+                    await call()
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            await asyncio.gather(*(one() for _ in range(args.calls)))
+            task_stats = model_tiers.stats()[task]
+            results[task] = {
+                "latency_ms": summarize(latencies),
+                "valid_rate": round(1 - task_stats["failed"] / task_stats["calls"], 3),
+                "escalation_rate": task_stats["escalation_rate"],
+                "models": task_stats["models"],
+            }
+        results["provider_calls"] = {k: providers.calls[k] for k in ("groq", "gemini")}
+    return results
+
+
+async def run(args) -> dict:
+    return {
+        "calls_per_task": args.calls,
+        "large_only": await run_pass(args, small=False),
+        "tiered": await run_pass(args, small=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--small-speed", type=float, default=0.35, help="small model latency as a share of the large one")
+    parser.add_argument("--small-invalid", type=float, default=0.08)
+    parser.add_argument("--large-invalid", type=float, default=0.01)
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
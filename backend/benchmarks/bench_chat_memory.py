@@ -0,0 +1,97 @@
+"""
+Character chat over long conversations: bounded memory with rolling
+summaries (CHAT_MEMORY_ENABLED) against the old last-five-messages prompt.
+
+--conversations users chat with a character for --turns turns each, the way
+the frontend does: every /chat request carries the whole history, ending
+with the new message. Users pause --think seconds between turns, which is
+when summaries are computed. Aux calls pay for their prompt
+(prompt_tokens_per_s), so prompt size shows up in reply latency.
+
+Reported per pass: prompt tokens per turn, /chat latency, the share of
+earlier turns that reached the prompt (verbatim or summarized) and the
+summary calls it took.
+
+Usage (from backend/):
+    python -m benchmarks.bench_chat_memory --conversations 6 --turns 30
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import asgi_client, summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+
+async def run_pass(args, enabled: bool) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed, prompt_tokens_per_s=args.prefill_tokens_per_s)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, audio_dir=media_dir)
+        from app.core import admission
+        from app.core.config import settings
+        from app.services import chat_memory, model_tiers
+        from main import app
+        settings.CHAT_MEMORY_ENABLED = enabled
+        settings.USER_RATE_PER_MINUTE = 1e6
+        settings.USER_RATE_BURST = 1e6
+        admission.reset()
+        chat_memory.reset()
+        model_tiers.reset()
+        story = providers.story_text()
+        latencies, earlier_turns = [], 0
+
+        async def conversation(client, i: int):
+            nonlocal earlier_turns
+            history = [{"role": "assistant", "content": f"Greetings. I am Jijabai. Ask me anything about my journey."}]
+            for _ in range(args.turns):
+                message = providers.section_text(providers.rng.randint(8, 50))
+                history.append({"role": "user", "content": message})
+                earlier_turns += len(history) - 1
+                started = time.perf_counter()
+                response = await client.post("/api/chat", json={
+                    "story_context": story, "character_name": "Jijabai", "history": history, "message": message,
+                })
+                latencies.append((time.perf_counter() - started) * 1000)
+                history.append({"role": "assistant", "content": response.json()["response"]})
+                await asyncio.sleep(args.think * providers.rng.uniform(0.5, 1.5))
+
+        async with asgi_client(app) as client:
+            await asyncio.gather(*(conversation(client, i) for i in range(args.conversations)))
+        memory = chat_memory.stats()
+        summaries = model_tiers.stats().get("gemini.chat_summary", {}).get("calls", 0)
+        chat_memory.reset()
+    return {
+        "chat_latency_ms": summarize(latencies),
+        "prompt_tokens": memory["prompt_tokens"],
+        "earlier_turns_in_prompt": round(1 - memory["turns_forgotten"] / earlier_turns, 3),
+        "summary_calls": summaries,
+        "summary_states": {k: memory[f"summary_{k}"] for k in ("hit", "stale", "miss")},
+    }
+
+
+async def run(args) -> dict:
+    return {
+        "conversations": args.conversations,
+        "turns": args.turns,
+        "last_five_messages": await run_pass(args, enabled=False),
+        "bounded_memory": await run_pass(args, enabled=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=6)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between a reply and the next message")
+    parser.add_argument("--prefill-tokens-per-s", type=float, default=2000.0)
+    parser.add_argument("--latency-scale", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
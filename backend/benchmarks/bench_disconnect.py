@@ -0,0 +1,138 @@
+"""
+Provider time spent on requests whose client has already gone, with and
+without cancelling on disconnect. That a disconnect really cancels the
+provider calls is checked by test_cancellation.py, with the same stubs.
+
+Requests are driven straight through the ASGI app with a receive channel
+that behaves like uvicorn's: after the body it blocks until the client
+disconnects (or the response is complete). --abandon of the clients leave
+after a random 10-100% of --leave-max seconds, like a user navigating away
+or axios timing out. Provider seconds come from the stubs, so they measure
+real work rather than the app's own estimate (which is reported next to them).
+
+Usage (from backend/):
+    python -m benchmarks.bench_disconnect --clients 40 --abandon 0.5
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+
+async def asgi_post(app, path: str, payload: dict, leave_after: float = None) -> int:
+    """POST `payload`; the client disconnects after `leave_after` seconds if the response is not in yet."""
+    body = json.dumps(payload).encode()
+    gone = asyncio.Event()
+    state = {"body_sent": False, "status": None}
+
+    async def receive():
+        if not state["body_sent"]:
+            state["body_sent"] = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await gone.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            state["status"] = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            gone.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    handler = asyncio.create_task(app(scope, receive, send))
+    if leave_after is not None:
+        done, _ = await asyncio.wait({handler}, timeout=leave_after)
+        if not done:
+            gone.set()
+    await handler
+    return state["status"]
+
+
+def _configure(settings, cancel: bool):
+    settings.CANCEL_ON_DISCONNECT = cancel
+    settings.ADMISSION_ENABLED = True
+    settings.USER_RATE_PER_MINUTE = 1e6
+    settings.USER_RATE_BURST = 1e6
+    settings.STORY_REUSE_ENABLED = False
+    settings.WARM_ENABLED = False
+    settings.IMAGE_CACHE_ENABLED = False
+
+
+async def run_pass(args, cancel: bool) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed, decode_tokens_per_s=250.0, tts_words_per_s=40.0)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, provider=args.provider, audio_dir=media_dir)
+        from app.core import admission, cancellation
+        from app.core.config import settings
+        from main import app
+        _configure(settings, cancel)
+        admission.reset()
+        cancellation.reset()
+
+        rng = random.Random(args.seed)
+        latencies, statuses = [], {}
+
+        async def one(i: int):
+            if i % 2 == 0:
+                path = "/api/generate"
+                payload = {"clerkId": f"user-{i}", "email": "bench@example.com", "topic": f"Panipat ({i})",
+                           "era": "Maratha Empire", "style": "Narrative"}
+            else:
+                path = "/api/generate-audio"
+                payload = {"text": providers.story_text(), "storyType": "Historical", "language": "English"}
+            leave_after = rng.uniform(0.1, 1.0) * args.leave_max if rng.random() < args.abandon else None
+            started = time.perf_counter()
+            status = await asgi_post(app, path, payload, leave_after)
+            statuses[status] = statuses.get(status, 0) + 1
+            if leave_after is None:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.clients)))
+        wall_s = time.perf_counter() - started
+    return {
+        "statuses": statuses,
+        "wall_s": round(wall_s, 2),
+        "staying_clients_ms": summarize(latencies),
+        "provider_busy_s": {name: round(value, 2) for name, value in providers.busy_s.items()},
+        "provider_busy_total_s": round(sum(providers.busy_s.values()), 2),
+        "stub_cancellations": dict(providers.cancelled),
+        "app_estimate": cancellation.stats(),
+    }
+
+
+async def run(args) -> dict:
+    return {
+        "clients": args.clients,
+        "abandon_rate": args.abandon,
+        "provider": args.provider,
+        "without_cancellation": await run_pass(args, cancel=False),
+        "with_cancellation": await run_pass(args, cancel=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=40)
+    parser.add_argument("--abandon", type=float, default=0.5, help="share of clients that disconnect early")
+    parser.add_argument("--leave-max", type=float, default=1.0, help="abandoning clients leave within this many seconds")
+    parser.add_argument("--provider", choices=["groq", "gemini"], default="gemini")
+    parser.add_argument("--latency-scale", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Wall time and coherence proxies of fast story mode (outline, then sections
+in parallel) against the single-shot JSON generation.
+
+Stub LLM latency is time-to-first-token plus output tokens / decode rate, so
+the single-shot call pays for all ~900 words sequentially while fast mode
+pays for the outline plus its slowest section.
+
+Coherence proxies, per story:
+- adjacent_overlap: Jaccard similarity of content words between neighbouring
+  paragraphs (characters and places carried across; near 0 means the
+  sections do not talk about the same things)
+- cross_repeat_rate: share of word trigrams that occur in more than one
+  paragraph (sections retelling each other)
+- words / paragraph_words_cv: length and how evenly it is spread
+With stubs the text is random words, so the proxies only check the
+plumbing; run with --live (real GROQ_API_KEY or GEMINI_API_KEY in .env) to
+compare actual prose.
+
+Usage (from backend/):
+    python -m benchmarks.bench_fast_story --stories 20
+    python -m benchmarks.bench_fast_story --live --stories 3 --provider gemini
+"""
+import argparse
+import asyncio
+import json
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+TOPICS = ["Coronation of Shivaji Maharaj", "Battle of Panipat", "Founding of Pune",
+          "The lost temple of Hampi", "A voyage to Mars", "The stolen crown"]
+STOPWORDS = set("the a an and or of to in on at for with from by as is was were be been his her their its "
+                "that this it he she they them who which while into over".split())
+
+
+def paragraphs_of(text: str) -> list:
+    return [p for p in re.split(r"\n\s*\n", text or "") if p.strip()]
+
+
+def coherence(text: str) -> dict:
+    paragraphs = paragraphs_of(text)
+    tokens = [re.findall(r"\w+", p.lower()) for p in paragraphs]
+    content = [set(t) - STOPWORDS for t in tokens]
+    overlaps = [len(a & b) / len(a | b) for a, b in zip(content, content[1:]) if a | b]
+    owners = {}
+    for i, words in enumerate(tokens):
+        for trigram in zip(words, words[1:], words[2:]):
+            owners.setdefault(trigram, set()).add(i)
+    counts = [len(t) for t in tokens]
+    return {
+        "paragraphs": len(paragraphs),
+        "words": sum(counts),
+        "adjacent_overlap": statistics.mean(overlaps) if overlaps else 0.0,
+        "cross_repeat_rate": sum(len(o) > 1 for o in owners.values()) / len(owners) if owners else 0.0,
+        "paragraph_words_cv": statistics.pstdev(counts) / statistics.mean(counts) if len(counts) > 1 else 0.0,
+    }
+
+
+def _mean(rows: list, key: str) -> float:
+    return round(statistics.mean(r[key] for r in rows), 3) if rows else 0.0
+
+
+async def run_mode(args, mode: str, calls: dict) -> dict:
+    from app.api import endpoints
+    from app.core.config import settings
+    settings.SINGLE_FLIGHT_ENABLED = False
+
+    before = dict(calls)
+    latencies, rows, errors = [], [], 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        request = endpoints.StoryRequest(
+            clerkId="bench", email="bench@example.com", topic=f"{TOPICS[i % len(TOPICS)]} ({i})",
+            era="Maratha Empire", style="Narrative", storyType=args.story_type, language=args.language, mode=mode,
+        )
+        async with semaphore:
+            started = time.perf_counter()
+            story = await endpoints._generate_story_data(request)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if "error" in story:
+            errors += 1
+        else:
+            rows.append(coherence(story["story_content"]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.stories)))
+    return {
+        "wall_s": time.perf_counter() - started,
+        "latency_ms": summarize(latencies),
+        "errors": errors,
+        "llm_calls_per_story": {k: (calls[k] - before[k]) / args.stories for k in ("groq", "gemini")} if calls else None,
+        "coherence": {key: _mean(rows, key) for key in
+                      ("paragraphs", "words", "adjacent_overlap", "cross_repeat_rate", "paragraph_words_cv")},
+    }
+
+
+async def run(args) -> dict:
+    from app.core.config import settings
+    with tempfile.TemporaryDirectory() as media_dir:
+        calls = {}
+        if not args.live:
+            profile = StubProfile.scaled(args.latency_scale, seed=args.seed, blocking_groq=args.provider == "groq",
+                                         decode_tokens_per_s=args.decode_rate)
+            calls = install_stubs(profile, provider=args.provider, audio_dir=media_dir).calls
+        settings.ADMISSION_ENABLED = False
+        settings.STORY_REUSE_ENABLED = False
+        return {
+            "provider": args.provider if not args.live else ("groq" if settings.GROQ_API_KEY else "gemini"),
+            "stories": args.stories,
+            "live": args.live,
+            "single_shot": await run_mode(args, "standard", calls),
+            "fast": await run_mode(args, "fast", calls),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stories", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--provider", choices=["groq", "gemini"], default="gemini")
+    parser.add_argument("--story-type", default="Historical")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--decode-rate", type=float, default=250.0, help="stub output tokens per second")
+    parser.add_argument("--latency-scale", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--live", action="store_true", help="call the real providers configured in .env")
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Image provider calls and latency with the prompt-to-image cache, for a run of
+stories whose scene prompts repeat with trivial differences (case, spacing,
+trailing punctuation), as they do for stories on the same topic.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_cache --images 400 --distinct 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+NEGATIVE = "realistic human faces, portraits, text, watermark"
+
+
+def _variant(rng: random.Random, prompt: str) -> str:
+    return rng.choice([prompt, prompt.lower(), prompt + ".", "  " + prompt.replace(" ", "  "), prompt.upper()])
+
+
+def _disk_bytes(root: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files)
+
+
+async def run_pass(args, enabled: bool) -> dict:
+    rng = random.Random(args.seed)
+    prompts = [f"Wide shot of {place} at dusk, scene {i}"
+               for i, place in enumerate(rng.choice(["a fort", "a river ghat", "a temple", "a battlefield"])
+                                         for _ in range(args.distinct))]
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, audio_dir=media_dir)
+        from app.core.config import settings
+        settings.ADMISSION_ENABLED = False
+        settings.IMAGE_CACHE_ENABLED = enabled
+        from app.api import endpoints
+        from app.services.image_cache import ImageCache
+        endpoints.image_cache = cache = ImageCache(settings.IMAGE_CACHE_MEMORY_ENTRIES)
+
+        latencies = []
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                await endpoints._limited_image(_variant(rng, rng.choice(prompts)), NEGATIVE)
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.images)))
+        wall = time.perf_counter() - started
+        disk = _disk_bytes(media_dir)
+
+    return {
+        "provider_calls": providers.calls["openrouter"],
+        "wall_s": wall,
+        "latency_ms": summarize(latencies),
+        "disk_bytes": disk,
+        "cache": cache.stats(),
+    }
+
+
+async def run(args) -> dict:
+    return {
+        "images": args.images,
+        "distinct_prompts": args.distinct,
+        "without_cache": await run_pass(args, enabled=False),
+        "with_cache": await run_pass(args, enabled=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=400)
+    parser.add_argument("--distinct", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-scale", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
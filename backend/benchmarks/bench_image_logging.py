@@ -0,0 +1,81 @@
+"""
+CPU and memory cost of logging one OpenRouter image response:
+the old json.dumps/full-dict logging vs app.core.log_utils.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_logging --image-kb 800 --iterations 50
+"""
+import argparse
+import io
+import json
+import logging
+import sys
+import time
+import tracemalloc
+
+from app.core.log_utils import log_event
+
+logger = logging.getLogger("bench.image_logging")
+
+
+def legacy_log(result: dict):
+    """What image_service.generate_image logged per response before log_utils."""
+    logger.info(f"OpenRouter Response Structure: {json.dumps(result, indent=2)[:500]}")
+    message = result["choices"][0]["message"]
+    logger.info(f"Message keys: {message.keys()}")
+    logger.info(f"Message content: {message.get('content', 'NO CONTENT')[:200]}")
+    logger.info(f"Message images: {message.get('images', 'NO IMAGES')}")
+    image_data = message["images"][0]
+    logger.info(f"Found image data: {type(image_data)}")
+    logger.info(f"Returning image URL (length: {len(image_data['image_url']['url'])})")
+
+
+def structured_log(result: dict):
+    log_event(logger, logging.DEBUG, "openrouter.response", status=200, body=result)
+    image_url = result["choices"][0]["message"]["images"][0]["image_url"]["url"]
+    log_event(logger, logging.INFO, "openrouter.image", source="images", url=image_url)
+
+
+def measure(fn, result: dict, iterations: int) -> dict:
+    fn(result)  # warm up
+    tracemalloc.start()
+    cpu_started = time.process_time()
+    for _ in range(iterations):
+        fn(result)
+    cpu = time.process_time() - cpu_started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"cpu_ms_per_request": cpu / iterations * 1000, "peak_alloc_kb": peak / 1024}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image-kb", type=int, default=800)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--level", default="INFO", help="Logger level; DEBUG also emits the response summary")
+    args = parser.parse_args(argv)
+
+    # Format records for real, but throw the output away
+    handler = logging.StreamHandler(io.StringIO())
+    logger.addHandler(handler)
+    logger.setLevel(args.level)
+    logger.propagate = False
+
+    image_url = "data:image/png;base64," + "A" * (args.image_kb * 1024)
+    result = {"id": "gen-1", "choices": [{"message": {
+        "role": "assistant",
+        "content": "",
+        "images": [{"type": "image_url", "image_url": {"url": image_url}}],
+    }}]}
+
+    report = {
+        "image_kb": args.image_kb,
+        "level": args.level,
+        "before": measure(legacy_log, result, args.iterations),
+        "after": measure(structured_log, result, args.iterations),
+    }
+    sys.stdout.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
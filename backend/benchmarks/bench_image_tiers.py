@@ -0,0 +1,95 @@
+"""
+Story latency and image tiers through a traffic spike, with adaptive image
+tiers on and off. Traffic runs in phases of increasing concurrency; each
+phase reports the tiers handed out, images per story and latency.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_tiers
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.harness import asgi_client, summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+PHASES = [("quiet", 2), ("busy", 8), ("spike", 32), ("recovery", 2)]
+
+
+async def run_pass(args, adaptive: bool) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, provider="gemini", audio_dir=media_dir)
+        from app.core import admission
+        from app.core.config import settings
+        settings.ADMISSION_ENABLED = True
+        settings.USER_RATE_PER_MINUTE = settings.USER_RATE_BURST = 1_000_000
+        settings.IMAGE_MAX_CONCURRENCY = args.image_limit
+        settings.ADMISSION_MAX_QUEUE = 1_000
+        # Every stub story asks for the same scenes; keep each image a real provider call
+        settings.IMAGE_CACHE_ENABLED = False
+        settings.SINGLE_FLIGHT_ENABLED = False
+        settings.IMAGE_TIERS_ADAPTIVE = adaptive
+        settings.IMAGE_TIER_AUTO_MAX = args.auto_max
+        admission.reset()
+        from main import app
+
+        phases = {}
+        async with asgi_client(app) as client:
+            for name, concurrency in PHASES:
+                tiers, images, latencies = Counter(), [], []
+                before = providers.calls["openrouter"]
+
+                async def one(i):
+                    started = time.perf_counter()
+                    response = await client.post("/api/generate", json={
+                        "clerkId": f"u{i}", "email": "bench@example.com", "topic": f"{name} topic {i}",
+                        "era": "Medieval", "style": "Narrative", "withImages": True,
+                    })
+                    latencies.append(time.perf_counter() - started)
+                    body = response.json()
+                    tier = body.get("imageTier", {})
+                    tiers[tier.get("name", "?")] += 1
+                    images.append(len(body.get("images", [])))
+                    assert tier.get("count") == images[-1], tier
+
+                started = time.perf_counter()
+                await asyncio.gather(*(one(i) for i in range(concurrency * args.rounds)))
+                phases[name] = {
+                    "concurrency": concurrency,
+                    "wall_s": time.perf_counter() - started,
+                    "tiers": dict(tiers),
+                    "images_per_story": sum(images) / len(images),
+                    "image_calls": providers.calls["openrouter"] - before,
+                    "latency_s": summarize(latencies),
+                }
+    return phases
+
+
+async def run(args) -> dict:
+    return {
+        "image_limit": args.image_limit,
+        "auto_max": args.auto_max,
+        "fixed_tier": await run_pass(args, adaptive=False),
+        "adaptive": await run_pass(args, adaptive=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2, help="Requests per phase = concurrency x rounds")
+    parser.add_argument("--image-limit", type=int, default=8)
+    parser.add_argument("--auto-max", choices=["lite", "standard", "rich"], default="standard",
+                        help="IMAGE_TIER_AUTO_MAX: best tier an idle provider gives \"auto\"")
+    parser.add_argument("--latency-scale", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
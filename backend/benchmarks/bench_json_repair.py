@@ -0,0 +1,107 @@
+"""
+Story generations that survive malformed model JSON with local repair and
+schema validation, against plain json.loads.
+
+The stubs damage --malformed of JSON responses (markdown fences, trailing
+commas, raw newlines, trailing prose, truncation, a renamed key). Without
+repair each of those is a 500 and the user regenerates the whole story;
+with it most are fixed locally and the rest by one fix-up call.
+
+Usage (from backend/):
+    python -m benchmarks.bench_json_repair --stories 200 --malformed 0.15
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+
+def repair_us(repeat: int) -> dict:
+    """Microseconds to repair a ~6 KB story response, per damage kind."""
+    from app.services.llm_output import loads
+    from benchmarks.stubs import StubProviders
+    stub = StubProviders(StubProfile())
+    story = stub.story_json()
+    damaged = {
+        "clean": story,
+        "fences": f"```json\n{story}\n```",
+        "trailing_comma": story[:-1] + ",}",
+        "truncated": story[:int(len(story) * 0.8)],
+    }
+    results = {}
+    for name, text in damaged.items():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            loads(text)
+        results[name] = round((time.perf_counter() - started) / repeat * 1e6, 1)
+    return results
+
+
+async def run_pass(args, repair: bool) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed, malformed_rate=args.malformed)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, provider=args.provider, audio_dir=media_dir)
+        from app.api import endpoints
+        from app.core.config import settings
+        from app.services import llm_output
+        settings.ADMISSION_ENABLED = False
+        settings.STORY_REUSE_ENABLED = False
+        settings.LLM_OUTPUT_REPAIR = repair
+        llm_output.reset()
+
+        latencies, failures = [], 0
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(i: int):
+            nonlocal failures
+            request = endpoints.StoryRequest(clerkId="bench", email="bench@example.com", topic=f"Panipat ({i})",
+                                             era="Maratha Empire", style="Narrative")
+            async with semaphore:
+                started = time.perf_counter()
+                story = await endpoints._generate_story_data(request)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if "error" in story:
+                failures += 1
+
+        await asyncio.gather(*(one(i) for i in range(args.stories)))
+        story_ms = summarize(latencies)
+    return {
+        "failed_stories": failures,
+        "llm_calls": providers.calls[args.provider],
+        "latency_ms": story_ms,
+        # Each failure sends the user back for a full regeneration
+        "regeneration_s_lost": round(failures * story_ms["mean"] / 1000, 2),
+        "outcomes": llm_output.stats(),
+    }
+
+
+async def run(args) -> dict:
+    return {
+        "stories": args.stories,
+        "malformed_rate": args.malformed,
+        "repair_us_per_call": repair_us(args.repeat),
+        "without_repair": await run_pass(args, repair=False),
+        "with_repair": await run_pass(args, repair=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stories", type=int, default=200)
+    parser.add_argument("--malformed", type=float, default=0.15)
+    parser.add_argument("--provider", choices=["groq", "gemini"], default="gemini")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-scale", type=float, default=0.05)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Microseconds per call and accuracy of app.services.language against the
+previous detector (two re.findall passes, Devanagari always meant Hindi).
+
+Usage (from backend/):
+    python -m benchmarks.bench_language --chars 20000
+"""
+import argparse
+import json
+import re
+import sys
+import time
+
+from app.services.language import detect_language, resolve_voice
+
+SAMPLES = {
+    "English": (
+        "Shivaji Maharaj was crowned at Raigad fort. That day the whole fort glowed with lamps. "
+        "The soldiers were proud, and the people celebrated with joy. The king said that the kingdom "
+        "belonged to its people. "
+    ),
+    "Hindi": (
+        "शिवाजी महाराज ने रायगढ़ किले पर राज्याभिषेक किया। उस दिन पूरा किला दीपों से जगमगा रहा था। "
+        "मावलों के मन में गर्व था और लोगों ने खुशी से उत्सव मनाया। महाराज ने कहा कि स्वराज्य जनता का है। "
+        "यह दिन इतिहास में हमेशा याद रखा जाएगा, क्योंकि इससे एक नए युग की शुरुआत हुई थी। "
+    ),
+    "Marathi": (
+        "शिवाजी महाराजांनी रायगड किल्ल्यावर राज्याभिषेक केला. त्या दिवशी संपूर्ण किल्ला दिव्यांनी उजळून निघाला होता. "
+        "मावळ्यांच्या मनात अभिमान होता आणि लोकांनी आनंदाने उत्सव साजरा केला. महाराज म्हणाले की स्वराज्य हे जनतेचे आहे. "
+        "हा दिवस इतिहासात कायम लक्षात राहील, कारण त्यातून एका नव्या युगाची सुरुवात झाली. "
+    ),
+}
+
+# Mixed-script story: English prose quoting a Hindi line
+MIXED = SAMPLES["English"] * 3 + "उसने कहा, \"जय भवानी!\" " + SAMPLES["English"] * 3
+
+
+def legacy_detect(text: str) -> str:
+    """The detector this module replaced, kept verbatim for comparison."""
+    sample = text[:500]
+    devanagari_count = len(re.findall(r'[ऀ-ॿ]', sample))
+    latin_count = len(re.findall(r'[a-zA-Z]', sample))
+    if devanagari_count < 10 and latin_count > 20:
+        return "English"
+    if devanagari_count > latin_count:
+        return "Hindi"
+    return "English"
+
+
+def time_us(fn, text: str, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def run(args) -> dict:
+    results = {}
+    cases = dict(SAMPLES, Mixed=MIXED)
+    expected = dict((k, k) for k in SAMPLES)
+    expected["Mixed"] = "English"
+    for name, base in cases.items():
+        text = (base * (args.chars // len(base) + 1))[:args.chars]
+        # Short texts too: first sentence only
+        short = base.split(". ")[0].split("। ")[0]
+        results[name] = {
+            "chars": len(text),
+            "expected": expected[name],
+            "legacy": {"long": legacy_detect(text), "short": legacy_detect(short), "us_per_call": time_us(legacy_detect, text, args.repeat)},
+            "current": {"long": detect_language(text), "short": detect_language(short), "us_per_call": time_us(detect_language, text, args.repeat)},
+            "voice": resolve_voice(text)[1],
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chars", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(run(args), indent=2, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
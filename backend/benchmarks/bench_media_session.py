@@ -0,0 +1,156 @@
+"""
+Bytes on the wire for a typical listen-and-seek session, legacy /static
+mount vs the /media route.
+
+The client is a small browser-like media cache: it fetches byte windows with
+Range requests, keeps what it downloaded when the response carries a strong
+ETag, reuses fresh entries without touching the network and revalidates
+stale ones with If-None-Match.
+
+Usage (from backend/):
+    python -m benchmarks.bench_media_session --size-mb 4
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+
+import httpx
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+
+from app.api.media import router as media_router
+from app.services import storage
+
+READAHEAD = 256 * 1024
+
+# (action, position as a fraction of the file, fraction to play)
+SESSION = [
+    ("load", 0.0, 0.30),   # open story, listen to the first 30%
+    ("seek", 0.70, 0.10),  # jump ahead
+    ("seek", 0.20, 0.05),  # jump back to something already heard
+    ("reload", 0.0, 0.10), # come back the next day, start again
+    ("seek", 0.70, 0.05),
+]
+
+
+class MediaClient:
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self.cache = {}  # url -> {"etag", "expires", "ranges": [(start, end)]}
+        self.now = 0.0  # simulated clock, so "come back tomorrow" does not need a real day
+        self.bytes = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.statuses = set()
+
+    def _covered(self, entry, start, end) -> bool:
+        return any(a <= start and end <= b for a, b in entry["ranges"])
+
+    async def fetch(self, url: str, start: int, length: int, size_hint: int = None):
+        end = start + length - 1
+        if size_hint:
+            end = min(end, size_hint - 1)
+        entry = self.cache.get(url)
+        if entry and self._covered(entry, start, end):
+            if entry["expires"] > self.now:
+                return
+            if entry["etag"]:
+                self.requests += 1
+                response = await self.client.get(url, headers={"If-None-Match": entry["etag"]})
+                self.bytes += len(response.content)
+                if response.status_code == 304:
+                    self.not_modified += 1
+                    entry["expires"] = self.now + _max_age(response)
+                    return
+
+        self.requests += 1
+        async with self.client.stream("GET", url, headers={"Range": f"bytes={start}-"}) as response:
+            received = 0
+            body_start = start if response.status_code == 206 else 0
+            # A server that ignores Range makes us read from 0 up to the window we need
+            wanted = end - body_start + 1
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received >= wanted:
+                    break
+            # The player aborts once it has its window. ASGITransport hands over the body in
+            # one piece, so count what a real connection would have carried before the abort.
+            received = min(received, wanted)
+            self.bytes += received
+            self.statuses.add(response.status_code)
+            etag = response.headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                entry = self.cache.setdefault(url, {"etag": etag, "ranges": [], "expires": 0})
+                entry["ranges"].append((body_start, body_start + received - 1))
+                entry["expires"] = self.now + _max_age(response)
+
+
+def _max_age(response: httpx.Response) -> float:
+    """Freshness lifetime; no Cache-Control means revalidate every time (no heuristics)."""
+    cache_control = response.headers.get("cache-control", "")
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if not match or "no-cache" in cache_control:
+        return 0
+    return float(match.group(1))
+
+
+async def play_session(client: httpx.AsyncClient, url: str, size: int) -> dict:
+    media = MediaClient(client)
+    for action, position, play in SESSION:
+        if action == "reload":
+            media.now += 86400
+        start = int(size * position)
+        await media.fetch(url, start, int(size * play) + READAHEAD, size)
+    return {"bytes": media.bytes, "requests": media.requests, "not_modified": media.not_modified, "statuses": sorted(media.statuses)}
+
+
+async def run(args) -> dict:
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    digest = hashlib.sha256(payload).hexdigest()[:32]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        static_dir = os.path.join(tmp, "static", "audio")
+        os.makedirs(static_dir)
+        with open(os.path.join(static_dir, "legacy.mp3"), "wb") as f:
+            f.write(payload)
+
+        media_root = os.path.join(tmp, "media")
+        store = storage.LocalStorage(media_root)
+        storage.set_storage(store)
+        scratch = store.scratch_path()
+        with open(scratch, "wb") as f:
+            f.write(payload)
+        await store.put_file(f"audio/{digest}.mp3", scratch)
+
+        app = FastAPI()
+        app.mount("/static", StaticFiles(directory=os.path.join(tmp, "static")), name="static")
+        app.include_router(media_router)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            legacy = await play_session(client, "/static/audio/legacy.mp3", len(payload))
+            current = await play_session(client, f"/media/audio/{digest}.mp3", len(payload))
+        storage.set_storage(None)
+
+    return {
+        "file_bytes": len(payload),
+        "session": SESSION,
+        "static_mount": legacy,
+        "media_route": current,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=4)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Encoding cost and bytes on the wire for the API's large JSON responses.
+
+Payloads: a /generate story with image URLs, the same story with base64
+data-URL images (what a cold image cache returns), and /generate-audio
+alignment for --alignment-words words.
+
+Serialization, CPU ms per response (best of --repeat):
+- jsonable_encoder + json.dumps   what every route did before (JSONResponse)
+- jsonable_encoder + orjson       routes without a response model now
+- response model                  validate + dump_json in pydantic-core, the
+                                  path FastAPI takes for typed routes
+
+Wire bytes: identity, gzip at the middleware's level, gzip 9 and, if the
+brotli package is installed, brotli; with compression CPU ms for each.
+
+Then /generate-audio goes through the app (stubbed providers) with each
+Accept-Encoding to check the middleware end to end.
+
+Usage (from backend/):
+    python -m benchmarks.bench_response_encoding --alignment-words 3000
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import random
+import sys
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from benchmarks.harness import asgi_client
+from benchmarks.stubs import WORDS, StubProfile, install_stubs
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def story_payload(rng: random.Random, words: int, base64_images: bool) -> dict:
+    paragraphs = [_words(rng, words // 6).capitalize() + "." for _ in range(6)]
+    images = []
+    for i in range(3):
+        if base64_images:
+            url = "data:image/png;base64," + base64.b64encode(rng.randbytes(120_000)).decode()
+        else:
+            url = f"/media/images/{rng.getrandbits(128):032x}.png"
+        images.append({"url": url, "prompt": _words(rng, 40), "category": "Generated"})
+    return {
+        "story": {
+            "title": _words(rng, 5).title(), "content": "\n\n".join(paragraphs), "moral": _words(rng, 20),
+            "timeline": [{"year": str(1700 + 10 * i), "event": _words(rng, 12)} for i in range(6)],
+            "events": [_words(rng, 15) for _ in range(5)],
+            "topic": "Battle of Panipat", "era": "Maratha Empire", "style": "Narrative",
+        },
+        "imageTier": {"name": "rich", "requested": "auto", "count": 3, "model": "flux", "degraded": False,
+                      "reason": "pressure=0.10"},
+        "images": images,
+    }
+
+
+def alignment_payload(rng: random.Random, words: int) -> dict:
+    alignment, t = [], 0.0
+    for i in range(words):
+        word = rng.choice(WORDS)
+        alignment.append({"word": word, "start": t, "end": t + 0.3125, "type": "WordBoundary"})
+        t += 0.35
+        if i % 15 == 14:
+            alignment.append({"word": _words(rng, 15), "start": t - 5.25, "end": t, "type": "SentenceBoundary"})
+    return {"audioUrl": f"/media/audio/{rng.getrandbits(128):032x}.mp3", "alignment": alignment}
+
+
+def _best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 3)
+
+
+def serialization(payload: dict, model, repeat: int) -> dict:
+    from app.core import responses
+    adapter = TypeAdapter(model)
+
+    def stdlib():
+        return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+
+    def default_class():
+        return responses.dumps(jsonable_encoder(payload))
+
+    def typed():
+        return adapter.dump_json(adapter.validate_python(payload), exclude_unset=True)
+
+    # The typed route must send what the untyped one did
+    assert json.loads(typed()) == json.loads(stdlib())
+    return {
+        "jsonable_encoder+json_ms": _best_ms(stdlib, repeat),
+        f"jsonable_encoder+{'orjson' if responses.orjson else 'json'}_ms": _best_ms(default_class, repeat),
+        "response_model_ms": _best_ms(typed, repeat),
+    }
+
+
+def wire(body: bytes, repeat: int) -> dict:
+    from app.core import compression
+    from app.core.config import settings
+    result = {"identity_bytes": len(body)}
+    codecs = {
+        f"gzip{settings.RESPONSE_GZIP_LEVEL}": lambda: gzip.compress(body, settings.RESPONSE_GZIP_LEVEL),
+        "gzip9": lambda: gzip.compress(body, 9),
+    }
+    if compression.brotli is not None:
+        codecs[f"br{settings.RESPONSE_BROTLI_QUALITY}"] = lambda: compression.brotli.compress(
+            body, mode=compression.brotli.MODE_TEXT, quality=settings.RESPONSE_BROTLI_QUALITY)
+    for name, compress in codecs.items():
+        result[f"{name}_bytes"] = len(compress())
+        result[f"{name}_ms"] = _best_ms(compress, max(1, repeat // 4))
+    if compression.brotli is None:
+        result["br"] = "brotli not installed"
+    return result
+
+
+async def end_to_end(args) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, audio_dir=media_dir)
+        from app.core.config import settings
+        from main import app
+        settings.USER_RATE_PER_MINUTE = 1e6
+        settings.USER_RATE_BURST = 1e6
+        text = "\n\n".join(providers.section_text(args.alignment_words // 4) for _ in range(4))
+        results = {}
+        async with asgi_client(app) as client:
+            reference = None
+            for accept in ("identity", "gzip", "br, gzip"):
+                response = await client.post("/api/generate-audio", json={"text": text},
+                                             headers={"Accept-Encoding": accept})
+                body = response.json()
+                reference = reference or body
+                assert response.status_code == 200 and body == reference, accept
+                results[accept] = {
+                    "content_encoding": response.headers.get("content-encoding", "identity"),
+                    "bytes_on_wire": response.num_bytes_downloaded,
+                }
+    return results
+
+
+async def run(args) -> dict:
+    from app.api.endpoints import AudioResponse, StoryResponse
+    rng = random.Random(args.seed)
+    payloads = {
+        "story": (story_payload(rng, args.story_words, False), StoryResponse),
+        "story_base64_images": (story_payload(rng, args.story_words, True), StoryResponse),
+        "alignment": (alignment_payload(rng, args.alignment_words), AudioResponse),
+    }
+    report = {}
+    for name, (payload, model) in payloads.items():
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        report[name] = {"serialize": serialization(payload, model, args.repeat), "wire": wire(body, args.repeat)}
+    report["generate_audio_end_to_end"] = await end_to_end(args)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--story-words", type=int, default=900)
+    parser.add_argument("--alignment-words", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=40)
+    parser.add_argument("--latency-scale", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
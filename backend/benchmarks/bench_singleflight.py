@@ -0,0 +1,67 @@
+"""
+Provider calls for a burst of identical requests (a story going viral on
+/community), with and without single-flight coalescing. Cancellation
+safety of app.core.singleflight is checked by test_singleflight.py.
+
+Usage (from backend/):
+    python -m benchmarks.bench_singleflight --clients 50
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import asgi_client
+from benchmarks.stubs import StubProfile, install_stubs
+
+
+async def burst(args, enabled: bool) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed)
+    with tempfile.TemporaryDirectory() as audio_dir:
+        providers = install_stubs(profile, provider="gemini", audio_dir=audio_dir)
+        from app.core.config import settings
+        settings.SINGLE_FLIGHT_ENABLED = enabled
+        settings.ADMISSION_ENABLED = False
+        from main import app
+
+        text = providers.story_text()
+        report = {}
+        async with asgi_client(app) as client:
+            for path, payload, counter in (
+                ("/api/generate-audio", {"text": text, "storyType": "Historical", "language": "English"}, "tts"),
+                ("/api/extract-characters", {"text": text}, "gemini"),
+            ):
+                before = providers.calls[counter]
+                started = time.perf_counter()
+                responses = await asyncio.gather(*(client.post(path, json=payload) for _ in range(args.clients)))
+                report[path] = {
+                    "ok": sum(1 for r in responses if r.status_code == 200),
+                    "provider_calls": providers.calls[counter] - before,
+                    "distinct_bodies": len({r.content for r in responses}),
+                    "wall_s": time.perf_counter() - started,
+                }
+        settings.SINGLE_FLIGHT_ENABLED = True
+    return report
+
+
+async def run(args) -> dict:
+    return {
+        "clients": args.clients,
+        "without_single_flight": await burst(args, enabled=False),
+        "with_single_flight": await burst(args, enabled=True),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--latency-scale", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
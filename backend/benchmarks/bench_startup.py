@@ -0,0 +1,68 @@
+"""
+Cold-start cost of the API process: import time of `main` (from
+`python -X importtime`) and time until the lifespan startup has finished.
+
+Each sample is a fresh interpreter. Provider keys come from the environment
+as usual, so run it with and without keys to see what configured providers cost.
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+PROBE = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+async def startup():
+    async with main.app.router.lifespan_context(main.app):
+        pass
+asyncio.run(startup())
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "lifespan_s": t2 - t1}))
+"""
+
+
+def sample() -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, cwd=os.getcwd(),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    # "import time: self | cumulative | module" lines; keep the heaviest top-level packages
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)", line)
+        if match and len(match.group(3)) <= 3:
+            modules[match.group(4)] = int(match.group(2)) / 1e6
+    timings["top_imports_s"] = dict(sorted(modules.items(), key=lambda kv: -kv[1])[:8])
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    samples = [sample() for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "import_s_median": statistics.median(s["import_s"] for s in samples),
+        "lifespan_s_median": statistics.median(s["lifespan_s"] for s in samples),
+        "ready_s_median": statistics.median(s["import_s"] + s["lifespan_s"] for s in samples),
+        "top_imports_s": samples[-1]["top_imports_s"],
+    }
+    sys.stdout.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Recall and latency of the near-duplicate story index (MinHash + LSH) against
+an exact brute-force Jaccard scan over the same entries.
+
+Queries are trivial rewrites of stored topics (case, filler words, a year,
+word order, one typo) plus unrelated topics that must not match.
+
+Usage (from backend/):
+    python -m benchmarks.bench_story_index --entries 10000 --queries 2000
+"""
+import argparse
+import json
+import random
+import string
+import sys
+import time
+
+from app.services.story_index import StoryIndex, jaccard, partition_key, topic_shingles
+from benchmarks.harness import summarize
+
+PARTITIONS = [partition_key(era, "Narrative", kind, "English")
+              for era in ("Ancient", "Medieval", "Modern") for kind in ("Historical", "Mythological")]
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+
+
+def _topic(rng: random.Random, vocab: list) -> str:
+    return " ".join(rng.sample(vocab, rng.randint(2, 4))).title()
+
+
+def _rewrite(rng: random.Random, topic: str) -> str:
+    words = topic.split()
+    kind = rng.choice(["case", "filler", "year", "reorder", "typo"])
+    if kind == "case":
+        return topic.lower()
+    if kind == "filler":
+        return "the " + " of ".join(words)
+    if kind == "year":
+        return f"{topic} {rng.randint(1000, 1999)}"
+    if kind == "reorder":
+        rng.shuffle(words)
+        return " ".join(words)
+    i = rng.randrange(len(words))
+    w = words[i]
+    j = rng.randrange(len(w))
+    words[i] = w[:j] + rng.choice(string.ascii_lowercase) + w[j + 1:]
+    return " ".join(words)
+
+
+def brute_force(entries: list, partition: str, topic: str, threshold: float):
+    shingles = topic_shingles(topic)
+    best, best_topic = 0.0, None
+    for entry_partition, entry_topic, entry_shingles in entries:
+        if entry_partition != partition:
+            continue
+        similarity = jaccard(shingles, entry_shingles)
+        if similarity > best:
+            best, best_topic = similarity, entry_topic
+    return best_topic if best >= threshold else None
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    vocab = [_word(rng) for _ in range(args.vocab)]
+    index = StoryIndex(max_entries=args.entries)
+    entries = []
+    story = {"title": "t", "story_content": "x" * args.story_bytes}
+
+    started = time.perf_counter()
+    for _ in range(args.entries):
+        partition, topic = rng.choice(PARTITIONS), _topic(rng, vocab)
+        index.add(partition, topic, story)
+        entries.append((partition, topic, topic_shingles(topic)))
+    build_s = time.perf_counter() - started
+
+    queries = []
+    for n in range(args.queries):
+        partition, topic, _ = rng.choice(entries)
+        if n % 5 == 4:
+            topic = _topic(rng, [_word(rng) for _ in range(8)])  # unrelated
+        else:
+            topic = _rewrite(rng, topic)
+        queries.append((partition, topic))
+
+    index_times, brute_times = [], []
+    expected_hits = agreed_hits = missed = false_positive = 0
+    for partition, topic in queries:
+        t0 = time.perf_counter()
+        match = index.lookup(partition, topic, args.threshold)
+        index_times.append((time.perf_counter() - t0) * 1e6)
+        t0 = time.perf_counter()
+        expected = brute_force(entries, partition, topic, args.threshold)
+        brute_times.append((time.perf_counter() - t0) * 1e6)
+        if expected:
+            expected_hits += 1
+            if match and match.topic == expected:
+                agreed_hits += 1
+            elif not match:
+                missed += 1
+        elif match:
+            false_positive += 1
+
+    started = time.perf_counter()
+    data = StoryIndex.dumps(index.snapshot())
+    dump_s = time.perf_counter() - started
+    started = time.perf_counter()
+    restored = StoryIndex.loads(data, args.entries)
+    load_s = time.perf_counter() - started
+    probe_partition, probe_topic = queries[0]
+    assert (restored.lookup(probe_partition, probe_topic, args.threshold) or object()).__class__ is \
+        (index.lookup(probe_partition, probe_topic, args.threshold) or object()).__class__
+
+    return {
+        "entries": args.entries,
+        "queries": args.queries,
+        "threshold": args.threshold,
+        "build_s": build_s,
+        "recall": agreed_hits / expected_hits if expected_hits else None,
+        "expected_hits": expected_hits,
+        "missed": missed,
+        "false_positives": false_positive,
+        "lookup_us": {"index": summarize(index_times), "brute_force": summarize(brute_times)},
+        "persistence": {"bytes": len(data), "dump_s": dump_s, "load_s": load_s},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--vocab", type=int, default=3000)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--story-bytes", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(run(args), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
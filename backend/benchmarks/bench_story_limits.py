@@ -0,0 +1,95 @@
+"""
+Story latency and tokens generated vs kept with right-sized token budgets
+and stream-time early termination, against the old fixed 8192-token budget.
+
+A share of stub stories (--degenerate) misbehave like real models do: half
+loop on one sentence until the token limit, half keep writing notes after
+the JSON object closes. Latency is decode-rate bound (--decode-rate), so
+every wasted token costs wall time. Gemini stories also spend
+--thinking-tokens of their max_output_tokens on thinking first.
+
+Usage (from backend/):
+    python -m benchmarks.bench_story_limits --stories 60
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+CONFIGS = {
+    "fixed_8192": {"STORY_TOKEN_BUDGETS": False, "STORY_EARLY_STOP": False},
+    "budget_only": {"STORY_TOKEN_BUDGETS": True, "STORY_EARLY_STOP": False},
+    "budget_and_early_stop": {"STORY_TOKEN_BUDGETS": True, "STORY_EARLY_STOP": True},
+}
+
+
+async def run_pass(args, config: dict) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed, decode_tokens_per_s=args.decode_rate,
+                                 degenerate_rate=args.degenerate, thinking_tokens=args.thinking_tokens)
+    with tempfile.TemporaryDirectory() as media_dir:
+        providers = install_stubs(profile, provider=args.provider, audio_dir=media_dir)
+        from app.api import endpoints
+        from app.core.config import settings
+        from app.services import story_limits
+        settings.ADMISSION_ENABLED = False
+        settings.STORY_REUSE_ENABLED = False
+        for key, value in config.items():
+            setattr(settings, key, value)
+        story_limits.reset()
+
+        latencies, words, failures = [], [], 0
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(i: int):
+            nonlocal failures
+            request = endpoints.StoryRequest(clerkId="bench", email="bench@example.com", topic=f"Panipat ({i})",
+                                             era="Maratha Empire", style="Narrative", language=args.language)
+            async with semaphore:
+                started = time.perf_counter()
+                story = await endpoints._generate_story_data(request)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if "error" in story:
+                failures += 1
+            else:
+                words.append(len(story["story_content"].split()))
+
+        await asyncio.gather(*(one(i) for i in range(args.stories)))
+    return {
+        "latency_ms": summarize(latencies),
+        "failed_stories": failures,
+        "story_words": summarize(words),
+        "tokens_streamed": providers.tokens_streamed,
+        "streams_closed_early": providers.streams_closed_early,
+        "limits": story_limits.stats(),
+    }
+
+
+async def run(args) -> dict:
+    results = {"stories": args.stories, "degenerate_rate": args.degenerate, "provider": args.provider}
+    for name, config in CONFIGS.items():
+        results[name] = await run_pass(args, config)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stories", type=int, default=60)
+    parser.add_argument("--degenerate", type=float, default=0.2)
+    parser.add_argument("--provider", choices=["groq", "gemini"], default="gemini")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--decode-rate", type=float, default=250.0, help="stub output tokens per second")
+    parser.add_argument("--thinking-tokens", type=int, default=1500, help="Gemini thinking tokens per story")
+    parser.add_argument("--latency-scale", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
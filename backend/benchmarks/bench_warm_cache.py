@@ -0,0 +1,128 @@
+"""
+Does warming popular presets pay off? Replays two "days" of Zipf-distributed
+dashboard traffic: the first day only feeds the popularity counts, then the
+warmer runs once (off-peak) and the second day is served with the warm cache.
+
+Reports story/audio hit rates, hit vs miss latency, and provider calls spent
+by the warmer vs saved on live traffic.
+
+Usage (from backend/):
+    python -m benchmarks.bench_warm_cache --combos 60 --requests 300
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import asgi_client, summarize
+from benchmarks.stubs import StubProfile, install_stubs
+
+ERAS = ["Ancient", "Medieval", "Modern"]
+STYLES = ["Narrative", "Poem"]
+
+
+def presets(n: int, rng: random.Random) -> list:
+    return [(f"Preset topic {i}", rng.choice(ERAS), rng.choice(STYLES), "Historical", "English") for i in range(n)]
+
+
+def zipf_sampler(n: int, s: float, rng: random.Random):
+    weights = [1 / (rank + 1) ** s for rank in range(n)]
+    return lambda: rng.choices(range(n), weights)[0]
+
+
+async def day(client, combos, sample, args, rng, stats):
+    async def one(_):
+        topic, era, style, story_type, language = combos[sample()]
+        started = time.perf_counter()
+        response = await client.post("/api/generate", json={
+            "clerkId": f"user_{rng.randrange(500)}", "email": "bench@example.com", "topic": topic,
+            "era": era, "style": style, "storyType": story_type, "language": language, "withImages": True,
+        })
+        stats["story_ms"].append((time.perf_counter() - started) * 1000)
+        if response.status_code == 200 and rng.random() < args.listen_rate:
+            started = time.perf_counter()
+            await client.post("/api/generate-audio", json={
+                "text": response.json()["story"]["content"], "storyType": story_type, "language": language,
+            })
+            stats["audio_ms"].append((time.perf_counter() - started) * 1000)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(i):
+        async with semaphore:
+            await one(i)
+
+    await asyncio.gather(*(bounded(i) for i in range(args.requests)))
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    combos = presets(args.combos, rng)
+    sample = zipf_sampler(args.combos, args.zipf, rng)
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed)
+    with tempfile.TemporaryDirectory() as audio_dir:
+        providers = install_stubs(profile, audio_dir=audio_dir)
+        from app.core.config import settings
+        settings.ADMISSION_ENABLED = False
+        settings.WARM_ENABLED = True
+        settings.WARM_POPULARITY_PATH = ""
+        settings.WARM_TOP_N = args.top_n
+        settings.WARM_BUDGET_PER_RUN = args.top_n
+        from app.api.endpoints import warm_combo
+        from app.services import warm_cache
+        from main import app
+
+        async with asgi_client(app) as client:
+            day1 = {"story_ms": [], "audio_ms": []}
+            await day(client, combos, sample, args, rng, day1)
+            before = dict(providers.calls)
+
+            started = time.perf_counter()
+            warmed = await warm_cache.warm_once(warm_combo)
+            warm_s = time.perf_counter() - started
+            after_warm = dict(providers.calls)
+
+            cache = warm_cache.cache
+            cache.hits, cache.misses = {"story": 0, "audio": 0}, {"story": 0, "audio": 0}
+            day2 = {"story_ms": [], "audio_ms": []}
+            await day(client, combos, sample, args, rng, day2)
+            after = dict(providers.calls)
+
+    def spent(a, b):
+        return {k: b[k] - a[k] for k in a}
+
+    return {
+        "combos": args.combos,
+        "requests_per_day": args.requests,
+        "warmed": warmed,
+        "warm_run_s": warm_s,
+        "warm_cache": cache.stats(),
+        "story_latency_ms": {"day1_cold": summarize(day1["story_ms"]), "day2_warm": summarize(day2["story_ms"])},
+        "audio_latency_ms": {"day1_cold": summarize(day1["audio_ms"]), "day2_warm": summarize(day2["audio_ms"])},
+        "provider_calls": {
+            "day1": spent({k: 0 for k in before}, before),
+            "warmer": spent(before, after_warm),
+            "day2": spent(after_warm, after),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--combos", type=int, default=60)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--listen-rate", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-scale", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+    sys.stdout.write(json.dumps(asyncio.run(run(args)), indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Load driver and measurement helpers shared by the benchmark scripts.
+"""
+import asyncio
+import math
+import time
+from typing import Awaitable, Callable, List
+
+import httpx
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; returns 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+class LoopLagSampler:
+    """
+    Measures event-loop lag by scheduling a sleep every `interval` seconds and
+    recording how late it wakes up. Large values mean something blocked the loop.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def report(self) -> dict:
+        return {k: v * 1000 for k, v in summarize(self.samples).items() if k != "count"} | {"samples": len(self.samples)}
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    method: str,
+    path: str,
+    payload_factory: Callable[[int], dict],
+    total: int,
+    concurrency: int,
+    on_response: Callable[[httpx.Response], Awaitable[None]] = None,
+) -> dict:
+    """
+    Fire `total` requests at `path` with at most `concurrency` in flight and
+    return latency percentiles (ms), throughput and event-loop lag (ms).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses = {}
+    lag = LoopLagSampler()
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, json=payload_factory(i))
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if on_response:
+                await on_response(response)
+
+    lag.start()
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    wall = time.perf_counter() - wall_started
+    await lag.stop()
+
+    return {
+        "path": path,
+        "requests": total,
+        "concurrency": concurrency,
+        "wall_s": wall,
+        "throughput_rps": total / wall if wall else 0.0,
+        "latency_ms": {k: (v * 1000 if k != "count" else v) for k, v in summarize(latencies).items()},
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "loop_lag_ms": lag.report(),
+    }
+
+
+def asgi_client(app, timeout: float = 600.0) -> httpx.AsyncClient:
+    """In-process client: requests go straight into the ASGI app on this loop."""
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=timeout)
@@ -0,0 +1,121 @@
+"""
+Offline throughput benchmark for the story API.
+
+Drives /api/generate, /api/generate-audio and /api/chat in-process against
+stub providers and prints machine-readable JSON results.
+
+Usage (from backend/):
+    python -m benchmarks.run_benchmarks --concurrency 8 --requests 40
+    python -m benchmarks.run_benchmarks --scenario audio --latency-scale 0.1 --output bench.json
+    DIAGNOSTICS_ENABLED=true python -m benchmarks.run_benchmarks --scenario generate
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import asgi_client, run_load
+from benchmarks.stubs import StubProfile, install_stubs
+
+STORY_PAYLOAD = {
+    "clerkId": "bench_user",
+    "email": "bench@example.com",
+    "topic": "Battle of Panipat",
+    "era": "Medieval",
+    "style": "Narrative",
+    "storyType": "Historical",
+    "withImages": True,
+    "language": "English",
+}
+
+
+def story_payload(i: int) -> dict:
+    # Distinct topics, so single-flight does not fold the load into a handful of calls
+    return dict(STORY_PAYLOAD, clerkId=f"bench_user_{i % 16}", topic=f"{STORY_PAYLOAD['topic']} ({i})")
+
+
+def chat_payload(i: int) -> dict:
+    return {
+        "story_context": "The king walked along the walls of the fort. " * 40,
+        "character_name": "Shivaji Maharaj",
+        "history": [{"role": "user", "content": f"Question {n}"} for n in range(6)],
+        "message": f"What did you think of the treaty? ({i})",
+    }
+
+
+def audio_payload_factory(providers, count: int):
+    texts = [providers.story_text() for _ in range(count)]
+
+    def factory(i: int) -> dict:
+        return {"text": texts[i % len(texts)], "storyType": "Historical", "language": "English"}
+    return factory
+
+
+async def run(args) -> dict:
+    profile = StubProfile.scaled(args.latency_scale, seed=args.seed)
+    with tempfile.TemporaryDirectory() as audio_dir:
+        providers = install_stubs(profile, provider=args.provider, audio_dir=audio_dir)
+        from app.core.config import settings
+        # Throughput runs measure the pipeline, not the per-user limiter (see bench_admission)
+        settings.ADMISSION_ENABLED = args.admission
+        from main import app
+        from app.core import diagnostics
+
+        # ASGITransport does not run the lifespan, so start the loop monitor by hand
+        if diagnostics.monitor:
+            await diagnostics.monitor.start()
+
+        results = []
+        async with asgi_client(app) as client:
+            scenarios = ["generate", "audio", "chat"] if args.scenario == "all" else [args.scenario]
+            for scenario in scenarios:
+                if scenario == "generate":
+                    res = await run_load(client, "POST", "/api/generate", story_payload, args.requests, args.concurrency)
+                elif scenario == "audio":
+                    res = await run_load(client, "POST", "/api/generate-audio", audio_payload_factory(providers, args.requests), args.requests, args.concurrency)
+                else:
+                    res = await run_load(client, "POST", "/api/chat", chat_payload, args.requests, args.concurrency)
+                res["scenario"] = scenario
+                results.append(res)
+
+        diagnostics_summary = None
+        if diagnostics.monitor:
+            diagnostics_summary = diagnostics.monitor.summary()
+            await diagnostics.monitor.stop()
+
+    return {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "provider_calls": providers.calls,
+        "results": results,
+        "diagnostics": diagnostics_summary,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=["all", "generate", "audio", "chat"], default="all")
+    parser.add_argument("--provider", choices=["groq", "gemini"], default="groq")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every stub provider latency")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--admission", action="store_true", help="Keep admission control (rate limits, provider gates) on")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+"""
+Deterministic local stand-ins for the external providers (Groq, Gemini,
+OpenRouter, edge-tts and ffmpeg) so the API can be benchmarked offline.
+
+Every stub draws latency and payload sizes from a seeded RNG, so two runs
+with the same profile produce the same workload.
+"""
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+import httpx
+
+WORDS = (
+    "the fort stood above the river while the army waited in silence for dawn "
+    "and the king walked along the walls thinking of the treaty his father signed "
+    "merchants travelled from distant ports carrying silk spice and news of war"
+).split()
+
+
+@dataclass
+class LatencyDist:
+    """Log-normal latency in seconds, clamped to [min_s, max_s]."""
+    median_s: float = 0.2
+    sigma: float = 0.35
+    min_s: float = 0.0
+    max_s: float = 30.0
+
+    def sample(self, rng: random.Random) -> float:
+        value = self.median_s * rng.lognormvariate(0.0, self.sigma) if self.median_s > 0 else 0.0
+        return max(self.min_s, min(self.max_s, value))
+
+
+@dataclass
+class StubProfile:
+    seed: int = 1234
+    llm_latency: LatencyDist = field(default_factory=lambda: LatencyDist(median_s=0.8))
+    aux_latency: LatencyDist = field(default_factory=lambda: LatencyDist(median_s=0.15))
+    image_latency: LatencyDist = field(default_factory=lambda: LatencyDist(median_s=1.5))
+    tts_latency: LatencyDist = field(default_factory=lambda: LatencyDist(median_s=0.05))
+    story_words: tuple = (800, 1000)
+    paragraphs: tuple = (3, 4)
+    image_bytes: tuple = (300_000, 900_000)
+    tts_chunk_bytes: int = 4096
+    tts_bytes_per_word: int = 2200
+    # > 0: edge-tts streams a paragraph at this many words per second instead of all at once
+    tts_words_per_s: float = 0.0
+    # ffmpeg re-encoding merged narration: process start-up plus audio seconds encoded per second
+    # (LAME / libopus on 24 kHz mono speech, one core)
+    transcode_startup_s: float = 0.04
+    transcode_realtime_factor: float = 300.0
+    # Groq's SDK client is synchronous; keep that behaviour so blocking shows up in the numbers
+    blocking_groq: bool = True
+    # > 0: LLM text calls take aux_latency (time to first token) plus output tokens / this rate,
+    # instead of a flat llm_latency sample, so long outputs cost proportionally more
+    decode_tokens_per_s: float = 0.0
+    # Auxiliary calls (image prompts, extraction, chat) per model name: latency multiplier and
+    # share of outputs that come back invalid (empty list, truncated JSON, empty reply)
+    model_latency_factor: dict = field(default_factory=dict)
+    model_invalid_rate: dict = field(default_factory=dict)
+    # Share of JSON responses damaged the way real models do (fences, trailing commas, raw
+    # newlines, trailing prose, truncation, a renamed key)
+    malformed_rate: float = 0.0
+    # Share of stories where the model loops on one sentence until it runs out of tokens,
+    # or keeps writing notes after the JSON object
+    degenerate_rate: float = 0.0
+    stream_chunk_chars: int = 48
+    # Streamed Gemini stories think first: these tokens come out of max_output_tokens (and, with
+    # decode_tokens_per_s, take time) before any visible output
+    thinking_tokens: int = 0
+    # > 0: auxiliary calls also pay for reading their prompt (prefill), at this many tokens per second
+    prompt_tokens_per_s: float = 0.0
+
+    @classmethod
+    def scaled(cls, factor: float, **overrides) -> "StubProfile":
+        """Profile with every provider latency multiplied by `factor`."""
+        profile = cls(**overrides)
+        for dist in (profile.llm_latency, profile.aux_latency, profile.image_latency, profile.tts_latency):
+            dist.median_s *= factor
+        if profile.decode_tokens_per_s > 0:
+            profile.decode_tokens_per_s /= factor
+        if profile.tts_words_per_s > 0:
+            profile.tts_words_per_s /= factor
+        if profile.prompt_tokens_per_s > 0:
+            profile.prompt_tokens_per_s /= factor
+        return profile
+
+
+class StubProviders:
+    """Holds the RNG and call counters shared by all stubs of one run."""
+
+    def __init__(self, profile: StubProfile):
+        self.profile = profile
+        self.rng = random.Random(profile.seed)
+        self.calls = {"groq": 0, "gemini": 0, "openrouter": 0, "tts": 0, "transcode": 0}
+        self.tokens_streamed = 0
+        self.streams_closed_early = 0
+        # Calls cut off part-way (cancelled task, closed stream) and seconds each provider spent working
+        self.cancelled = {"groq": 0, "gemini": 0, "openrouter": 0, "tts": 0}
+        self.busy_s = {"groq": 0.0, "gemini": 0.0, "openrouter": 0.0, "tts": 0.0}
+
+    @contextmanager
+    def busy(self, provider: str):
+        started = time.perf_counter()
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled[provider] += 1
+            raise
+        finally:
+            self.busy_s[provider] += time.perf_counter() - started
+
+    def llm_latency(self, content: str) -> float:
+        """Seconds to produce `content` from an LLM text call."""
+        profile = self.profile
+        if profile.decode_tokens_per_s > 0:
+            tokens = len(content.split()) * 1.3
+            return profile.aux_latency.sample(self.rng) + tokens / profile.decode_tokens_per_s
+        return profile.llm_latency.sample(self.rng)
+
+    def malform(self, content: str) -> str:
+        if self.rng.random() >= self.profile.malformed_rate:
+            return content
+        fault = self.rng.choice(["fences", "trailing_comma", "raw_newlines", "prose", "truncated", "renamed_key"])
+        if fault == "fences":
+            return f"```json\n{content}\n```"
+        if fault == "trailing_comma":
+            return content[:-1] + ",}"
+        if fault == "raw_newlines":
+            return content.replace("\\n", "\n")
+        if fault == "prose":
+            return f"Here is the JSON you asked for:\n{content}\nLet me know if you need changes."
+        if fault == "truncated":
+            return content[:int(len(content) * self.rng.uniform(0.7, 0.98))]
+        # Valid JSON the schema rejects; only a fix-up call recovers it
+        return content.replace('"story_content"', '"content"').replace('"image_prompts"', '"prompts"')
+
+    def degenerate(self, content: str) -> str:
+        if self.rng.random() >= self.profile.degenerate_rate:
+            return content
+        if self.rng.random() < 0.5:
+            loop = "The king walked along the walls while the army waited in silence for dawn. " * 600
+            return content.replace('", "moral":', f' {loop}", "moral":')
+        notes = " ".join(self.rng.choice(WORDS) for _ in range(600))
+        return f"{content}\n\nNotes on this story: {notes}"
+
+    def stream_pieces(self, content: str, max_tokens: int):
+        """(pieces, seconds before each piece, finish) for streaming `content` under a token limit."""
+        profile = self.profile
+        truncated = len(content.encode("utf-8")) // 4 > max_tokens
+        if truncated:
+            content = content.encode("utf-8")[:max_tokens * 4].decode("utf-8", "ignore")
+        size = profile.stream_chunk_chars
+        pieces = [content[i:i + size] for i in range(0, len(content), size)] or [""]
+        if profile.decode_tokens_per_s > 0:
+            delays = [len(piece) / 4 / profile.decode_tokens_per_s for piece in pieces]
+            delays[0] += profile.aux_latency.sample(self.rng)
+        else:
+            delays = [profile.llm_latency.sample(self.rng) / len(pieces)] * len(pieces)
+        return pieces, delays, "length" if truncated else "stop"
+
+    def text_response(self, prompt: str):
+        """(content, latency) for a story, fast-mode outline or fast-mode section prompt."""
+        if "JSON below is malformed" in prompt:
+            content = self.story_json()
+        elif "JSON below was cut off" in prompt:
+            content = self.continuation_json(prompt)
+        elif "STORY OUTLINE" in prompt:
+            content = self.malform(self.outline_json())
+        elif "SECTION " in prompt:
+            match = re.search(r"about (\d+) words", prompt)
+            content = self.section_text(int(match.group(1)) if match else 250)
+        else:
+            content = self.malform(self.degenerate(self.story_json()))
+        return content, self.llm_latency(content)
+
+    def aux_response(self, kind: str, model: str = "", prompt: str = ""):
+        """(content, latency) for an image-prompt, extraction, chat or chat-summary call to `model`."""
+        profile = self.profile
+        latency = profile.aux_latency.sample(self.rng) * profile.model_latency_factor.get(model, 1.0)
+        if profile.prompt_tokens_per_s > 0:
+            latency += len(prompt.encode("utf-8")) / 4 / profile.prompt_tokens_per_s
+        if self.rng.random() < profile.model_invalid_rate.get(model, 0.0):
+            invalid = {"image_prompts": '{"image_prompts": []}', "extraction": '{"characters": ["Shivaji Mah'}
+            return invalid.get(kind, ""), latency
+        if kind == "image_prompts":
+            return self.malform(self.image_prompts_json()), latency
+        if kind == "extraction":
+            return self.malform(self.characters_json()), latency
+        if kind == "chat_summary":
+            return self.section_text(self.rng.randint(60, 110)), latency
+        return "I remember that day well, traveller. " + self.section_text(self.rng.randint(10, 40)), latency
+
+    # Payload builders
+
+    def section_text(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def story_text(self) -> str:
+        words = self.rng.randint(*self.profile.story_words)
+        count = self.rng.randint(*self.profile.paragraphs)
+        per_paragraph = max(1, words // count)
+        paragraphs = []
+        for _ in range(count):
+            paragraphs.append(" ".join(self.rng.choice(WORDS) for _ in range(per_paragraph)).capitalize() + ".")
+        return "\n\n".join(paragraphs)
+
+    def story_json(self, topic: str = "Topic") -> str:
+        return json.dumps({
+            "title": f"The Story of {topic}",
+            "era": "Medieval",
+            "timeline": [{"date": "1761", "event": "Battle"}, {"date": "1762", "event": "Treaty"}],
+            "main_events_summary": ["Arrival", "Conflict", "Resolution"],
+            "story_content": self.story_text(),
+            "moral": "Patience outlasts haste.",
+        })
+
+    def continuation_json(self, prompt: str) -> str:
+        """The rest of a cut-off story: the open field's continuation and the missing keys."""
+        story = json.loads(self.story_json())
+        rest = {}
+        open_key = re.search(r'^- "(\w+)": only the text', prompt, re.M)
+        if open_key:
+            rest[open_key.group(1)] = " " + self.section_text(self.rng.randint(20, 60))
+        missing = re.search(r"^- complete values for the missing keys: (.+)$", prompt, re.M)
+        for key in missing.group(1).split(", ") if missing else []:
+            if key in story:
+                rest[key] = story[key]
+        return json.dumps(rest)
+
+    def outline_json(self, topic: str = "Topic") -> str:
+        count = self.rng.randint(*self.profile.paragraphs)
+        return json.dumps({
+            "title": f"The Story of {topic}",
+            "era": "Medieval",
+            "timeline": [{"date": "1761", "event": "Battle"}, {"date": "1762", "event": "Treaty"}],
+            "main_events_summary": ["Arrival", "Conflict", "Resolution"],
+            "sections": [{"heading": f"Part {i + 1}", "beats": self.section_text(30)} for i in range(count)],
+            "moral": "Patience outlasts haste.",
+        })
+
+    def image_prompts_json(self) -> str:
+        return json.dumps({"image_prompts": [
+            {"scene_description": f"Wide shot of a fort at dusk, scene {i}", "negative_prompt": "realistic human faces, portraits, text, watermark"}
+            for i in range(3)
+        ]})
+
+    def characters_json(self) -> str:
+        return json.dumps({"characters": ["Shivaji Maharaj", "Jijabai", "Afzal Khan"]})
+
+    def image_data_url(self) -> str:
+        size = self.rng.randint(*self.profile.image_bytes)
+        raw = bytes(self.rng.getrandbits(8) for _ in range(64)) * (size // 64)
+        return "data:image/png;base64," + base64.b64encode(raw).decode()
+
+
+# Groq
+
+class _Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class StubGroqClient:
+    """Mimics `groq.Groq().chat.completions.create` (a blocking call)."""
+
+    def __init__(self, providers: StubProviders):
+        self.providers = providers
+        self.chat = _Obj(completions=_Obj(create=self._create))
+
+    def _create(self, model: str, messages: list, **kwargs):
+        providers = self.providers
+        providers.calls["groq"] += 1
+        prompt = messages[-1]["content"]
+        if kwargs.get("stream"):
+            content, _ = providers.text_response(prompt)
+            return StubGroqStream(providers, *providers.stream_pieces(content, kwargs.get("max_tokens", 8192)))
+        if "visual prompts" in prompt:
+            content, latency = providers.aux_response("image_prompts", model)
+        else:
+            content, latency = providers.text_response(prompt)
+        if providers.profile.blocking_groq:
+            with providers.busy("groq"):
+                time.sleep(latency)
+        return _Obj(
+            choices=[_Obj(message=_Obj(content=content))],
+            usage=_Obj(total_time=latency),
+        )
+
+
+class StubGroqStream:
+    """Mimics the SDK's chat completion stream: blocking iteration plus close()."""
+
+    def __init__(self, providers: StubProviders, pieces: list, delays: list, finish: str):
+        self.providers = providers
+        self.pieces = pieces
+        self.delays = delays
+        self.finish = finish
+        self.sent = 0
+        self.closed = False
+
+    def __iter__(self):
+        for i, (piece, delay) in enumerate(zip(self.pieces, self.delays)):
+            if self.closed:
+                return
+            started = time.perf_counter()
+            time.sleep(delay)
+            self.providers.busy_s["groq"] += time.perf_counter() - started
+            self.providers.tokens_streamed += len(piece.encode("utf-8")) // 4
+            self.sent += 1
+            last = i == len(self.pieces) - 1
+            yield _Obj(choices=[_Obj(delta=_Obj(content=piece), finish_reason=self.finish if last else None)])
+
+    def close(self):
+        # Early only if the model still had output left to send
+        if self.sent < len(self.pieces) and not self.closed:
+            self.providers.streams_closed_early += 1
+            self.providers.cancelled["groq"] += 1
+        self.closed = True
+
+
+# Gemini
+
+class StubGeminiStream:
+    """Mimics a streamed AsyncGenerateContentResponse; `_iterator.cancel()` stops it."""
+
+    def __init__(self, providers: StubProviders, pieces: list, delays: list, finish: str):
+        self.providers = providers
+        self.pieces = pieces
+        self.delays = delays
+        self.finish = "MAX_TOKENS" if finish == "length" else "STOP"
+        self.sent = 0
+        self.cancelled = False
+        self._iterator = self
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        for i, (piece, delay) in enumerate(zip(self.pieces, self.delays)):
+            if self.cancelled:
+                return
+            started = time.perf_counter()
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.providers.busy_s["gemini"] += time.perf_counter() - started
+            self.providers.tokens_streamed += len(piece.encode("utf-8")) // 4
+            self.sent += 1
+            last = i == len(self.pieces) - 1
+            reason = _Obj(name=self.finish if last else "FINISH_REASON_UNSPECIFIED")
+            yield _Obj(text=piece, candidates=[_Obj(finish_reason=reason)])
+
+    def cancel(self):
+        if self.sent < len(self.pieces) and not self.cancelled:
+            self.providers.streams_closed_early += 1
+            self.providers.cancelled["gemini"] += 1
+        self.cancelled = True
+
+
+class StubGeminiModel:
+    """Mimics `genai.GenerativeModel.generate_content_async`."""
+
+    def __init__(self, providers: StubProviders, kind: str, model: str = ""):
+        self.providers = providers
+        self.kind = kind
+        self.model = model
+
+    async def generate_content_async(self, prompt, **kwargs):
+        providers = self.providers
+        providers.calls["gemini"] += 1
+        if kwargs.get("stream"):
+            content, _ = providers.text_response(prompt)
+            max_tokens = (kwargs.get("generation_config") or {}).get("max_output_tokens", 8192)
+            thinking = min(max_tokens, providers.profile.thinking_tokens)
+            pieces, delays, finish = providers.stream_pieces(content, max_tokens - thinking)
+            if providers.profile.decode_tokens_per_s > 0:
+                delays[0] += thinking / providers.profile.decode_tokens_per_s
+            return StubGeminiStream(providers, pieces, delays, finish)
+        if self.kind in ("story", "text"):
+            text, latency = providers.text_response(prompt)
+        else:
+            text, latency = providers.aux_response(self.kind, self.model, str(prompt))
+        with providers.busy("gemini"):
+            await asyncio.sleep(latency)
+        return _Obj(text=text)
+
+
+# OpenRouter
+
+def openrouter_transport(providers: StubProviders) -> httpx.MockTransport:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        providers.calls["openrouter"] += 1
+        with providers.busy("openrouter"):
+            await asyncio.sleep(providers.profile.image_latency.sample(providers.rng))
+        image_url = providers.image_data_url()
+        return httpx.Response(200, json={
+            "id": "stub",
+            "choices": [{"message": {
+                "role": "assistant",
+                "content": "",
+                "images": [{"type": "image_url", "image_url": {"url": image_url}}],
+            }}],
+        })
+    return httpx.MockTransport(handler)
+
+
+# edge-tts
+
+class StubCommunicate:
+    """Mimics `edge_tts.Communicate(...).stream()` with audio and WordBoundary events."""
+    providers: StubProviders = None
+
+    def __init__(self, text: str, voice: str = "", **kwargs):
+        self.text = text
+        self.voice = voice
+        self.kwargs = kwargs
+
+    async def stream(self):
+        providers = self.providers
+        providers.calls["tts"] += 1
+        profile = providers.profile
+        words = self.text.split()
+        total = len(words) * profile.tts_bytes_per_word
+        chunk = b"\xff\xf3" + b"\x00" * (profile.tts_chunk_bytes - 2)
+        offset = 0
+        sent = 0
+        with providers.busy("tts"):
+            await asyncio.sleep(profile.tts_latency.sample(providers.rng))
+            for word in words:
+                duration = 3_000_000
+                yield {"type": "WordBoundary", "offset": offset, "duration": duration, "text": word}
+                offset += duration + 500_000
+                while sent < total * (offset / (len(words) * 3_500_000)):
+                    yield {"type": "audio", "data": chunk}
+                    sent += len(chunk)
+                    # Real edge-tts streams over a websocket; yield to the loop between frames
+                    await asyncio.sleep(0)
+                if profile.tts_words_per_s > 0:
+                    await asyncio.sleep(1 / profile.tts_words_per_s)
+
+
+# ffmpeg
+
+class StubTranscoder:
+    """
+    Mimics audio_formats.FfmpegTranscoder: takes the time an encode of that
+    much 48 kbps audio would and writes a file of the target bitrate's size.
+    """
+
+    def __init__(self, providers: StubProviders):
+        self.providers = providers
+
+    async def transcode(self, source: str, target: str, fmt):
+        providers = self.providers
+        providers.calls["transcode"] += 1
+        profile = providers.profile
+        size = os.path.getsize(source)
+        duration_s = size / (48_000 / 8)
+        await asyncio.sleep(profile.transcode_startup_s + duration_s / profile.transcode_realtime_factor)
+        data = b"\x00" * int(size * fmt.bitrate / 48_000)
+        await asyncio.to_thread(_write_file, target, data)
+
+
+def _write_file(path: str, data: bytes):
+    with open(path, "wb") as handle:
+        handle.write(data)
+
+
+def install_stubs(profile: StubProfile, provider: str = "groq", audio_dir: str = None) -> StubProviders:
+    """
+    Patch the service modules in place so every provider call hits a stub.
+    `provider` selects the story path ("groq" or "gemini") the same way
+    GROQ_API_KEY does in production. `audio_dir` points media storage at a
+    throwaway LocalStorage root.
+    """
+    from app.core.config import settings
+    from app.services import image_service, storage
+    from app.services.registry import providers as registry
+
+    providers = StubProviders(profile)
+
+    registry.set("groq", StubGroqClient(providers))
+    for kind in ("story", "text"):
+        registry.set(f"gemini.{kind}", StubGeminiModel(providers, kind))
+    # Auxiliary tasks resolve one registry entry per model on their ladder
+    for kind in ("image_prompts", "extraction", "chat", "chat_summary"):
+        for model in settings.AUX_MODELS.get(f"gemini.{kind}", []):
+            registry.set(f"gemini.{kind}:{model}", StubGeminiModel(providers, kind, model))
+    settings.GROQ_API_KEY = "stub-key" if provider == "groq" else ""
+
+    settings.OPENROUTER_API_KEY = settings.OPENROUTER_API_KEY or "stub-key"
+    transport = openrouter_transport(providers)
+    real_async_client = httpx.AsyncClient
+
+    class _StubAsyncClient(real_async_client):
+        def __init__(self, *args, **kwargs):
+            kwargs["transport"] = transport
+            super().__init__(*args, **kwargs)
+
+    image_service.httpx = _Obj(AsyncClient=_StubAsyncClient)
+
+    StubCommunicate.providers = providers
+    registry.set("edge_tts", _Obj(Communicate=StubCommunicate))
+    registry.set("ffmpeg", StubTranscoder(providers))
+    if audio_dir:
+        storage.set_storage(storage.LocalStorage(audio_dir))
+
+    return providers
@@ -0,0 +1,40 @@
+import argparse
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.audio_segments import SEGMENT_PREFIX
+from app.services.storage import get_storage, key_from_url
+
+# Delete generated media no story references any more.
+# Export the referenced URLs from the frontend database first, e.g.
+#   psql "$DATABASE_URL" -Atc 'SELECT "audioUrl" FROM "Story" WHERE "audioUrl" IS NOT NULL' > referenced.txt
+#   python gc_media.py --referenced referenced.txt --grace-hours 24
+# Files derived from a referenced one (alignment sidecars, other audio formats) are kept with it.
+# Paragraph segments are shared between stories and never referenced directly; they are
+# deleted by age instead (--segment-max-age-days).
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--referenced", required=True, help="File with one referenced media URL per line")
+    parser.add_argument("--grace-hours", type=float, default=24, help="Never delete media younger than this")
+    parser.add_argument("--prefix", default="audio/")
+    parser.add_argument("--segment-max-age-days", type=float, default=30, help="0 keeps all paragraph segments")
+    args = parser.parse_args()
+
+    with open(args.referenced) as f:
+        keys = {key_from_url(line.strip()) for line in f}
+    keys.discard(None)
+    print(f"Referenced media keys: {len(keys)}")
+
+    storage = get_storage()
+    stats = await storage.gc(max_age_s=args.grace_hours * 3600, referenced=keys, prefix=args.prefix,
+                             skip_prefixes=[SEGMENT_PREFIX])
+    print(f"GC result: {stats}")
+    if args.segment_max_age_days > 0 and SEGMENT_PREFIX.startswith(args.prefix):
+        stats = await storage.gc(max_age_s=args.segment_max_age_days * 86400, prefix=SEGMENT_PREFIX)
+        print(f"Segment GC result: {stats}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,15 +4,67 @@ import os
 # Load .env file FIRST before any other imports
 load_dotenv()
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 # Force reload for logging update
-from app.api.endpoints import router
+from app.api.endpoints import router, warm_combo
+from app.api.media import router as media_router
+from app.core import diagnostics
+from app.core.admission import AdmissionRejected
+from app.core.cancellation import ClientDisconnected
+from app.core.compression import CompressionMiddleware
+from app.core.config import settings
+from app.core.responses import JSONResponse as FastJSONResponse
+from app.services.registry import providers
+from app.services import audio_prefetch, chat_memory, story_index, warm_cache
+from app.services.storage import get_storage
+import asyncio
 import logging
 
 logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Historical Storytelling API")
+async def media_gc_loop():
+    while True:
+        await asyncio.sleep(settings.MEDIA_GC_INTERVAL_MINUTES * 60)
+        try:
+            await get_storage().gc(max_age_s=settings.MEDIA_RETENTION_DAYS * 86400)
+        except Exception as e:
+            logger.error(f"Media GC failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if diagnostics.monitor:
+        await diagnostics.monitor.start()
+    # Build SDK clients for the providers that have credentials, off the event loop
+    status = await asyncio.to_thread(providers.init_configured)
+    logger.info(f"Providers ready: {status or 'none configured'}")
+    if settings.ADMISSION_ENABLED and not settings.INTERNAL_API_SECRET:
+        logger.warning("INTERNAL_API_SECRET is not set; per-user rate limits are off "
+                       "(provider concurrency limits still apply)")
+    if settings.STORY_REUSE_ENABLED:
+        await asyncio.to_thread(story_index.get_index)
+    gc_task = asyncio.create_task(media_gc_loop()) if settings.MEDIA_GC_INTERVAL_MINUTES > 0 else None
+    warm_task = None
+    if settings.WARM_ENABLED:
+        await asyncio.to_thread(warm_cache.load_popularity)
+        warm_task = asyncio.create_task(warm_cache.warm_loop(warm_combo))
+    yield
+    audio_prefetch.cancel_all()
+    chat_memory.cancel_all()
+    if gc_task:
+        gc_task.cancel()
+    if warm_task:
+        warm_task.cancel()
+        await warm_cache.save_popularity()
+    await story_index.save()
+    if diagnostics.monitor:
+        await diagnostics.monitor.stop()
+
+# Routes without a response model render through orjson when it is installed (app.core.responses)
+app = FastAPI(title="Historical Storytelling API", lifespan=lifespan, default_response_class=FastJSONResponse)
 # Force reload for syntax fix check
 
 app.add_middleware(
@@ -22,16 +74,38 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if settings.RESPONSE_COMPRESSION:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES,
+        gzip_level=settings.RESPONSE_GZIP_LEVEL,
+        brotli_quality=settings.RESPONSE_BROTLI_QUALITY,
+    )
+diagnostics.install(app, settings)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected(request: Request, exc: ClientDisconnected):
+    # Nobody is listening; 499 (nginx's "client closed request") keeps these apart in the access log
+    return Response(status_code=499)
 # Reload Trigger: Sentence Alignment Support
 
 from fastapi.staticfiles import StaticFiles
 import os
 
-# Create static directory if it doesn't exist
-os.makedirs("static", exist_ok=True)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# New audio lives in blob storage under /media; /static keeps serving older files if present
+if os.path.isdir("static"):
+    app.mount("/static", StaticFiles(directory="static"), name="static")
 
 app.include_router(router, prefix="/api")
+app.include_router(media_router)
 
 @app.get("/")
 def read_root():
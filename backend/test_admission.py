@@ -0,0 +1,72 @@
+"""
+Per-user rate limiting (app.core.admission) and whom it charges
+(app.api.endpoints._user_id).
+
+Run from backend/:
+    python -m pytest -q test_admission.py
+"""
+import pytest
+from starlette.requests import Request
+
+from app.api.endpoints import _user_id
+from app.core import admission
+from app.core.admission import AdmissionRejected
+from app.core.config import settings
+
+SECRET = "test-secret"
+
+
+@pytest.fixture
+def limits():
+    saved = {key: getattr(settings, key) for key in (
+        "ADMISSION_ENABLED", "INTERNAL_API_SECRET", "USER_RATE_PER_MINUTE", "USER_RATE_BURST")}
+    settings.ADMISSION_ENABLED = True
+    settings.INTERNAL_API_SECRET = SECRET
+    settings.USER_RATE_PER_MINUTE = 0
+    settings.USER_RATE_BURST = 1
+    admission.reset()
+    yield settings
+    for key, value in saved.items():
+        setattr(settings, key, value)
+    admission.reset()
+
+
+def _request(headers: dict, host: str = "10.0.0.5") -> Request:
+    """A request as it reaches the backend from the frontend server."""
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/api/generate",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": (host, 40000),
+    })
+
+
+def test_trusted_users_behind_one_ip_get_separate_buckets(limits):
+    alice = _request({"X-Internal-Secret": SECRET, "X-User-Id": "alice"})
+    bob = _request({"X-Internal-Secret": SECRET, "X-User-Id": "bob"})
+    assert _user_id(alice) == "user:alice"
+    admission.check_user(_user_id(alice))
+    admission.check_user(_user_id(bob))
+    with pytest.raises(AdmissionRejected):
+        admission.check_user(_user_id(alice))
+
+
+def test_untrusted_user_id_is_ignored(limits):
+    forged = [
+        _request({"X-User-Id": "alice"}),
+        _request({"X-Internal-Secret": "wrong", "X-User-Id": "bob"}),
+    ]
+    assert {_user_id(request) for request in forged} == {"ip:10.0.0.5"}
+    admission.check_user(_user_id(forged[0]))
+    with pytest.raises(AdmissionRejected):
+        admission.check_user(_user_id(forged[1]))
+
+
+def test_no_secret_means_no_per_user_limit(limits):
+    limits.INTERNAL_API_SECRET = ""
+    request = _request({"X-Internal-Secret": "", "X-User-Id": "alice"})
+    assert _user_id(request) == "ip:10.0.0.5"
+    assert not admission.user_limits_enabled()
+    for _ in range(10):
+        admission.check_user(_user_id(request))
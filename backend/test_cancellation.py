@@ -0,0 +1,113 @@
+"""
+Disconnect cancellation (app.core.cancellation) against the stub providers,
+which record every call they see cut off part-way.
+
+Run from backend/:
+    python -m pytest -q test_cancellation.py
+"""
+import asyncio
+import os
+
+import pytest
+
+from benchmarks.bench_disconnect import asgi_post
+from benchmarks.stubs import StubProfile, install_stubs
+
+pytestmark = pytest.mark.anyio
+
+STORY = {"clerkId": "check", "email": "bench@example.com", "topic": "Raigad", "era": "Maratha Empire", "style": "Narrative"}
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def stubbed(tmp_path):
+    """(app, providers, settings, media dir) with stub providers and cancellation on."""
+    profile = StubProfile.scaled(0.25, seed=1234, decode_tokens_per_s=250.0, tts_words_per_s=40.0)
+    providers = install_stubs(profile, provider="gemini", audio_dir=str(tmp_path))
+    from app.core import admission, cancellation
+    from app.core.config import settings
+    from main import app
+    saved = {key: getattr(settings, key) for key in (
+        "CANCEL_ON_DISCONNECT", "ADMISSION_ENABLED", "USER_RATE_PER_MINUTE", "USER_RATE_BURST",
+        "STORY_REUSE_ENABLED", "WARM_ENABLED", "IMAGE_CACHE_ENABLED")}
+    settings.CANCEL_ON_DISCONNECT = True
+    settings.ADMISSION_ENABLED = True
+    settings.USER_RATE_PER_MINUTE = 1e6
+    settings.USER_RATE_BURST = 1e6
+    settings.STORY_REUSE_ENABLED = False
+    settings.WARM_ENABLED = False
+    settings.IMAGE_CACHE_ENABLED = False
+    admission.reset()
+    cancellation.reset()
+    yield app, providers, settings, str(tmp_path)
+    for key, value in saved.items():
+        setattr(settings, key, value)
+    admission.reset()
+
+
+def _audio(providers) -> dict:
+    return {"text": providers.story_text(), "storyType": "Historical", "language": "English"}
+
+
+async def test_leaving_during_story_closes_stream_and_skips_images(stubbed):
+    from app.core.singleflight import flight
+    app, providers, _, _ = stubbed
+    status = await asgi_post(app, "/api/generate", STORY, leave_after=0.05)
+    await asyncio.sleep(0.05)
+    assert status == 499
+    assert providers.cancelled["gemini"] == 1
+    assert providers.calls["openrouter"] == 0
+    assert flight.in_flight() == 0
+
+
+async def test_leaving_during_audio_stops_tts_and_leaves_no_part_files(stubbed):
+    app, providers, _, media_dir = stubbed
+    status = await asgi_post(app, "/api/generate-audio", _audio(providers), leave_after=0.05)
+    await asyncio.sleep(0.05)
+    assert status == 499
+    assert providers.cancelled["tts"] == providers.calls["tts"] > 0
+    leftovers = [name for _, _, files in os.walk(media_dir) for name in files if name.endswith(".part")]
+    assert not leftovers
+
+
+async def test_shared_synthesis_survives_one_client_leaving(stubbed):
+    app, providers, _, _ = stubbed
+    audio = _audio(providers)
+    before = dict(providers.cancelled)
+    statuses = await asyncio.gather(
+        asgi_post(app, "/api/generate-audio", audio, leave_after=0.05),
+        asgi_post(app, "/api/generate-audio", audio),
+    )
+    assert statuses == [499, 200]
+    assert providers.cancelled == before
+
+
+async def test_disabled_runs_abandoned_request_to_completion(stubbed):
+    app, providers, settings, _ = stubbed
+    settings.CANCEL_ON_DISCONNECT = False
+    before = dict(providers.cancelled)
+    status = await asgi_post(app, "/api/generate", dict(STORY, topic="Sinhagad"), leave_after=0.05)
+    assert status == 200
+    assert providers.cancelled == before
+
+
+async def test_failed_images_cancel_the_audio_prefetch(stubbed, monkeypatch):
+    from app.api import endpoints
+    from app.services import audio_prefetch
+    app, providers, _, _ = stubbed
+    audio_prefetch.reset()
+
+    async def broken_images(*args):
+        raise RuntimeError("image provider down")
+
+    monkeypatch.setattr(endpoints, "_generate_story_images", broken_images)
+    with pytest.raises(RuntimeError):
+        await asgi_post(app, "/api/generate", dict(STORY, topic="Torna", preloadAudio=True))
+    await asyncio.sleep(0.05)
+    stats = audio_prefetch.stats()
+    assert (stats["scheduled"], stats["cancelled"], stats["running"]) == (1, 1, 0)
+    assert providers.cancelled["tts"] == providers.calls["tts"]
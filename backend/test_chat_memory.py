@@ -0,0 +1,40 @@
+"""
+Bounded chat memory (app.services.chat_memory).
+
+Run from backend/:
+    python -m pytest -q test_chat_memory.py
+"""
+import pytest
+
+from app.core.config import settings
+from app.services import chat_memory
+
+# The chat prompt carried the first 4000 characters of the story before bounded memory
+PREVIOUS_CONTEXT_CHARS = 4000
+MARATHI = "रायगड किल्ल्यावर शिवाजी महाराजांचा राज्याभिषेक झाला. "
+ENGLISH = "Shivaji Maharaj was crowned at Raigad fort. "
+
+
+@pytest.fixture
+def memory_on():
+    saved = settings.CHAT_MEMORY_ENABLED
+    settings.CHAT_MEMORY_ENABLED = True
+    chat_memory.reset()
+    yield
+    settings.CHAT_MEMORY_ENABLED = saved
+    chat_memory.reset()
+
+
+@pytest.mark.parametrize("sentence", [MARATHI, ENGLISH])
+def test_long_story_keeps_at_least_the_previous_context(memory_on, sentence):
+    story = sentence * 500
+    memory = chat_memory.build(story, "Shivaji", [], "Tell me about the coronation")
+    assert len(memory.context) >= PREVIOUS_CONTEXT_CHARS
+    assert story.startswith(memory.context)
+
+
+def test_memory_off_keeps_the_previous_context(memory_on):
+    settings.CHAT_MEMORY_ENABLED = False
+    story = MARATHI * 500
+    memory = chat_memory.build(story, "Shivaji", [], "hello")
+    assert memory.context == story[:PREVIOUS_CONTEXT_CHARS]
@@ -0,0 +1,93 @@
+"""
+Response compression (app.core.compression) and JSON rendering
+(app.core.responses).
+
+Run from backend/:
+    python -m pytest -q test_compression.py
+"""
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware
+from app.core.responses import JSONResponse, dumps
+
+STORY = {"title": "राजगड", "story_content": "The drums of Raigad woke the valley. " * 200, "images": []}
+LINES = [{"index": i, "story": STORY["story_content"][:500]} for i in range(3)]
+
+
+@pytest.fixture
+def client():
+    app = FastAPI(default_response_class=JSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/story")
+    async def story():
+        return STORY
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/batch")
+    async def batch():
+        return StreamingResponse((dumps(line) + b"\n" for line in LINES), media_type="application/x-ndjson")
+
+    @app.get("/media/alignment.json")
+    async def media():
+        return Response(json.dumps(STORY).encode(), media_type="application/json")
+
+    return TestClient(app)
+
+
+def test_dumps_matches_stdlib_json():
+    assert json.loads(dumps(STORY)) == STORY
+    assert json.loads(dumps({1: "a"})) == {"1": "a"}
+
+
+def test_brotli_decodes_to_the_same_body(client):
+    brotli = pytest.importorskip("brotli")
+    plain = client.get("/story", headers={"Accept-Encoding": "identity"})
+    with client.stream("GET", "/story", headers={"Accept-Encoding": "br"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "br"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert len(raw) < len(plain.content)
+    assert brotli.decompress(raw) == plain.content
+
+
+def test_brotli_is_preferred_over_gzip(client):
+    pytest.importorskip("brotli")
+    response = client.get("/story", headers={"Accept-Encoding": "gzip, deflate, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == STORY
+
+
+def test_gzip_decodes_to_the_same_body(client):
+    response = client.get("/story", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == STORY
+
+
+def test_refused_and_unknown_codings_get_identity(client):
+    for header in ("br;q=0, gzip;q=0", "identity", "zstd"):
+        response = client.get("/story", headers={"Accept-Encoding": header})
+        assert "content-encoding" not in response.headers
+        assert response.json() == STORY
+
+
+def test_small_bodies_and_media_are_left_alone(client):
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "br, gzip"}).headers
+    media = client.get("/media/alignment.json", headers={"Accept-Encoding": "br, gzip"})
+    assert "content-encoding" not in media.headers
+    assert media.json() == STORY
+
+
+def test_streamed_ndjson_decodes_line_by_line(client):
+    pytest.importorskip("brotli")
+    response = client.get("/batch", headers={"Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert [json.loads(line) for line in response.text.splitlines()] == LINES
@@ -0,0 +1,67 @@
+"""
+Fast story mode outlines (app.services.fast_story).
+
+Run from backend/:
+    python -m pytest -q test_fast_story.py
+"""
+import json
+
+import pytest
+
+from app.services import fast_story
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _outline(sections: int) -> dict:
+    return {"title": "The Crowning at Raigad", "era": "1674",
+            "sections": [{"heading": f"Part {i + 1}", "beats": f"beat {i + 1}"} for i in range(sections)]}
+
+
+@pytest.mark.parametrize("sections, valid", [(1, False), (2, False), (3, True), (4, True), (6, True)])
+def test_outline_needs_at_least_three_sections(sections, valid):
+    assert fast_story._valid_outline(_outline(sections)) is valid
+
+
+def test_outline_needs_title_and_beats():
+    assert not fast_story._valid_outline(dict(_outline(3), title=""))
+    outline = _outline(3)
+    outline["sections"][1]["beats"] = ""
+    assert not fast_story._valid_outline(outline)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Answers the outline call with `llm.outline` and each section call with its beats."""
+    class FakeLLM:
+        outline = _outline(3)
+        sections = []
+
+    async def complete(use_groq, system_prompt, user_prompt, max_tokens, json_mode):
+        if json_mode:
+            return json.dumps(FakeLLM.outline)
+        FakeLLM.sections.append(user_prompt)
+        return f"Paragraph {len(FakeLLM.sections)}."
+
+    monkeypatch.setattr(fast_story, "_complete", complete)
+    return FakeLLM
+
+
+async def test_short_outline_is_an_error_so_the_caller_falls_back(llm):
+    llm.outline = _outline(2)
+    result = await fast_story.generate_story_fast("Raigad", "Maratha Empire", "Narrative")
+    assert "error" in result
+    assert llm.sections == []
+
+
+async def test_long_outline_is_cut_to_four_sections(llm):
+    llm.outline = _outline(6)
+    result = await fast_story.generate_story_fast("Raigad", "Maratha Empire", "Narrative")
+    assert "error" not in result
+    assert len(llm.sections) == fast_story.MAX_SECTIONS
+    assert result["story_content"].count("\n\n") == fast_story.MAX_SECTIONS - 1
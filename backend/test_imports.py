@@ -1,6 +1,7 @@
 try:
-    from app.services.gemini_service import model
-    print("Successfully imported gemini_service and initialized model.")
+    from app.services.gemini_service import providers
+    model = providers.get("gemini.story")
+    print(f"Successfully imported gemini_service and initialized model: {model is not None}")
 except Exception as e:
     print(f"Import failed: {e}")
     import traceback
@@ -0,0 +1,157 @@
+"""
+Repair, validation and follow-up of structured LLM output (app.services.llm_output).
+
+Run from backend/:
+    python -m pytest -q test_llm_output.py
+"""
+import json
+
+import pytest
+
+from app.core.config import settings
+from app.services import llm_output
+from app.services.llm_output import ImagePromptsOutput, OutputError, StoryOutput
+
+pytestmark = pytest.mark.anyio
+
+STORY = {
+    "title": "The Crowning at Raigad",
+    "era": "1674",
+    "timeline": [{"date": "1674", "event": "Coronation"}],
+    "main_events_summary": ["Shivaji is crowned"],
+    "story_content": "The drums of Raigad woke the valley. Shivaji rose before dawn.",
+    "moral": "Self-rule is earned.",
+}
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def repair_on():
+    saved = settings.LLM_OUTPUT_REPAIR
+    settings.LLM_OUTPUT_REPAIR = True
+    llm_output.reset()
+    yield
+    settings.LLM_OUTPUT_REPAIR = saved
+    llm_output.reset()
+
+
+class Followup:
+    """Records follow-up prompts and answers each with the next reply."""
+
+    def __init__(self, *replies: str):
+        self.replies = list(replies)
+        self.prompts = []
+
+    async def __call__(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return self.replies.pop(0)
+
+
+# Local repair
+
+def test_trailing_commas():
+    value, repaired = llm_output.loads('{"characters": ["Shivaji", "Jijabai",],}')
+    assert value == {"characters": ["Shivaji", "Jijabai"]}
+    assert repaired
+
+
+def test_code_fences_and_trailing_prose():
+    text = "```json\n" + json.dumps(STORY) + "\n```\nHope you enjoy the story!"
+    value, repaired = llm_output.loads(text)
+    assert value == STORY
+    assert repaired
+
+
+def test_unescaped_newlines_in_strings():
+    text = '{"title": "Raigad", "story_content": "First paragraph.\n\nSecond\tparagraph."}'
+    value, _ = llm_output.loads(text)
+    assert value["story_content"] == "First paragraph.\n\nSecond\tparagraph."
+    repaired = llm_output.repair_json(text)
+    assert json.loads(repaired)["story_content"] == "First paragraph.\n\nSecond\tparagraph."
+
+
+def test_everything_at_once_goes_through_the_character_repair():
+    text = '```json\n{"title": "Raigad", "story_content": "Line one.\nLine two.", "events": ["a", "b",],}\n```'
+    assert llm_output.repair_json(text) == \
+        '{"title": "Raigad", "story_content": "Line one.\\nLine two.", "events": ["a", "b"]}'
+
+
+def test_cut_off_list_drops_the_partial_item():
+    value, repaired = llm_output.loads('{"characters": ["Shivaji", "Jijab')
+    assert value == {"characters": ["Shivaji"]}
+    assert repaired
+
+
+async def test_repaired_story_is_counted_as_saved():
+    text = json.dumps(STORY)[:-1] + ",}"
+    assert await llm_output.parse(text, StoryOutput, "story") == STORY
+    assert llm_output.stats()["story"]["repaired"] == 1
+    assert llm_output.stats()["story"]["regenerations_saved"] == 1
+
+
+# Cut-off stories are continued, not closed locally
+
+async def test_truncated_story_is_continued_not_closed_locally():
+    text = json.dumps(STORY)
+    cut = text[:text.index("Shivaji rose")]  # stops inside story_content, before moral
+    followup = Followup(json.dumps({"story_content": "Shivaji rose before dawn.", "moral": "Self-rule is earned."}))
+
+    result = await llm_output.parse(cut, StoryOutput, "story", followup, require_complete=True)
+
+    assert result["story_content"] == STORY["story_content"]
+    assert result["moral"] == STORY["moral"]
+    assert len(followup.prompts) == 1
+    assert "was cut off" in followup.prompts[0]
+    assert '"story_content"' in followup.prompts[0] and "moral" in followup.prompts[0]
+    assert llm_output.stats()["story"]["continued"] == 1
+
+
+async def test_length_stop_with_repair_counts_as_cut_off():
+    text = json.dumps(STORY)
+    followup = Followup(json.dumps({"moral": "Self-rule is earned."}))
+    cut = text[:text.index(', "moral"')] + ","  # whole fields, but the stream hit its limit
+    result = await llm_output.parse(cut, StoryOutput, "story", followup, require_complete=True, truncated=True)
+    assert result["moral"] == STORY["moral"]
+    assert len(followup.prompts) == 1
+
+
+async def test_without_require_complete_a_cut_off_story_is_closed_locally():
+    text = json.dumps(STORY)
+    cut = text[:text.index("Shivaji rose")]
+    followup = Followup()
+    result = await llm_output.parse(cut, StoryOutput, "story", followup)
+    assert result["story_content"] == "The drums of Raigad woke the valley. "
+    assert followup.prompts == []
+
+
+# Schema failures
+
+async def test_schema_failure_without_followup_raises():
+    with pytest.raises(OutputError):
+        await llm_output.parse('{"title": "Raigad", "story_content": ""}', StoryOutput, "story")
+    assert llm_output.stats()["story"]["failed"] == 1
+
+
+async def test_schema_failure_that_the_fix_call_cannot_fix_raises():
+    followup = Followup('{"image_prompts": []}')
+    with pytest.raises(OutputError):
+        await llm_output.parse('{"image_prompts": []}', ImagePromptsOutput, "image_prompts", followup)
+    assert len(followup.prompts) == 1
+    assert llm_output.stats()["image_prompts"]["failed"] == 1
+
+
+async def test_schema_failure_fixed_by_the_fix_call():
+    followup = Followup('{"image_prompts": [{"scene_description": "Raigad at dawn"}]}')
+    result = await llm_output.parse('{"prompts": ["Raigad at dawn"]}', ImagePromptsOutput, "image_prompts", followup)
+    assert result == {"image_prompts": [{"scene_description": "Raigad at dawn"}]}
+    assert "does not match the required structure" in followup.prompts[0]
+    assert llm_output.stats()["image_prompts"]["followup_fixed"] == 1
+
+
+async def test_unparseable_output_raises():
+    with pytest.raises(OutputError):
+        await llm_output.parse("I'm sorry, I can't write that story.", StoryOutput, "story")
@@ -0,0 +1,171 @@
+"""
+HTTP semantics of /media (app.api.media): ranges, validators, caching and
+the precompressed JSON sidecar. Browsers seek narration with these.
+
+Run from backend/:
+    python -m pytest -q test_media.py
+"""
+import gzip
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.media import IMMUTABLE_CACHE, MUTABLE_CACHE, parse_range, router
+from app.services.storage import LocalStorage, set_storage
+
+HASH = "0123456789abcdef0123456789abcdef"
+AUDIO = f"audio/{HASH}.mp3"
+ALIGNMENT = f"audio/{HASH}.alignment.json"
+DATA = bytes(range(256)) * 4
+ALIGNMENT_JSON = b'{"words": ["Raigad", "fort"]}'
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = LocalStorage(str(tmp_path / "media"))
+    for key, data in (
+        (AUDIO, DATA),
+        ("audio/cover.jpg", b"jpeg"),
+        (ALIGNMENT, ALIGNMENT_JSON),
+        (ALIGNMENT + ".gz", gzip.compress(ALIGNMENT_JSON)),
+    ):
+        path = storage.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+    set_storage(storage)
+    yield storage
+    set_storage(None)
+
+
+@pytest.fixture
+def client(storage):
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def _etag(client, key: str) -> str:
+    return client.head(f"/media/{key}").headers["etag"]
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),
+    ("bytes=-100", (924, 1023)),
+    ("bytes=-5000", (0, 1023)),
+    ("bytes=1000-5000", (1000, 1023)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1024) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=5-2", "bytes=-0", "bytes=a-b"])
+def test_parse_range_rejects_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1024)
+
+
+def test_full_response(client):
+    response = client.get(f"/media/{AUDIO}")
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "audio/mpeg"
+    assert response.headers["etag"] == f'"{HASH}"'
+
+
+def test_missing_and_invalid_keys_are_404(client):
+    assert client.get("/media/audio/nope.mp3").status_code == 404
+    assert client.get("/media/audio/..%2F..%2Fsecret").status_code == 404
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+])
+def test_single_range_is_206(client, header, start, end):
+    response = client.get(f"/media/{AUDIO}", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == DATA[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(DATA)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+def test_multi_range_falls_back_to_full_body(client):
+    response = client.get(f"/media/{AUDIO}", headers={"Range": "bytes=0-1,10-11"})
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert "content-range" not in response.headers
+
+
+def test_unsatisfiable_range_is_416(client):
+    response = client.get(f"/media/{AUDIO}", headers={"Range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+def test_if_range_with_current_strong_etag_honours_range(client):
+    etag = _etag(client, AUDIO)
+    response = client.get(f"/media/{AUDIO}", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == DATA[:10]
+
+
+@pytest.mark.parametrize("if_range", ["W/{etag}", '"stale"'])
+def test_if_range_with_weak_or_stale_etag_sends_everything(client, if_range):
+    etag = _etag(client, AUDIO)
+    response = client.get(f"/media/{AUDIO}", headers={"Range": "bytes=0-9", "If-Range": if_range.format(etag=etag)})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_if_none_match_is_304(client, if_none_match):
+    etag = _etag(client, AUDIO)
+    response = client.get(f"/media/{AUDIO}", headers={"If-None-Match": if_none_match.format(etag=etag)})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_if_none_match_with_other_etag_is_200(client):
+    response = client.get(f"/media/{AUDIO}", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+
+
+def test_immutable_cache_only_for_content_addressed_keys(client):
+    assert client.head(f"/media/{AUDIO}").headers["cache-control"] == IMMUTABLE_CACHE
+    assert client.head("/media/audio/cover.jpg").headers["cache-control"] == MUTABLE_CACHE
+
+
+def test_head_has_length_and_no_body(client):
+    response = client.head(f"/media/{AUDIO}", headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.headers["content-length"] == "10"
+    assert response.content == b""
+
+
+def test_json_is_served_from_gz_sidecar_when_accepted(client):
+    response = client.get(f"/media/{ALIGNMENT}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == {"words": ["Raigad", "fort"]}
+    plain = client.get(f"/media/{ALIGNMENT}", headers={"Accept-Encoding": "identity"})
+    assert response.headers["etag"] != plain.headers["etag"]
+
+
+@pytest.mark.parametrize("accept_encoding", ["identity", "gzip;q=0", "br"])
+def test_json_without_gzip_is_served_plain(client, accept_encoding):
+    response = client.get(f"/media/{ALIGNMENT}", headers={"Accept-Encoding": accept_encoding})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.content == ALIGNMENT_JSON
+    assert response.headers["vary"] == "Accept-Encoding"
@@ -0,0 +1,79 @@
+"""
+Cancellation safety of single-flight coalescing (app.core.singleflight).
+
+Run from backend/:
+    python -m pytest -q test_singleflight.py
+"""
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def _slow(runs: list, value, delay=0.05):
+    runs.append(value)
+    await asyncio.sleep(delay)
+    return value
+
+
+async def test_cancelling_the_leader_still_serves_followers():
+    sf, runs = SingleFlight(), []
+    leader = asyncio.create_task(sf.do("k", lambda: _slow(runs, "a")))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(sf.do("k", lambda: _slow(runs, "b")))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    assert await follower == "a"
+    assert leader.cancelled()
+    assert runs == ["a"]
+
+
+async def test_orphaned_call_is_cancelled_and_late_caller_starts_fresh():
+    sf, runs = SingleFlight(), []
+    started = asyncio.Event()
+    finished = []
+
+    async def tracked():
+        started.set()
+        try:
+            await asyncio.sleep(1)
+        finally:
+            finished.append("cleaned up")
+
+    waiters = [asyncio.create_task(sf.do("k", tracked)) for _ in range(3)]
+    await started.wait()
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert finished == ["cleaned up"]
+    assert sf.in_flight() == 0
+    assert await sf.do("k", lambda: _slow(runs, "fresh")) == "fresh"
+
+
+async def test_exception_reaches_every_waiter_then_key_is_free():
+    sf = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    results = await asyncio.gather(*(sf.do("k", boom) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert sf.in_flight() == 0
+    assert sf.stats()["started"] == 1
+
+
+async def test_completed_calls_are_not_cached():
+    sf, runs = SingleFlight(), []
+    assert await sf.do("k", lambda: _slow(runs, "x", 0)) == "x"
+    assert await sf.do("k", lambda: _slow(runs, "y", 0)) == "y"
+    assert runs == ["x", "y"]
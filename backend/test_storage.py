@@ -0,0 +1,178 @@
+"""
+Blob storage backends (app.services.storage).
+
+LocalStorage runs everywhere. The S3 round trip runs under moto when it is
+installed, against a real S3-compatible endpoint (e.g. MinIO) when
+S3_TEST_ENDPOINT is set, and is skipped otherwise.
+
+Run from backend/:
+    python -m pytest -q test_storage.py
+    S3_TEST_ENDPOINT=http://localhost:9000 S3_TEST_BUCKET=test \\
+        AWS_ACCESS_KEY_ID=minioadmin AWS_SECRET_ACCESS_KEY=minioadmin python -m pytest -q test_storage.py
+"""
+import contextlib
+import hashlib
+import os
+import time
+
+import pytest
+
+from app.services.storage import BlobStorage, LocalStorage, S3Storage, etag_for
+
+pytestmark = pytest.mark.anyio
+
+HASH = "0123456789abcdef0123456789abcdef"
+DAY = 86400
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(str(tmp_path / "media"))
+
+
+async def _put(storage: BlobStorage, key: str, data: bytes, age_s: float = 0):
+    path = storage.scratch_path()
+    with open(path, "wb") as f:
+        f.write(data)
+    await storage.put_file(key, path)
+    if age_s and isinstance(storage, LocalStorage):
+        then = time.time() - age_s
+        os.utime(storage.path_for(key), (then, then))
+
+
+async def _read(storage: BlobStorage, key: str, start: int = 0, end=None) -> bytes:
+    return b"".join([chunk async for chunk in storage.open_range(key, start, end)])
+
+
+def test_incomplete_backend_fails_at_construction():
+    class Partial(BlobStorage):
+        def scratch_path(self, suffix: str = "") -> str:
+            return suffix
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+async def test_local_shards_by_sha1_of_the_name(local):
+    key = f"audio/{HASH}.mp3"
+    await _put(local, key, b"mp3")
+    digest = hashlib.sha1(f"{HASH}.mp3".encode()).hexdigest()
+    expected = os.path.join(local.root, "audio", digest[:2], digest[2:4], f"{HASH}.mp3")
+    assert local.path_for(key) == expected
+    assert os.path.exists(expected)
+    assert not os.listdir(local.scratch_dir)
+    assert [info.key for info in await local.list("audio/")] == [key]
+
+
+async def test_local_rejects_keys_that_escape_the_root(local):
+    for key in ("", "/etc/passwd", "audio/../secret", "audio//x"):
+        with pytest.raises(ValueError):
+            local.path_for(key)
+
+
+async def test_local_stat(local):
+    key = f"audio/{HASH}.mp3"
+    assert await local.stat(key) is None
+    await _put(local, key, b"x" * 10)
+    info = await local.stat(key)
+    assert (info.key, info.size, info.content_type) == (key, 10, "audio/mpeg")
+    assert info.etag == HASH == etag_for(key, info.size, info.modified)
+
+
+async def test_local_open_range_is_inclusive(local):
+    key = "audio/data.bin"
+    data = bytes(range(256)) * 4096  # spans several READ_CHUNK_SIZE reads
+    await _put(local, key, data)
+    assert await _read(local, key) == data
+    assert await _read(local, key, 10, 19) == data[10:20]
+    assert await _read(local, key, len(data) - 5) == data[-5:]
+    assert await _read(local, key, 0, 0) == data[:1]
+
+
+async def test_local_delete_is_idempotent(local):
+    key = "audio/gone.mp3"
+    await _put(local, key, b"x")
+    await local.delete(key)
+    await local.delete(key)
+    assert await local.stat(key) is None
+
+
+async def test_local_gc_keeps_referenced_blobs_their_derived_files_and_skipped_prefixes(local):
+    old = {
+        f"audio/{HASH}.mp3": b"keep",
+        f"audio/{HASH}.alignment.json.gz": b"keep",
+        f"audio/{HASH}.32k.webm": b"keep",
+        "audio/segments/abc.mp3": b"keep",
+        "audio/orphan.mp3": b"drop",
+    }
+    for key, data in old.items():
+        await _put(local, key, data, age_s=2 * DAY)
+    await _put(local, "audio/fresh.mp3", b"young")
+    with open(local.scratch_path(".part"), "wb") as f:
+        f.write(b"crash leftover")
+    for name in os.listdir(local.scratch_dir):
+        os.utime(os.path.join(local.scratch_dir, name), (0, 0))
+
+    stats = await local.gc(max_age_s=DAY, referenced=[f"audio/{HASH}.mp3"], skip_prefixes=("audio/segments/",))
+
+    remaining = {info.key for info in await local.list()}
+    assert remaining == set(old) - {"audio/orphan.mp3"} | {"audio/fresh.mp3"}
+    assert stats == {"scanned": 5, "deleted": 1, "bytes_freed": 4, "scratch_deleted": 1}
+
+
+async def test_local_gc_without_references_or_age_deletes_nothing(local):
+    await _put(local, "audio/a.mp3", b"x", age_s=DAY)
+    stats = await local.gc()
+    assert stats["deleted"] == 0
+    assert await local.stat("audio/a.mp3") is not None
+
+
+@contextlib.contextmanager
+def _s3_target():
+    """(endpoint, bucket, create bucket?) for the round trip: moto in-process, or S3_TEST_ENDPOINT."""
+    endpoint = os.environ.get("S3_TEST_ENDPOINT", "")
+    if endpoint:
+        yield endpoint, os.environ.get("S3_TEST_BUCKET", "story-media-test"), False
+        return
+    moto = pytest.importorskip("moto", reason="needs moto or S3_TEST_ENDPOINT")
+    saved = {name: os.environ.get(name) for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY")}
+    os.environ.update(AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing")
+    try:
+        with moto.mock_aws():
+            yield "", "story-media-test", True
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+async def test_s3_round_trip(tmp_path):
+    pytest.importorskip("boto3", reason="MEDIA_STORAGE=s3 requires boto3")
+    with _s3_target() as (endpoint, bucket, create):
+        storage = S3Storage(bucket, endpoint_url=endpoint, region="us-east-1", prefix=f"test-{time.time_ns()}",
+                            scratch_dir=str(tmp_path / "scratch"))
+        if create:
+            storage.client.create_bucket(Bucket=bucket)
+        key = f"audio/{HASH}.mp3"
+        data = bytes(range(256)) * 8
+        try:
+            assert await storage.stat(key) is None
+            await _put(storage, key, data)
+            assert not os.listdir(storage.scratch_dir)
+
+            info = await storage.stat(key)
+            assert (info.size, info.content_type) == (len(data), "audio/mpeg")
+            assert info.etag
+            assert await _read(storage, key) == data
+            assert await _read(storage, key, 10, 19) == data[10:20]
+            assert [blob.key for blob in await storage.list("audio/")] == [key]
+        finally:
+            await storage.delete(key)
+        assert await storage.stat(key) is None
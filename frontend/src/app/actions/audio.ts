@@ -2,6 +2,8 @@
 
 import prisma from "@/lib/db";
 import axios from "axios";
+import { currentUser } from "@clerk/nextjs/server";
+import { backendHeaders } from "@/lib/backend";
 
 export async function generateAndSaveAudio(
     storyId: string,
@@ -44,11 +46,14 @@ export async function generateAndSaveAudio(
         }
 
         // Generate new audio
+        const user = await currentUser();
         const apiUrl = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api";
         const response = await axios.post(`${apiUrl}/generate-audio`, {
             text,
             storyType,
             language
+        }, {
+            headers: backendHeaders(user?.id),
         });
 
         if (!response.data.audioUrl) {
@@ -1,6 +1,7 @@
 "use server";
 
 import axios from "axios";
+import { backendHeaders } from "@/lib/backend";
 import { hasEnoughCredits, deductCredits } from "./credits";
 import { CREDIT_COSTS } from "./constants";
 
@@ -32,6 +33,8 @@ export async function generateAndSaveStory(
             era,
             style,
             storyType,
+        }, {
+            headers: backendHeaders(userId),
         });
 
         // 3. Return the generated story directly (no database save)
@@ -2,6 +2,8 @@
 
 import prisma from "@/lib/db";
 import axios from "axios";
+import { currentUser } from "@clerk/nextjs/server";
+import { backendHeaders } from "@/lib/backend";
 import { hasEnoughCredits, deductCredits } from "./credits";
 import { CREDIT_COSTS } from "./constants";
 
@@ -53,6 +55,7 @@ export async function generateAndSaveStory(
             withImages,
             language,
         }, {
+            headers: backendHeaders(userId),
             timeout: 180000 // 3 minutes timeout
         });
 
@@ -113,12 +116,14 @@ export async function generateAndSaveStory(
 
 export async function generateAudio(text: string, storyType: string, language: string = "") {
     try {
+        const user = await currentUser();
         const apiUrl = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api";
         const response = await axios.post(`${apiUrl}/generate-audio`, {
             text,
             storyType,
             language
         }, {
+            headers: backendHeaders(user?.id),
             timeout: 120000 // 2 minutes timeout for audio generation
         });
 
@@ -0,0 +1,8 @@
+// Headers for server-action calls to the FastAPI backend. BACKEND_API_SECRET must equal the
+// backend's INTERNAL_API_SECRET; with both set, the backend rate-limits each user separately.
+// Without them it has no per-user limit, since every request comes from this server.
+export const backendHeaders = (userId?: string | null): Record<string, string> => {
+    const secret = process.env.BACKEND_API_SECRET;
+    if (!secret) return {};
+    return userId ? { "X-Internal-Secret": secret, "X-User-Id": userId } : { "X-Internal-Secret": secret };
+};